@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Agent Swarm Load Generator
+
+Simulates clients creating inspection jobs and a swarm of agents replying
+YES through the Twilio webhook, using Twilio-shaped form payloads
+(From, Body, MessageSid). Tracks reply outcomes (assigned, already
+assigned, no jobs), checks for correctness violations such as a job
+being assigned to more than one agent, and prints a latency histogram.
+
+Run it against a local deployment backed by the Twilio emulator. Every job
+created here is broadcast to every seeded agent.
+
+Usage:
+    python twilio_emulator.py --port 4010 &
+    TWILIO_API_BASE_URL=http://127.0.0.1:4010 TWILIO_ACCOUNT_SID=ACtest \\
+        TWILIO_AUTH_TOKEN=test STORAGE_BACKEND=memory uvicorn app.main:app --port 5000 &
+
+    # 500 agents reply YES within two seconds to a batch of 50 new jobs
+    python agent_swarm.py --seed-agents --agents 500 --jobs 50 --window 2
+    python agent_swarm.py --agents 500 --rate 1000 --pattern poisson --no-create-jobs
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+OUTCOMES = {
+    "success": "assigned",
+    "already_assigned": "already_assigned",
+    "no_jobs": "no_jobs",
+}
+
+def arrival_offsets(count: int, window: float, pattern: str, rng: random.Random, bursts: int = 1) -> List[float]:
+    """Send offsets (seconds from start) for count requests over a window."""
+    if count <= 0:
+        return []
+    if pattern == "uniform":
+        step = window / count
+        return [i * step for i in range(count)]
+    if pattern == "poisson":
+        rate = count / window if window > 0 else float("inf")
+        offsets, t = [], 0.0
+        for _ in range(count):
+            offsets.append(t)
+            t += rng.expovariate(rate) if rate != float("inf") else 0.0
+        return offsets
+    if pattern == "burst":
+        # Requests arrive in a few simultaneous bursts spread across the window
+        gap = window / bursts if bursts > 0 else 0.0
+        return sorted((i % bursts) * gap for i in range(count))
+    if pattern == "ramp":
+        # Arrival rate grows linearly from zero over the window
+        return [window * (i / count) ** 0.5 for i in range(count)]
+    raise ValueError(f"Unknown arrival pattern: {pattern}")
+
+def agent_phones(count: int, prefix: str) -> List[str]:
+    return [f"{prefix}{i:07d}" for i in range(1, count + 1)]
+
+def seed_agents(base_url: str, phones: List[str]):
+    lines = ["name,phone,zone,specializations,rating"]
+    for i, phone in enumerate(phones):
+        lines.append(f"Swarm Agent {i},{phone},Zone {i % 10},Apartments,4.5")
+    response = requests.post(
+        f"{base_url}/api/agents/bulk",
+        files={"file": ("swarm_agents.csv", "\n".join(lines).encode("utf-8"))},
+        timeout=300
+    )
+    response.raise_for_status()
+    summary = response.json()
+    print(f"✅ Seeded agents: {summary['inserted']} inserted, {summary['updated']} updated, {summary['rejected']} rejected")
+
+def create_jobs(base_url: str, count: int, workers: int) -> List[str]:
+    """Simulate clients requesting inspections; returns the created job ids."""
+    def create(i):
+        job = {
+            "property": {
+                "property_id": f"swarm_prop_{uuid.uuid4().hex[:8]}",
+                "title": f"Swarm Property {i}",
+                "address": f"{i} Load Test Street",
+                "property_type": "Apartment",
+            },
+            "client": {"client_id": f"swarm_client_{i}", "name": f"Swarm Client {i}", "phone": f"+2349900{i:06d}"},
+            "inspection_date": "2099-01-01",
+            "inspection_time": "10:00",
+        }
+        response = requests.post(f"{base_url}/api/jobs/", json=job, timeout=300)
+        response.raise_for_status()
+        return response.json()["id"]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(create, range(count)))
+
+class SwarmResults:
+    """Thread-safe tally of outcomes, latencies and assignments."""
+
+    def __init__(self):
+        self.outcomes = Counter()
+        self.latencies: List[float] = []
+        self.send_lag: List[float] = []
+        self.assignments: Dict[str, List[str]] = defaultdict(list)
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, phone: str, latency: float, lag: float, outcome: str, job_id: Optional[str]):
+        with self._lock:
+            self.outcomes[outcome] += 1
+            self.latencies.append(latency)
+            self.send_lag.append(lag)
+            if outcome == "assigned" and job_id:
+                self.assignments[job_id].append(phone)
+
+def run_swarm(base_url: str, phones: List[str], offsets: List[float], workers: int) -> SwarmResults:
+    results = SwarmResults()
+    sessions = threading.local()
+    url = f"{base_url}/api/webhooks/twilio/whatsapp"
+
+    def reply(phone: str, scheduled_at: float):
+        if not hasattr(sessions, "value"):
+            sessions.value = requests.Session()
+        lag = time.perf_counter() - scheduled_at
+        payload = {"From": f"whatsapp:{phone}", "Body": "YES", "MessageSid": "SM" + uuid.uuid4().hex}
+        started = time.perf_counter()
+        job_id = None
+        try:
+            response = sessions.value.post(url, data=payload, timeout=60)
+            if response.status_code >= 400:
+                outcome = f"http_{response.status_code}"
+            else:
+                body = response.json()
+                outcome = OUTCOMES.get(body.get("status"), body.get("status", "unknown"))
+                job_id = body.get("job_id")
+        except requests.RequestException as e:
+            outcome = f"error_{type(e).__name__}"
+        results.record(phone, time.perf_counter() - started, lag, outcome, job_id)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for phone, offset in zip(phones, offsets):
+            scheduled_at = start + offset
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(reply, phone, scheduled_at)
+    results.elapsed = time.perf_counter() - start
+    return results
+
+def find_violations(base_url: str, results: SwarmResults) -> List[str]:
+    """Check assignments reported to agents against each other and the stored jobs."""
+    violations = []
+    for job_id, winners in results.assignments.items():
+        if len(winners) > 1:
+            violations.append(f"double assignment: job {job_id} assigned to {', '.join(winners)}")
+
+    try:
+        jobs = {job["id"]: job for job in requests.get(f"{base_url}/api/jobs/", timeout=60).json()}
+    except (requests.RequestException, ValueError) as e:
+        violations.append(f"could not verify stored assignments: {e}")
+        return violations
+
+    for job_id, winners in results.assignments.items():
+        stored = jobs.get(job_id)
+        if stored is None:
+            continue
+        if stored.get("assigned_agent") not in winners:
+            violations.append(
+                f"lost update: job {job_id} told {', '.join(winners)} they won but stores {stored.get('assigned_agent')}"
+            )
+    return violations
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+def print_histogram(latencies: List[float], width: int = 50):
+    counts = Counter()
+    for latency in latencies:
+        ms = latency * 1000
+        bucket = next((edge for edge in HISTOGRAM_BUCKETS_MS if ms <= edge), None)
+        counts[bucket] += 1
+    peak = max(counts.values()) if counts else 1
+    print("\nLatency histogram")
+    previous = 0
+    for edge in HISTOGRAM_BUCKETS_MS + [None]:
+        label = f"{previous}-{edge} ms" if edge is not None else f">{previous} ms"
+        count = counts.get(edge, 0)
+        bar = "█" * int(round(count / peak * width)) if count else ""
+        print(f"  {label:>14} | {bar} {count}")
+        if edge is not None:
+            previous = edge
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a swarm of agents replying YES via the Twilio webhook")
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--agents", type=int, default=500)
+    parser.add_argument("--jobs", type=int, default=50, help="Jobs clients create before the swarm replies")
+    parser.add_argument("--no-create-jobs", action="store_true", help="Reply to whatever jobs are already pending")
+    parser.add_argument("--seed-agents", action="store_true", help="Bulk upsert the simulated agents first")
+    parser.add_argument("--phone-prefix", default="+23490", help="Prefix for simulated agent phone numbers")
+    parser.add_argument("--window", type=float, default=2.0, help="Seconds over which replies arrive")
+    parser.add_argument("--rate", type=float, default=None, help="Replies per second (overrides --window)")
+    parser.add_argument("--pattern", choices=["uniform", "poisson", "burst", "ramp"], default="uniform")
+    parser.add_argument("--bursts", type=int, default=1, help="Number of bursts for --pattern burst")
+    parser.add_argument("--replies-per-agent", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=200, help="Concurrent HTTP connections")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", default=None, help="Write a JSON summary to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    phones = agent_phones(args.agents, args.phone_prefix)
+
+    print("🐝 Agent Swarm Load Generator")
+    print("=" * 50)
+    print(f"Target: {args.base_url}")
+
+    if args.seed_agents:
+        seed_agents(args.base_url, phones)
+
+    if not args.no_create_jobs and args.jobs > 0:
+        started = time.perf_counter()
+        job_ids = create_jobs(args.base_url, args.jobs, min(args.workers, 20))
+        print(f"✅ Clients created {len(job_ids)} jobs in {time.perf_counter() - started:.2f}s")
+
+    senders = [phone for phone in phones for _ in range(args.replies_per_agent)]
+    rng.shuffle(senders)
+    window = len(senders) / args.rate if args.rate else args.window
+    offsets = arrival_offsets(len(senders), window, args.pattern, rng, args.bursts)
+
+    print(f"📨 Sending {len(senders)} YES replies over {window:.2f}s ({args.pattern})...")
+    results = run_swarm(args.base_url, senders, offsets, args.workers)
+    violations = find_violations(args.base_url, results)
+
+    latencies = results.latencies
+    print("\nOutcomes")
+    for outcome, count in results.outcomes.most_common():
+        print(f"  {outcome:<18} {count}")
+    print(f"\nAchieved rate: {len(latencies) / results.elapsed:.1f} replies/s over {results.elapsed:.2f}s")
+    print(f"Latency p50/p95/p99/max: {percentile(latencies, 50) * 1000:.1f} / {percentile(latencies, 95) * 1000:.1f} / "
+          f"{percentile(latencies, 99) * 1000:.1f} / {max(latencies, default=0) * 1000:.1f} ms")
+    print(f"Generator send lag p99: {percentile(results.send_lag, 99) * 1000:.1f} ms")
+    print_histogram(latencies)
+
+    if violations:
+        print(f"\n❌ {len(violations)} correctness violation(s):")
+        for violation in violations[:50]:
+            print(f"   - {violation}")
+    else:
+        print("\n✅ No correctness violations")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "outcomes": dict(results.outcomes),
+                "elapsed_s": results.elapsed,
+                "latency_ms": {p: percentile(latencies, p) * 1000 for p in (50, 95, 99)},
+                "violations": violations,
+            }, f, indent=2)
+
+    sys.exit(1 if violations else 0)
+
+if __name__ == "__main__":
+    main()
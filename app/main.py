@@ -1,9 +1,17 @@
-from fastapi import FastAPI
+from app.logging_config import configure_logging
+
+# Configure logging before the services below log their startup messages
+configure_logging()
+
+from typing import Optional
+from fastapi import Depends, FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.routes.jobs import router as jobs_router
 from app.routes.webhooks import router as webhooks_router
 from app.routes.agents import router as agents_router
+from app.routes.messages import router as messages_router
+from app.middleware import MetricsMiddleware, ProfilingMiddleware, TracingMiddleware, UnitOfWorkMiddleware
 import os
 
 app = FastAPI(
@@ -21,10 +29,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record per-route request latency for /metrics and a trace per request;
+# profiling sits inside tracing so profiles carry the request's trace id,
+# and each request's storage calls share one unit of work
+app.add_middleware(UnitOfWorkMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(jobs_router, prefix="/api/jobs", tags=["jobs"])
 app.include_router(webhooks_router, prefix="/api/webhooks", tags=["webhooks"])
 app.include_router(agents_router, prefix="/api/agents", tags=["agents"])
+app.include_router(messages_router, prefix="/api/messages", tags=["messages"])
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -43,6 +60,41 @@ async def admin():
 async def health_check():
     return {"status": "healthy", "message": "System is running"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint."""
+    from fastapi.responses import PlainTextResponse
+    from app.services.metrics import registry
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+def require_admin(x_admin_key: Optional[str] = Header(None)):
+    """Allow the request only with an X-Admin-Key header matching ADMIN_API_KEY."""
+    from app.services.profiling import is_admin_key
+    if not is_admin_key(x_admin_key):
+        raise HTTPException(status_code=403, detail="Admin key required")
+
+@app.get("/debug/traces/slowest", dependencies=[Depends(require_admin)])
+async def slowest_traces(limit: int = 20):
+    """Slowest recent traces with their spans, slowest first."""
+    from app.services.tracing import collector
+    return {"traces": collector.slowest(limit)}
+
+@app.get("/debug/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Recently captured request profiles, newest first."""
+    from app.services.profiling import profile_store
+    return {"profiles": profile_store.list()}
+
+@app.get("/debug/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str):
+    """A captured profile as collapsed stacks for flamegraph.pl or speedscope."""
+    from fastapi.responses import PlainTextResponse
+    from app.services.profiling import profile_store
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile["folded"])
+
 @app.get("/api/test")
 async def test_api():
     return {"message": "API is working!", "timestamp": "2025-01-11"}
@@ -61,13 +113,13 @@ async def debug_info():
         twilio_whatsapp_number = os.getenv("TWILIO_WHATSAPP_NUMBER", "NOT_SET")
         
         # Check database connection
-        db_connected = db_service.db is not None
-        db_name = db_service.db.name if db_service.db is not None else "NOT_CONNECTED"
+        db_connected = db_service.is_connected()
+        db_name = db_service.database_name
         
         # Test database operations (only if connected)
         test_insert = "NOT_TESTED"
         test_find = "NOT_TESTED"
-        if db_service.db is not None:
+        if db_connected:
             try:
                 test_doc = {"test": "debug", "timestamp": "2025-08-11"}
                 insert_result = db_service.insert_document("debug_test", test_doc)
@@ -87,6 +139,7 @@ async def debug_info():
                 "TWILIO_WHATSAPP_NUMBER": twilio_whatsapp_number
             },
             "database": {
+                "backend": db_service.name,
                 "connected": db_connected,
                 "database_name": db_name,
                 "test_insert": test_insert,
@@ -0,0 +1,200 @@
+import itertools
+import logging
+import os
+import re
+import time
+from urllib.parse import parse_qs
+from fastapi.concurrency import run_in_threadpool
+from app.services.metrics import DB_ROUND_TRIPS_PER_REQUEST, HTTP_REQUEST_SECONDS
+from app.services.profiling import SamplingProfiler, is_admin_key, profile_store
+from app.services.tracing import current_trace_id, start_trace
+from app.services.unit_of_work import FlushError, flush_unit_of_work, unit_of_work
+
+logger = logging.getLogger(__name__)
+
+# Incoming trace ids are accepted only if they look like ours
+TRACE_ID_PATTERN = re.compile(r"^[0-9a-fA-F]{16,32}$")
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency per route template.
+
+    Routes are labelled by their path template (``/api/jobs/{job_id}``) rather
+    than the raw URL so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route_template(scope), status_code).observe(time.perf_counter() - started)
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening a trace per HTTP request.
+
+    An ``X-Trace-Id`` request header is reused as the trace id, and the id is
+    echoed back on the response so slow requests can be looked up later.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        incoming = headers.get(b"x-trace-id", b"").decode("latin-1")
+        trace_id = incoming if TRACE_ID_PATTERN.match(incoming) else None
+
+        with start_trace(f"{scope['method']} {scope['path']}", trace_id=trace_id, method=scope["method"], path=scope["path"]) as root:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    root.set_attribute("status", message["status"])
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"x-trace-id", root.trace.trace_id.encode("latin-1"))]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                root.name = f"{scope['method']} {route_template(scope)}"
+
+class UnitOfWorkMiddleware:
+    """Pure ASGI middleware giving each request its own unit of work.
+
+    Held writes are flushed before the response starts, so the client never
+    sees a success that is not stored yet; if a held write fails, the
+    response the route built is replaced with a 500. The request's storage
+    round trips are recorded per route.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with unit_of_work() as uow:
+            replaced = False
+
+            async def send_wrapper(message):
+                nonlocal replaced
+                if replaced:
+                    # The route's own response was dropped for the error below
+                    return
+                if message["type"] == "http.response.start":
+                    try:
+                        flush_unit_of_work()
+                    except FlushError as e:
+                        replaced = True
+                        logger.error("Request changes were not stored: %s", e, extra={"path": scope.get("path")})
+                        await send({"type": "http.response.start", "status": 500,
+                                    "headers": [(b"content-type", b"application/json")]})
+                        await send({"type": "http.response.body", "body": b'{"detail":"Failed to store changes"}'})
+                        return
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                try:
+                    flush_unit_of_work()
+                except FlushError as e:
+                    # Writes made after the response started; nothing left to tell the client
+                    logger.error("Request changes were not stored: %s", e, extra={"path": scope.get("path")})
+                DB_ROUND_TRIPS_PER_REQUEST.labels(route_template(scope)).observe(uow.round_trips)
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware running selected requests under the sampling profiler.
+
+    A request is profiled on demand when it carries ``X-Profile: 1`` (or the
+    ``profile=1`` query flag) together with ``X-Admin-Key`` matching
+    ADMIN_API_KEY, and in rolling mode for one in PROFILE_SAMPLE_EVERY
+    requests under PROFILE_SAMPLE_PATHS. The profile id is returned in the
+    ``X-Profile-Id`` response header. With both triggers off the middleware
+    is a single attribute check per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+        self.sample_every = int(os.getenv("PROFILE_SAMPLE_EVERY", "0"))
+        self.sample_paths = tuple(
+            path.strip() for path in os.getenv(
+                "PROFILE_SAMPLE_PATHS", "/api/webhooks/twilio/whatsapp,/api/jobs/"
+            ).split(",") if path.strip()
+        )
+        self.on_demand = bool(os.getenv("ADMIN_API_KEY"))
+        self.enabled = self.on_demand or self.sample_every > 0
+        self._counter = itertools.count(1)
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        reason = self._profile_reason(scope)
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = profile_store.new_id()
+        profiler = SamplingProfiler(self.interval)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode("latin-1"))]
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            # Waiting for the sampler and writing the profile would block the event loop
+            await run_in_threadpool(self._save, profile_id, profiler, scope, current_trace_id(), reason)
+
+    @staticmethod
+    def _save(profile_id, profiler, scope, trace_id, reason):
+        profiler.join()
+        profile_store.save(profile_id, profiler, scope["method"], scope["path"], trace_id, reason)
+
+    def _profile_reason(self, scope):
+        if self.on_demand:
+            headers = dict(scope.get("headers") or [])
+            requested = headers.get(b"x-profile") == b"1" or parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile") == ["1"]
+            if requested and is_admin_key(headers.get(b"x-admin-key", b"").decode("latin-1")):
+                return "requested"
+        if self.sample_every > 0 and scope["path"].startswith(self.sample_paths):
+            if next(self._counter) % self.sample_every == 0:
+                return "sampled"
+        return None
+
+def route_template(scope) -> str:
+    """Rebuild the matched route's path template from the request path and its path params."""
+    if "endpoint" not in scope:
+        return "unmatched"
+    path_params = scope.get("path_params") or {}
+    if not path_params:
+        return scope["path"]
+    names = {str(value): name for name, value in path_params.items()}
+    return "/".join(f"{{{names[segment]}}}" if segment in names else segment for segment in scope["path"].split("/"))
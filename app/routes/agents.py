@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 from typing import List, Optional
+import io
+import logging
 from datetime import datetime, timezone
 import sys
 import os
@@ -8,7 +11,13 @@ import os
 # Add the services directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
 
+from app.services.agent_index import agent_index
 from app.services.database import db_service
+from app.services.geo import geo_point
+from app.services.agent_import_service import AgentImportService, normalize_phone
+from app.services.availability_service import availability_service
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -23,6 +32,8 @@ class AgentBase(BaseModel):
     experience_years: Optional[int] = None
     rating: Optional[float] = None
     total_inspections: Optional[int] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
 
 class AgentCreate(AgentBase):
     pass
@@ -32,6 +43,32 @@ class AgentResponse(AgentBase):
     created_at: str
     updated_at: str
 
+class UnavailabilityCreate(BaseModel):
+    start: datetime
+    end: datetime
+    note: Optional[str] = None
+
+class BookingResponse(BaseModel):
+    booking_id: str
+    agent_phone: str
+    job_id: Optional[str] = None
+    kind: str
+    start: str
+    end: str
+    note: Optional[str] = None
+
+class BulkImportError(BaseModel):
+    line: Optional[int] = None
+    phone: Optional[str] = None
+    error: str
+
+class BulkImportResponse(BaseModel):
+    total: int
+    inserted: int
+    updated: int
+    rejected: int
+    errors: List[BulkImportError]
+
 @router.post("/", response_model=AgentResponse)
 async def create_agent(agent: AgentCreate):
     """Create a new agent."""
@@ -39,17 +76,41 @@ async def create_agent(agent: AgentCreate):
         agent_data = agent.dict()
         agent_data["created_at"] = datetime.now(timezone.utc).isoformat()
         agent_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+        if agent.latitude is not None and agent.longitude is not None:
+            agent_data["location"] = geo_point(agent.latitude, agent.longitude)
         
         result = db_service.insert_document("agents", agent_data)
         if result:
+            agent_index.invalidate()
             agent_data["id"] = result
             return agent_data
         else:
             raise HTTPException(status_code=500, detail="Failed to create agent")
     except Exception as e:
-        print(f"Error in create_agent: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in create_agent")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/bulk", response_model=BulkImportResponse)
+async def bulk_import_agents(file: UploadFile = File(...), format: Optional[str] = None, chunk_size: Optional[int] = None):
+    """Bulk import agents from a CSV, JSON or JSON Lines file, upserting by phone."""
+    try:
+        if format is None and file.filename:
+            extension = os.path.splitext(file.filename)[1].lstrip('.').lower()
+            if extension in ('csv', 'json', 'jsonl', 'ndjson'):
+                format = extension
+        
+        stream = io.TextIOWrapper(file.file, encoding='utf-8-sig', newline='')
+        import_service = AgentImportService()
+        # The import blocks on the database, so keep it off the event loop
+        try:
+            return await run_in_threadpool(import_service.import_stream, stream, format, chunk_size)
+        finally:
+            # Earlier chunks may have been written even if a later one failed
+            agent_index.invalidate()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error in bulk_import_agents")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/", response_model=List[AgentResponse])
@@ -78,9 +139,7 @@ async def get_agents():
             processed_agents.append(processed_agent)
         return processed_agents
     except Exception as e:
-        print(f"Error in get_agents: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in get_agents")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{agent_id}", response_model=AgentResponse)
@@ -104,9 +163,12 @@ async def update_agent(agent_id: str, agent_update: AgentCreate):
     try:
         update_data = agent_update.dict(exclude_unset=True)
         update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+        if agent_update.latitude is not None and agent_update.longitude is not None:
+            update_data["location"] = geo_point(agent_update.latitude, agent_update.longitude)
         
         success = db_service.update_document("agents", agent_id, update_data)
         if success:
+            agent_index.invalidate()
             # Get the updated agent
             updated_agent = db_service.find_document_by_id("agents", agent_id)
             if updated_agent:
@@ -118,9 +180,7 @@ async def update_agent(agent_id: str, agent_update: AgentCreate):
         else:
             raise HTTPException(status_code=404, detail="Agent not found")
     except Exception as e:
-        print(f"Error in update_agent: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in update_agent")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/{agent_id}")
@@ -129,11 +189,42 @@ async def delete_agent(agent_id: str):
     try:
         success = db_service.delete_document("agents", agent_id)
         if success:
+            agent_index.invalidate()
             return {"message": "Agent deleted successfully"}
         else:
             raise HTTPException(status_code=404, detail="Agent not found")
     except Exception as e:
-        print(f"Error in delete_agent: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in delete_agent")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{agent_phone}/bookings", response_model=List[BookingResponse])
+async def get_agent_bookings(agent_phone: str, include_past: bool = False):
+    """Inspections and blocked time on an agent's calendar."""
+    phone = normalize_phone(agent_phone)
+    if not phone:
+        raise HTTPException(status_code=400, detail="Invalid phone number")
+    since = None if include_past else datetime.now()
+    return await run_in_threadpool(availability_service.get_bookings, phone, since)
+
+@router.post("/{agent_phone}/unavailability", response_model=BookingResponse)
+async def block_agent_time(agent_phone: str, block: UnavailabilityCreate):
+    """Block out time when an agent cannot take inspections."""
+    phone = normalize_phone(agent_phone)
+    if not phone:
+        raise HTTPException(status_code=400, detail="Invalid phone number")
+    # Times are local wall-clock values, like inspection_date/inspection_time
+    start, end = block.start.replace(tzinfo=None), block.end.replace(tzinfo=None)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    conflicts = availability_service.conflicts(phone, start, end)
+    if conflicts:
+        raise HTTPException(status_code=409, detail={"message": "Overlaps existing bookings", "conflicts": conflicts})
+    return await run_in_threadpool(availability_service.book, phone, start, end, "unavailable", None, block.note)
+
+@router.delete("/{agent_phone}/bookings/{booking_id}")
+async def delete_agent_booking(agent_phone: str, booking_id: str):
+    """Remove a booking from an agent's calendar."""
+    phone = normalize_phone(agent_phone)
+    if not phone or not await run_in_threadpool(availability_service.release_booking, phone, booking_id):
+        raise HTTPException(status_code=404, detail="Booking not found")
+    return {"message": "Booking deleted successfully"}
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, Depends
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from app.services.job_service import JobService
 
@@ -16,6 +16,8 @@ class PropertyBase(BaseModel):
     bathrooms: Optional[int] = None
     price: Optional[float] = None
     area: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
 
 class ClientBase(BaseModel):
     client_id: str
@@ -53,11 +55,17 @@ class JobUpdate(BaseModel):
     inspection_time: Optional[str] = None
     notes: Optional[str] = None
 
+class JobCancel(BaseModel):
+    reason: Optional[str] = None
+
 class JobResponse(JobBase):
     id: str
+    job_code: Optional[str] = None
     created_at: str
     updated_at: str
     property_details: Optional[PropertyBase] = None
+    dispatched_to: Optional[List[str]] = None
+    dispatch_strategy: Optional[str] = None
     client_details: Optional[ClientBase] = None
 
     class Config:
@@ -164,6 +172,15 @@ async def complete_inspection(job_id: str, job_service: JobService = Depends(get
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: str, cancel: Optional[JobCancel] = None, job_service: JobService = Depends(get_job_service)):
+    """Cancel an inspection job that has not started."""
+    try:
+        result = job_service.cancel_job(job_id, cancel.reason if cancel else None)
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/agent/{agent_phone}/jobs", response_model=List[JobResponse])
 async def get_agent_jobs(agent_phone: str, job_service: JobService = Depends(get_job_service)):
     """Get all jobs assigned to a specific agent."""
@@ -0,0 +1,76 @@
+import logging
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from app.services.delivery_service import delivery_service
+from app.services.sender_pool import sender_pool
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+class StatusEvent(BaseModel):
+    status: str
+    at: str
+
+class MessageResponse(BaseModel):
+    message_sid: str
+    to: Optional[str] = None
+    job_id: Optional[str] = None
+    template: Optional[str] = None
+    sender: Optional[str] = None
+    status: Optional[str] = None
+    error_code: Optional[str] = None
+    sent_at: Optional[str] = None
+    timeline: List[StatusEvent]
+
+class LatencyPercentiles(BaseModel):
+    count: int
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    p95: Optional[float] = None
+    p99: Optional[float] = None
+
+class DeliveryStatsResponse(BaseModel):
+    since: str
+    template: Optional[str] = None
+    total: int
+    by_status: Dict[str, int]
+    latency_seconds: Dict[str, LatencyPercentiles]
+
+@router.get("/stats", response_model=DeliveryStatsResponse)
+async def get_delivery_stats(
+    since: Optional[datetime] = Query(None, description="Only messages sent after this time (default: last 24 hours)"),
+    template: Optional[str] = None
+):
+    """Status counts and send-to-delivered/read latency percentiles."""
+    try:
+        return await run_in_threadpool(delivery_service.get_stats, since, template)
+    except Exception as e:
+        logger.exception("Error computing delivery stats")
+        raise HTTPException(status_code=500, detail=str(e))
+
+class SenderStats(BaseModel):
+    sender: str
+    messages: int
+    tokens: Optional[float] = None
+
+@router.get("/senders", response_model=List[SenderStats])
+async def get_sender_stats():
+    """Messages sent from each pooled sender number since startup, and the slots each has free."""
+    return sender_pool.stats()
+
+@router.get("/", response_model=List[MessageResponse])
+async def get_messages_for_job(job_id: str):
+    """All messages sent for a job, with their delivery timelines."""
+    return await run_in_threadpool(delivery_service.get_messages_for_job, job_id)
+
+@router.get("/{message_sid}", response_model=MessageResponse)
+async def get_message(message_sid: str):
+    """A single message and its delivery timeline."""
+    message = await run_in_threadpool(delivery_service.get_message, message_sid)
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return message
@@ -1,7 +1,15 @@
+import asyncio
+import logging
 from fastapi import APIRouter, HTTPException, Request, Form, Depends
-from typing import Optional
+from typing import Dict, Optional, Tuple
+from app.services.agent_mailbox import agent_mailboxes
 from app.services.job_service import JobService
 from app.services.confirmation_service import confirmation_service
+from app.services.delivery_service import delivery_service
+from app.services.job_codes import job_codes, normalize_code
+from app.services.notification_digest import job_taken_digest
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -9,6 +17,152 @@ router = APIRouter()
 def get_job_service():
     return JobService()
 
+def parse_command(body: str) -> Tuple[str, Optional[str]]:
+    """Split an agent's reply into its command and optional job code.
+
+    A second word is only taken as a code when it has a code's length and
+    alphabet and a digit, so replies such as "YES PLEASE" or "YES YES"
+    still act as a bare YES.
+    """
+    words = body.strip().upper().split()
+    if not words:
+        return "", None
+    code = words[1] if len(words) > 1 and job_codes.is_code(words[1]) else None
+    return words[0], normalize_code(code) if code else None
+
+def addressed_to(job: Dict, agent_phone: str, command: str) -> bool:
+    """Whether an agent may act on a job named by its code: one offered to them, or one they hold."""
+    offered = job.get('dispatched_to')
+    was_offered = offered is None or agent_phone in offered
+    if command == 'YES':
+        return was_offered
+    if command in ('LIST', 'STATUS') and job.get('status') == 'pending':
+        return was_offered
+    return job.get('assigned_agent') == agent_phone
+
+def handle_agent_command(agent_phone: str, message: str, job_service: JobService) -> Dict:
+    """Act on one command from an agent; runs in their mailbox, after their earlier commands."""
+    # Anything the agent does should follow the notices of jobs they can no longer take
+    job_taken_digest.flush(agent_phone)
+    
+    # Parse the command and its optional job code ("YES 4K7")
+    command, job_code = parse_command(message)
+    
+    # A code names the job outright; without one the command picks the agent's likely job
+    coded_job = None
+    if job_code:
+        coded_job = job_service.get_job_by_code(job_code)
+        if not coded_job or not addressed_to(coded_job, agent_phone, command):
+            return {"status": "unknown_code", "message": f"No open inspection {job_code} for this agent"}
+    
+    # Handle different types of responses
+    if command == 'YES':
+        # Agent is accepting an inspection request
+        if coded_job:
+            pending_jobs = [coded_job]
+        else:
+            # Find the most recent pending job offered to this agent that hasn't been assigned yet
+            pending_jobs = job_service.get_pending_jobs()
+            
+            # Sort by creation date to get the most recent first
+            pending_jobs.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+        
+        lost_race = False
+        schedule_conflict = False
+        for job in pending_jobs:
+            # Jobs dispatched in waves only accept agents who have been offered them
+            offered = job.get('dispatched_to')
+            if offered is not None and agent_phone not in offered:
+                continue
+            # A coded YES for a job already taken still gets the agent an answer
+            if coded_job or (job['status'] == 'pending' and not job.get('assigned_agent')):
+                # Record the agent's response
+                confirmation_service.record_agent_response(job['id'], agent_phone, 'YES')
+                
+                # Try to assign this job to the agent
+                result = job_service.handle_agent_response(
+                    job['id'], 
+                    agent_phone, 
+                    'YES'
+                )
+                if result.get('pending'):
+                    # The assignment policy picks among claims once the window closes
+                    return {"status": "claim_recorded", "message": "Claim recorded", "job_id": job['id']}
+                if result['success']:
+                    logger.info("Job assigned", extra={"job_id": job['id'], "agent_phone": agent_phone})
+                    # Mark confirmation as complete
+                    confirmation_service.mark_confirmation_complete(job['id'], agent_phone)
+                    return {"status": "success", "message": "Job assigned", "job_id": job['id']}
+                if result.get('error') == 'Job already assigned':
+                    lost_race = True
+                elif result.get('error') == 'Schedule conflict':
+                    schedule_conflict = True
+        
+        # Another agent took the job between our read and our claim
+        if lost_race:
+            return {"status": "already_assigned", "message": "Inspection request already assigned"}
+        if schedule_conflict:
+            return {"status": "schedule_conflict", "message": "Inspection overlaps an existing booking"}
+        
+        # If no pending jobs found or all are already assigned
+        return {"status": "no_jobs", "message": "No available inspection requests"}
+        
+    elif command == 'CONFIRM':
+        # Agent is confirming the inspection schedule
+        # The coded job, or the agent's next assigned job
+        job = coded_job or job_service.get_current_job_for_agent(agent_phone, 'assigned')
+        
+        if job:
+            # Record the agent's response
+            confirmation_service.record_agent_response(job['id'], agent_phone, 'CONFIRM')
+            
+            result = job_service.approve_inspection_schedule(job['id'])
+            if result['success']:
+                # Mark confirmation as complete
+                confirmation_service.mark_confirmation_complete(job['id'], agent_phone)
+                return {"status": "success", "message": "Schedule confirmed"}
+        
+        return {"status": "no_assigned_jobs", "message": "No assigned jobs found"}
+        
+    elif command == 'START':
+        # Agent is starting the inspection
+        job = coded_job or job_service.get_current_job_for_agent(agent_phone, 'approved')
+        
+        if job:
+            result = job_service.start_inspection(job['id'])
+            if result['success']:
+                return {"status": "success", "message": "Inspection started"}
+        
+        return {"status": "no_approved_jobs", "message": "No approved jobs found"}
+        
+    elif command == 'COMPLETE':
+        # Agent is marking inspection as completed
+        job = coded_job or job_service.get_current_job_for_agent(agent_phone, 'in_progress')
+        
+        if job:
+            result = job_service.complete_inspection(job['id'])
+            if result['success']:
+                return {"status": "success", "message": "Inspection completed"}
+        
+        return {"status": "no_in_progress_jobs", "message": "No in-progress jobs found"}
+        
+    elif command in ('LIST', 'STATUS'):
+        # Reply with the agent's open offers and jobs, or just the coded one, in one message
+        if coded_job:
+            pending = coded_job['status'] == 'pending'
+            items = {"offers": [coded_job] if pending else [], "jobs": [] if pending else [coded_job]}
+        else:
+            items = job_service.get_open_items_for_agent(agent_phone)
+        job_service.whatsapp_service.send_agent_items(agent_phone, items['offers'], items['jobs'])
+        return {"status": "success", "message": "Open items sent", "offers": len(items['offers']), "jobs": len(items['jobs'])}
+        
+    else:
+        # Unknown command
+        return {
+            "status": "unknown_command",
+            "message": "Unknown command. Use YES to accept, CONFIRM to approve, START to begin, COMPLETE to finish, or LIST to see your open inspections; add the job code to pick one, e.g. YES 4K7."
+        }
+
 @router.post("/twilio/whatsapp")
 async def twilio_webhook(
     request: Request,
@@ -21,89 +175,13 @@ async def twilio_webhook(
         # Extract phone number (remove whatsapp: prefix)
         agent_phone = From.replace('whatsapp:', '')
         
-        # Parse the message body
-        message_body = Body.strip().upper()
-        
-        # Handle different types of responses
-        if message_body == 'YES':
-            # Agent is accepting an inspection request
-            # Find the most recent pending job that hasn't been assigned yet
-            pending_jobs = job_service.get_pending_jobs()
-            
-            # Sort by creation date to get the most recent first
-            pending_jobs.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-            
-            for job in pending_jobs:
-                if job['status'] == 'pending' and not job.get('assigned_agent'):
-                    # Record the agent's response
-                    confirmation_service.record_agent_response(job['id'], agent_phone, 'YES')
-                    
-                    # Try to assign this job to the agent
-                    result = job_service.handle_agent_response(
-                        job['id'], 
-                        agent_phone, 
-                        'YES'
-                    )
-                    if result['success']:
-                        print(f"Job {job['id']} assigned to {agent_phone}")
-                        # Mark confirmation as complete
-                        confirmation_service.mark_confirmation_complete(job['id'], agent_phone)
-                        return {"status": "success", "message": "Job assigned"}
-            
-            # If no pending jobs found or all are already assigned
-            return {"status": "no_jobs", "message": "No available inspection requests"}
-            
-        elif message_body == 'CONFIRM':
-            # Agent is confirming the inspection schedule
-            # Find the assigned job for this agent
-            agent_jobs = job_service.get_jobs_by_agent(agent_phone)
-            
-            for job in agent_jobs:
-                if job['status'] == 'assigned':
-                    # Record the agent's response
-                    confirmation_service.record_agent_response(job['id'], agent_phone, 'CONFIRM')
-                    
-                    result = job_service.approve_inspection_schedule(job['id'])
-                    if result['success']:
-                        # Mark confirmation as complete
-                        confirmation_service.mark_confirmation_complete(job['id'], agent_phone)
-                        return {"status": "success", "message": "Schedule confirmed"}
-            
-            return {"status": "no_assigned_jobs", "message": "No assigned jobs found"}
-            
-        elif message_body == 'START':
-            # Agent is starting the inspection
-            agent_jobs = job_service.get_jobs_by_agent(agent_phone)
-            
-            for job in agent_jobs:
-                if job['status'] == 'approved':
-                    result = job_service.start_inspection(job['id'])
-                    if result['success']:
-                        return {"status": "success", "message": "Inspection started"}
-            
-            return {"status": "no_approved_jobs", "message": "No approved jobs found"}
-            
-        elif message_body == 'COMPLETE':
-            # Agent is marking inspection as completed
-            agent_jobs = job_service.get_jobs_by_agent(agent_phone)
-            
-            for job in agent_jobs:
-                if job['status'] == 'in_progress':
-                    result = job_service.complete_inspection(job['id'])
-                    if result['success']:
-                        return {"status": "success", "message": "Inspection completed"}
-            
-            return {"status": "no_in_progress_jobs", "message": "No in-progress jobs found"}
-            
-        else:
-            # Unknown command
-            return {
-                "status": "unknown_command",
-                "message": "Unknown command. Use YES to accept, CONFIRM to approve, or COMPLETE to finish."
-            }
+        # Commands from one agent run in arrival order; other agents' run alongside
+        return await asyncio.wrap_future(
+            agent_mailboxes.submit(agent_phone, handle_agent_command, agent_phone, Body, job_service)
+        )
             
     except Exception as e:
-        print(f"Error processing webhook: {str(e)}")
+        logger.exception("Error processing webhook", extra={"agent_phone": From.replace('whatsapp:', '')})
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/twilio/status")
@@ -117,21 +195,19 @@ async def twilio_status_callback(
     MessageSid: str = Form(...),
     MessageStatus: str = Form(...),
     To: str = Form(...),
-    From: str = Form(...)
+    From: str = Form(...),
+    ErrorCode: Optional[str] = Form(None)
 ):
     """Handle Twilio message status callbacks."""
     try:
-        print(f"Message Status Update:")
-        print(f"  MessageSid: {MessageSid}")
-        print(f"  Status: {MessageStatus}")
-        print(f"  To: {To}")
-        print(f"  From: {From}")
-        
-        # You can store message status in database if needed
-        # For now, just log it
+        logger.info(
+            "Message status update: %s", MessageStatus,
+            extra={"event": "message_status", "message_sid": MessageSid, "to": To, "from_number": From}
+        )
+        delivery_service.record_status(MessageSid, MessageStatus, error_code=ErrorCode)
         
         return {"status": "success", "message": "Status callback received"}
         
     except Exception as e:
-        print(f"Error processing status callback: {str(e)}")
+        logger.error("Error processing status callback: %s", e, extra={"message_sid": MessageSid})
         raise HTTPException(status_code=500, detail=str(e))
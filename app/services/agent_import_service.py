@@ -0,0 +1,265 @@
+import csv
+import io
+import json
+import os
+import re
+from typing import Dict, Iterator, Optional, TextIO, Tuple
+from app.services.database import db_service
+from app.services.geo import coordinates, geo_point
+
+# Fields accepted from import files, with the type each one is coerced to
+AGENT_FIELDS = {
+    "agent_id": str,
+    "name": str,
+    "phone": str,
+    "email": str,
+    "status": str,
+    "zone": str,
+    "specializations": list,
+    "experience_years": int,
+    "rating": float,
+    "total_inspections": int,
+    "latitude": float,
+    "longitude": float,
+}
+
+VALID_STATUSES = {"active", "inactive", "suspended"}
+MAX_REPORTED_ERRORS = 100
+
+def normalize_phone(phone: str, default_country_code: Optional[str] = None) -> Optional[str]:
+    """Normalize a phone number to E.164 (e.g. 08012345678 -> +2348012345678).
+
+    Returns None when the value cannot be turned into a plausible number.
+    """
+    if phone is None:
+        return None
+    if default_country_code is None:
+        default_country_code = os.getenv("DEFAULT_COUNTRY_CODE", "234")
+
+    value = str(phone).strip().replace('whatsapp:', '')
+    has_plus = value.startswith('+')
+    digits = re.sub(r'\D', '', value)
+    if not digits:
+        return None
+
+    if not has_plus:
+        if digits.startswith('00'):
+            digits = digits[2:]
+        elif digits.startswith('0'):
+            # Local trunk prefix, e.g. 0803... in Nigeria
+            digits = default_country_code + digits[1:]
+        elif len(digits) <= 10:
+            digits = default_country_code + digits
+
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f"+{digits}"
+
+class AgentImportService:
+    """Service for bulk importing and upserting agents from CSV/JSON files."""
+
+    def __init__(self, db=None, chunk_size: Optional[int] = None):
+        self.db = db if db is not None else db_service
+        self.chunk_size = chunk_size or int(os.getenv("AGENT_IMPORT_CHUNK_SIZE", "500"))
+
+    def import_stream(self, stream: TextIO, file_format: Optional[str] = None, chunk_size: Optional[int] = None) -> Dict:
+        """Stream agent records from a text stream and upsert them keyed on phone."""
+        chunk_size = chunk_size or self.chunk_size
+        summary = {"total": 0, "inserted": 0, "updated": 0, "rejected": 0, "errors": []}
+
+        chunk: Dict[str, Dict] = {}
+        for line_number, record in self.iter_records(stream, file_format):
+            summary["total"] += 1
+            agent, error = self.normalize_record(record)
+            if error:
+                self._reject(summary, line_number, record.get("phone") if isinstance(record, dict) else None, error)
+                continue
+
+            # Later rows for the same phone win, so one chunk never upserts a key twice
+            chunk[agent["phone"]] = agent
+            if len(chunk) >= chunk_size:
+                self._flush(chunk, summary)
+                chunk = {}
+
+        if chunk:
+            self._flush(chunk, summary)
+
+        return summary
+
+    def iter_records(self, stream: TextIO, file_format: Optional[str] = None) -> Iterator[Tuple[int, Dict]]:
+        """Yield (line/item number, raw record) pairs from a CSV, JSON array or JSON Lines stream."""
+        if file_format is None:
+            file_format, stream = self._sniff_format(stream)
+        file_format = file_format.lower()
+
+        if file_format == "csv":
+            reader = csv.DictReader(stream)
+            for record in reader:
+                yield reader.line_num, record
+        elif file_format in ("jsonl", "ndjson"):
+            for line_number, line in enumerate(stream, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, {"_error": f"Invalid JSON: {e.msg}"}
+        elif file_format == "json":
+            for index, record in enumerate(self._iter_json_array(stream), start=1):
+                yield index, record
+        else:
+            raise ValueError(f"Unsupported import format: {file_format}")
+
+    def normalize_record(self, record: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+        """Validate and coerce a raw record into an agent document."""
+        if not isinstance(record, dict):
+            return None, "Record is not an object"
+        if "_error" in record:
+            return None, record["_error"]
+
+        agent = {}
+        for field, field_type in AGENT_FIELDS.items():
+            value = record.get(field)
+            if value is None or (isinstance(value, str) and value.strip() == ""):
+                continue
+            try:
+                agent[field] = self._coerce(value, field_type)
+            except (TypeError, ValueError):
+                return None, f"Invalid value for {field}: {value!r}"
+
+        phone = normalize_phone(agent.get("phone"))
+        if not phone:
+            return None, "Missing or invalid phone"
+        agent["phone"] = phone
+
+        if not agent.get("name"):
+            return None, "Missing name"
+
+        if "status" in agent:
+            agent["status"] = agent["status"].lower()
+            if agent["status"] not in VALID_STATUSES:
+                return None, f"Invalid status: {agent['status']}"
+
+        if "latitude" in agent or "longitude" in agent:
+            point = coordinates(agent)
+            if point is None:
+                return None, "Latitude and longitude must both be given and in range"
+            agent["location"] = geo_point(*point)
+
+        return agent, None
+
+    @staticmethod
+    def new_agent_defaults(agent: Dict) -> Dict:
+        """Fields a new agent gets when the file leaves them out; never written over an existing agent."""
+        return {"status": "active", "agent_id": f"agent_{agent['phone'].lstrip('+')}"}
+
+    def _flush(self, chunk: Dict[str, Dict], summary: Dict) -> None:
+        """Upsert one chunk and fold its counts into the summary."""
+        result = self.db.bulk_upsert("agents", "phone", list(chunk.values()), self.new_agent_defaults)
+        summary["inserted"] += result["inserted"]
+        summary["updated"] += result["updated"]
+        for error in result["errors"]:
+            self._reject(summary, None, error.get("phone"), error["error"])
+
+    def _reject(self, summary: Dict, line_number: Optional[int], phone: Optional[str], error: str) -> None:
+        summary["rejected"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"line": line_number, "phone": phone, "error": error})
+
+    def _coerce(self, value, field_type):
+        if field_type is list:
+            if isinstance(value, list):
+                return [str(item).strip() for item in value if str(item).strip()]
+            # CSV cells hold specializations as "Apartments;Luxury Homes"
+            return [item.strip() for item in re.split(r'[;|]', str(value)) if item.strip()]
+        if field_type is int:
+            return int(float(value))
+        if field_type is float:
+            return float(value)
+        return str(value).strip()
+
+    def _sniff_format(self, stream: TextIO) -> Tuple[str, TextIO]:
+        """Guess the format from the first non-whitespace character."""
+        head = stream.read(1024)
+        replay = _PrefixedStream(head, stream)
+        first = head.lstrip()[:1]
+        if first == "[":
+            return "json", replay
+        if first == "{":
+            return "jsonl", replay
+        return "csv", replay
+
+    def _iter_json_array(self, stream: TextIO, read_size: int = 65536) -> Iterator[Dict]:
+        """Incrementally decode the objects of a top-level JSON array."""
+        decoder = json.JSONDecoder()
+        buffer = ""
+        started = False
+        eof = False
+        while True:
+            position = 0
+            while True:
+                # Skip whitespace and separators between array items
+                while position < len(buffer) and buffer[position] in " \t\r\n,":
+                    position += 1
+                if not started and position < len(buffer):
+                    if buffer[position] != "[":
+                        raise ValueError("JSON import must be an array of agent objects")
+                    started = True
+                    position += 1
+                    continue
+                if position < len(buffer) and buffer[position] == "]":
+                    return
+                try:
+                    record, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise ValueError("Truncated or invalid JSON array")
+                    break
+                yield record
+                position = end
+            buffer = buffer[position:]
+            if eof:
+                return
+            data = stream.read(read_size)
+            if not data:
+                eof = True
+            buffer += data
+
+class _PrefixedStream(io.TextIOBase):
+    """Text stream that replays an already-read prefix before the rest of the stream."""
+
+    def __init__(self, prefix: str, stream: TextIO):
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        if self._prefix:
+            if size is None or size < 0:
+                data, self._prefix = self._prefix + self._stream.read(), ""
+                return data
+            data, self._prefix = self._prefix[:size], self._prefix[size:]
+            return data
+        return self._stream.read(size)
+
+    def readline(self, size: int = -1) -> str:
+        if self._prefix:
+            newline = self._prefix.find("\n")
+            if newline >= 0:
+                data, self._prefix = self._prefix[:newline + 1], self._prefix[newline + 1:]
+                return data
+            data, self._prefix = self._prefix, ""
+            return data + self._stream.readline()
+        return self._stream.readline(size)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
@@ -0,0 +1,187 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, FrozenSet, List, Optional
+from app.services.database import db_service
+from app.services.geo import GridIndex, coordinates
+from app.services.metrics import record_cache_access
+from app.services.storage import StorageBackend
+from app.services.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+def normalize_term(value) -> Optional[str]:
+    """Canonical key for zones and specializations ("Luxury Apartments" -> "luxury apartment")."""
+    if not value:
+        return None
+    words = []
+    for word in _WORD.findall(str(value).lower()):
+        if len(word) > 4 and word.endswith(("xes", "ches", "shes", "sses", "zes")):
+            word = word[:-2]
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return " ".join(words) or None
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def rank_agents(agents) -> List[Dict]:
+    """Best-rated, most experienced agents first; phone breaks ties so the order is stable."""
+    return sorted(agents, key=lambda agent: (-_number(agent.get("rating")), -_number(agent.get("experience_years")), agent["phone"]))
+
+class AgentSnapshot:
+    """Immutable view of the active roster with zone, specialization and location indexes."""
+
+    def __init__(self, agents: List[Dict]):
+        self.loaded_at = time.monotonic()
+        self.by_phone: Dict[str, Dict] = {}
+        by_zone = defaultdict(set)
+        by_specialization = defaultdict(set)
+        self.geo = GridIndex()
+        for agent in agents:
+            phone = agent.get("phone")
+            if not phone:
+                continue
+            self.by_phone[phone] = agent
+            point = coordinates(agent)
+            if point:
+                self.geo.add(phone, *point)
+            zone = normalize_term(agent.get("zone"))
+            if zone:
+                by_zone[zone].add(phone)
+            specializations = agent.get("specializations") or []
+            if isinstance(specializations, str):
+                specializations = specializations.split(",")
+            for specialization in specializations:
+                key = normalize_term(specialization)
+                if key:
+                    by_specialization[key].add(phone)
+        self.by_zone: Dict[str, FrozenSet[str]] = {k: frozenset(v) for k, v in by_zone.items()}
+        self.by_specialization: Dict[str, FrozenSet[str]] = {k: frozenset(v) for k, v in by_specialization.items()}
+
+class DispatchPlan:
+    """Agents selected for a job and how they were chosen."""
+
+    def __init__(self, agents: List[Dict], strategy: str, distances_km: Optional[Dict[str, float]] = None):
+        self.agents = agents
+        self.strategy = strategy
+        self.distances_km = distances_km or {}
+
+    @property
+    def phones(self) -> List[str]:
+        return [agent["phone"] for agent in self.agents]
+
+class AgentIndex:
+    """Cached roster of active agents with inverted indexes for dispatch matching.
+
+    The roster is rebuilt from storage when it is older than AGENT_INDEX_TTL
+    seconds or after invalidate(), which the agent routes call on every write.
+    """
+
+    def __init__(self, db: Optional[StorageBackend] = None, ttl: Optional[float] = None):
+        self.db = db if db is not None else db_service
+        self.ttl = ttl if ttl is not None else float(os.getenv("AGENT_INDEX_TTL", "60"))
+        self._snapshot: Optional[AgentSnapshot] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def snapshot(self) -> AgentSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.loaded_at < self.ttl:
+            record_cache_access("agent_index", True)
+            return snapshot
+        record_cache_access("agent_index", False)
+        with self._lock:
+            # Another thread may have rebuilt it while we waited
+            snapshot = self._snapshot
+            if snapshot is None or time.monotonic() - snapshot.loaded_at >= self.ttl:
+                snapshot = AgentSnapshot(self.db.find_documents("agents", {"status": "active"}))
+                self._snapshot = snapshot
+            return snapshot
+
+    def active_agents(self) -> List[Dict]:
+        return list(self.snapshot().by_phone.values())
+
+    def get_agent(self, phone: str) -> Optional[Dict]:
+        return self.snapshot().by_phone.get(phone)
+
+    @traced("AgentIndex.match")
+    def match(self, property_details: Dict, mode: Optional[str] = None, fallback: Optional[str] = None,
+              max_agents: Optional[int] = None, available: Optional[Callable[[str], bool]] = None) -> DispatchPlan:
+        """Select agents for a property.
+
+        Only agents ``available`` accepts are considered, so busy agents
+        never count towards a match. In ``targeted`` mode agents must serve
+        the property's area (zone) and specialize in its property type; when
+        nobody qualifies on both, the zone alone is used. In ``nearest`` mode
+        a property with coordinates goes to the DISPATCH_NEAREST_COUNT
+        closest agents, optionally within DISPATCH_MAX_DISTANCE_KM, a busy
+        agent making way for the next nearest; properties without coordinates
+        are matched as in ``targeted`` mode. If nobody qualifies,
+        DISPATCH_FALLBACK decides between broadcasting to everyone and
+        sending to no one; a broadcast that finds nobody free has the
+        ``no_available_agents`` strategy.
+        """
+        mode = (mode or os.getenv("DISPATCH_MODE", "targeted")).lower()
+        fallback = (fallback or os.getenv("DISPATCH_FALLBACK", "broadcast")).lower()
+        max_agents = max_agents if max_agents is not None else int(os.getenv("DISPATCH_MAX_AGENTS", "0"))
+        snapshot = self.snapshot()
+
+        def free(phones) -> FrozenSet[str]:
+            return frozenset(phones) if available is None else frozenset(filter(available, phones))
+
+        def broadcast(strategy: str) -> DispatchPlan:
+            agents = rank_agents(snapshot.by_phone[phone] for phone in free(snapshot.by_phone))
+            return DispatchPlan(agents, strategy if agents else "no_available_agents")
+
+        if mode == "broadcast":
+            return broadcast("broadcast")
+
+        point = coordinates(property_details)
+        if mode == "nearest" and point:
+            count = int(os.getenv("DISPATCH_NEAREST_COUNT", "10"))
+            max_km = float(os.getenv("DISPATCH_MAX_DISTANCE_KM", "0")) or None
+            nearest = snapshot.geo.nearest(point[0], point[1], count, max_km=max_km, accept=available)
+            if nearest:
+                # Already ordered nearest first, which is the order waves go out in
+                return DispatchPlan([snapshot.by_phone[phone] for _, phone in nearest], "nearest",
+                                    {phone: round(distance, 3) for distance, phone in nearest})
+            if fallback != "broadcast":
+                return DispatchPlan([], "no_match")
+            return broadcast("broadcast_fallback")
+
+        zone = normalize_term(property_details.get("area"))
+        specialization = normalize_term(property_details.get("property_type"))
+        in_zone = free(snapshot.by_zone.get(zone, ())) if zone else None
+        specialists = free(snapshot.by_specialization.get(specialization, ())) if specialization else None
+
+        if in_zone is not None and specialists is not None and in_zone & specialists:
+            phones, strategy = in_zone & specialists, "zone_and_specialization"
+        elif in_zone:
+            phones, strategy = in_zone, "zone"
+        elif in_zone is None and specialists:
+            phones, strategy = specialists, "specialization"
+        elif fallback == "broadcast":
+            return broadcast("broadcast_fallback")
+        else:
+            return DispatchPlan([], "no_match")
+
+        # Ranked so that a cap, or dispatching in waves, reaches the strongest candidates first
+        agents = rank_agents(snapshot.by_phone[phone] for phone in phones)
+        if max_agents > 0:
+            agents = agents[:max_agents]
+        return DispatchPlan(agents, strategy)
+
+# Global agent index instance
+agent_index = AgentIndex()
@@ -0,0 +1,104 @@
+import atexit
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Optional, Tuple
+from app.services.metrics import AGENT_COMMAND_WAIT_SECONDS, AGENT_MAILBOXES
+from app.services.unit_of_work import flush_unit_of_work
+
+logger = logging.getLogger(__name__)
+
+# A queued command: its callable and arguments, the caller's context, its future and when it was queued
+Command = Tuple[Callable, tuple, contextvars.Context, Future, float]
+
+class AgentMailboxes:
+    """Runs inbound agent commands in order per agent and in parallel across agents.
+
+    Each agent phone has its own mailbox. ``submit`` appends a command to
+    it and, if the mailbox was idle, hands the mailbox to one of
+    AGENT_MAILBOX_WORKERS threads, which runs its commands one after
+    another until it is empty. A quick YES then CONFIRM from one agent is
+    therefore handled in the order it arrived, the CONFIRM seeing
+    everything the YES wrote, while other agents' commands run on other
+    workers instead of waiting behind it. Commands run in the submitting
+    request's context, so they share its trace and unit of work, whose
+    held writes are flushed before the agent's next command starts. With
+    AGENT_MAILBOX_WORKERS=0 commands run inline in the caller.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers if workers is not None else int(os.getenv("AGENT_MAILBOX_WORKERS", "8"))
+        self._mailboxes: Dict[str, Deque[Command]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def submit(self, agent_phone: str, func: Callable, *args) -> Future:
+        """Queue a command behind the agent's earlier ones; the future resolves to its result."""
+        future: Future = Future()
+        command = (func, args, contextvars.copy_context(), future, time.perf_counter())
+        if self.workers <= 0:
+            self._run(command)
+            return future
+        with self._lock:
+            mailbox = self._mailboxes.get(agent_phone)
+            if mailbox is not None:
+                # A worker already owns this agent's mailbox and will get to it
+                mailbox.append(command)
+                return future
+            self._mailboxes[agent_phone] = deque([command])
+            AGENT_MAILBOXES.inc()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="agent-mailbox")
+            self._executor.submit(self._drain, agent_phone)
+        return future
+
+    def _drain(self, agent_phone: str):
+        while True:
+            with self._lock:
+                mailbox = self._mailboxes[agent_phone]
+                if not mailbox:
+                    # Removed under the lock, so the next submit starts a fresh drain
+                    del self._mailboxes[agent_phone]
+                    AGENT_MAILBOXES.dec()
+                    return
+                command = mailbox.popleft()
+            self._run(command)
+
+    def _run(self, command: Command):
+        func, args, context, future, queued_at = command
+        AGENT_COMMAND_WAIT_SECONDS.observe(time.perf_counter() - queued_at)
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = context.run(self._call, func, args)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    @staticmethod
+    def _call(func: Callable, args: tuple):
+        try:
+            return func(*args)
+        finally:
+            # The agent's next command may run before this request finishes responding
+            flush_unit_of_work()
+
+    def backlog(self, agent_phone: str) -> int:
+        """Commands waiting behind the one running for an agent."""
+        with self._lock:
+            return len(self._mailboxes.get(agent_phone, ()))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+# Global agent mailboxes instance
+agent_mailboxes = AgentMailboxes()
+atexit.register(agent_mailboxes.shutdown)
@@ -0,0 +1,191 @@
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, List, Optional, Tuple
+from app.services.database import db_service
+from app.services.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+# Statuses in which a job still occupies its agent
+OPEN_STATUSES = ("assigned", "approved", "in_progress")
+
+def _timestamp(value) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        parsed = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+class WorkloadIndex:
+    """Open jobs and recent assignments per agent.
+
+    Loaded from storage on first use, and updated in O(1) by JobService on
+    every status transition. Once WORKLOAD_INDEX_TTL seconds old it is
+    reloaded on a background thread while callers keep reading the current
+    counts; transitions made during the reload are applied again on top
+    of it, so none is lost when it is swapped in (one the reload already
+    saw counts twice until the next reload).
+    """
+
+    def __init__(self, db: Optional[StorageBackend] = None, ttl: Optional[float] = None, recent_hours: Optional[float] = None):
+        self.db = db if db is not None else db_service
+        self.ttl = ttl if ttl is not None else float(os.getenv("WORKLOAD_INDEX_TTL", "300"))
+        self.recent_seconds = 3600 * (recent_hours if recent_hours is not None else float(os.getenv("FAIR_RECENT_HOURS", "24")))
+        self._open: Dict[str, int] = defaultdict(int)
+        self._recent: Dict[str, Deque[float]] = defaultdict(deque)
+        self._loaded_at: Optional[float] = None
+        # Transitions seen while a background reload runs, None when none is running
+        self._changes_during_reload: Optional[List[Tuple]] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self) -> bool:
+        """Load on first use, returning True; later, start a background reload once stale."""
+        if self._loaded_at is None:
+            self._open, self._recent = self._load()
+            self._loaded_at = time.monotonic()
+            return True
+        if time.monotonic() - self._loaded_at >= self.ttl and self._changes_during_reload is None:
+            self._changes_during_reload = []
+            threading.Thread(target=self._reload, name="workload-index-reload", daemon=True).start()
+        return False
+
+    def _reload(self):
+        try:
+            open_jobs, recent = self._load()
+        except Exception:
+            logger.exception("Failed to reload the workload index")
+            with self._lock:
+                # Keep serving the current counts and try again after another TTL
+                self._changes_during_reload = None
+                self._loaded_at = time.monotonic()
+            return
+        with self._lock:
+            changes, self._changes_during_reload = self._changes_during_reload or [], None
+            self._open, self._recent = open_jobs, recent
+            self._loaded_at = time.monotonic()
+            for change in changes:
+                self._apply(*change)
+
+    def _load(self) -> Tuple[Dict[str, int], Dict[str, Deque[float]]]:
+        open_jobs: Dict[str, int] = defaultdict(int)
+        recent: Dict[str, Deque[float]] = defaultdict(deque)
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.recent_seconds)
+        for job in self.db.find_documents("jobs", {"status": {"$in": list(OPEN_STATUSES)}}):
+            if job.get("assigned_agent"):
+                open_jobs[job["assigned_agent"]] += 1
+        for job in self.db.find_documents("jobs", {"assigned_at": {"$gte": cutoff.isoformat()}}):
+            assigned_at = _timestamp(job.get("assigned_at"))
+            if job.get("assigned_agent") and assigned_at:
+                recent[job["assigned_agent"]].append(assigned_at)
+        for times in recent.values():
+            ordered = sorted(times)
+            times.clear()
+            times.extend(ordered)
+        return open_jobs, recent
+
+    def job_changed(self, before_agent: Optional[str], before_status: Optional[str],
+                    after_agent: Optional[str], after_status: Optional[str]):
+        """Apply one job's transition, after it has been written; pass None for a job that did not or no longer exists."""
+        with self._lock:
+            if self._ensure_loaded():
+                # A fresh load already reflects the write
+                return
+            change = (before_agent, before_status, after_agent, after_status, time.time())
+            if self._changes_during_reload is not None:
+                self._changes_during_reload.append(change)
+            self._apply(*change)
+
+    def _apply(self, before_agent: Optional[str], before_status: Optional[str],
+               after_agent: Optional[str], after_status: Optional[str], changed_at: float):
+        if before_agent and before_status in OPEN_STATUSES:
+            self._open[before_agent] = max(0, self._open[before_agent] - 1)
+        if after_agent and after_status in OPEN_STATUSES:
+            self._open[after_agent] += 1
+        if after_agent and after_status == "assigned" and (before_status != "assigned" or before_agent != after_agent):
+            self._recent[after_agent].append(changed_at)
+
+    def open_jobs(self, agent_phone: str) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return self._open.get(agent_phone, 0)
+
+    def recent_assignments(self, agent_phone: str) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            times = self._recent.get(agent_phone)
+            if not times:
+                return 0
+            cutoff = time.time() - self.recent_seconds
+            while times and times[0] < cutoff:
+                times.popleft()
+            return len(times)
+
+class AssignmentPolicy:
+    """Collects competing YES replies for a job and picks the best-suited agent.
+
+    With ASSIGNMENT_WINDOW_SECONDS at 0 (the default) the first YES wins, as
+    before. Otherwise claims are gathered for that long after the first one
+    and the winner is the agent with the highest score:
+
+        FAIR_WEIGHT_RATING * rating
+        - FAIR_WEIGHT_LOAD * open jobs
+        - FAIR_WEIGHT_RECENT * jobs assigned in the last FAIR_RECENT_HOURS
+
+    Ties go to the earliest claim. Claims live in this process, alongside the
+    scheduler job that resolves them.
+    """
+
+    def __init__(self, workload: WorkloadIndex, window: Optional[float] = None):
+        self.workload = workload
+        self.window = window if window is not None else float(os.getenv("ASSIGNMENT_WINDOW_SECONDS", "0"))
+        self.weight_rating = float(os.getenv("FAIR_WEIGHT_RATING", "0.5"))
+        self.weight_load = float(os.getenv("FAIR_WEIGHT_LOAD", "1.0"))
+        self.weight_recent = float(os.getenv("FAIR_WEIGHT_RECENT", "0.5"))
+        self._claims: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def add_claim(self, job_id: str, agent_phone: str) -> bool:
+        """Record a YES; returns True when it is the first claim, which opens the window."""
+        with self._lock:
+            claims = self._claims.setdefault(job_id, {})
+            claims.setdefault(agent_phone, time.time())
+            return len(claims) == 1
+
+    def take_claims(self, job_id: str) -> List[Tuple[str, float]]:
+        """Close the window and return its claims, earliest first."""
+        with self._lock:
+            claims = self._claims.pop(job_id, {})
+        return sorted(claims.items(), key=lambda claim: claim[1])
+
+    def score(self, agent: Dict) -> float:
+        phone = agent.get("phone")
+        try:
+            rating = float(agent.get("rating") or 0)
+        except (TypeError, ValueError):
+            rating = 0.0
+        return (
+            self.weight_rating * rating
+            - self.weight_load * self.workload.open_jobs(phone)
+            - self.weight_recent * self.workload.recent_assignments(phone)
+        )
+
+    def rank(self, claimants: List[Tuple[str, Dict]]) -> List[str]:
+        """Claimant phones, best first; ``claimants`` is (phone, agent) in claim order."""
+        scored = [(-self.score(agent), position, phone) for position, (phone, agent) in enumerate(claimants)]
+        return [phone for _, _, phone in sorted(scored)]
+
+# Global workload index and assignment policy instances
+workload_index = WorkloadIndex()
+assignment_policy = AssignmentPolicy(workload_index)
@@ -0,0 +1,185 @@
+import bisect
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from app.services.database import db_service
+from app.services.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+BOOKINGS_COLLECTION = "bookings"
+BOOKING_KINDS = ("inspection", "unavailable")
+
+def inspection_window(inspection_date: Optional[str], inspection_time: Optional[str],
+                      duration_minutes: Optional[int] = None) -> Optional[Tuple[datetime, datetime]]:
+    """(start, end) an inspection occupies, or None when the date/time cannot be parsed.
+
+    Times are the local wall-clock values clients submit, as the scheduler uses them.
+    """
+    if duration_minutes is None:
+        duration_minutes = int(os.getenv("INSPECTION_DURATION_MINUTES", "60"))
+    try:
+        start = datetime.fromisoformat(f"{inspection_date} {inspection_time or '00:00'}")
+    except (TypeError, ValueError):
+        return None
+    return start, start + timedelta(minutes=duration_minutes)
+
+def _format(moment: datetime) -> str:
+    # Fixed-width ISO strings sort chronologically on every storage engine
+    return moment.strftime("%Y-%m-%dT%H:%M:%S")
+
+class AgentCalendar:
+    """One agent's bookings as intervals sorted by start.
+
+    Overlap queries bisect on the start times. Any booking overlapping
+    [start, end) must begin after ``start - longest``, where ``longest`` is
+    the longest booking held, so only that slice is inspected.
+    """
+
+    def __init__(self):
+        self.starts: List[datetime] = []
+        self.entries: List[Tuple[datetime, datetime, str, Optional[str]]] = []
+        self.longest = timedelta(0)
+
+    def add(self, start: datetime, end: datetime, booking_id: str, job_id: Optional[str] = None):
+        position = bisect.bisect_right(self.starts, start)
+        self.starts.insert(position, start)
+        self.entries.insert(position, (start, end, booking_id, job_id))
+        self.longest = max(self.longest, end - start)
+
+    def remove(self, booking_id: str) -> bool:
+        for position, entry in enumerate(self.entries):
+            if entry[2] == booking_id:
+                del self.starts[position]
+                del self.entries[position]
+                return True
+        return False
+
+    def overlapping(self, start: datetime, end: datetime, ignore_job_id: Optional[str] = None) -> List[Tuple[datetime, datetime, str, Optional[str]]]:
+        low = bisect.bisect_right(self.starts, start - self.longest)
+        high = bisect.bisect_left(self.starts, end)
+        return [
+            entry for entry in self.entries[low:high]
+            if entry[1] > start and (ignore_job_id is None or entry[3] != ignore_job_id)
+        ]
+
+class AvailabilityService:
+    """Agent bookings with a per-agent interval index for conflict checks.
+
+    The index covers bookings ending after now and is rebuilt from storage
+    every AVAILABILITY_INDEX_TTL seconds, so writes made by other processes
+    show up within that window. Writes made here update it immediately, and
+    claims re-read the claiming agent's bookings before they are checked.
+    """
+
+    def __init__(self, db: Optional[StorageBackend] = None, ttl: Optional[float] = None):
+        self.db = db if db is not None else db_service
+        self.ttl = ttl if ttl is not None else float(os.getenv("AVAILABILITY_INDEX_TTL", "60"))
+        self._calendars: Dict[str, AgentCalendar] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.RLock()
+
+    def _index(self) -> Dict[str, AgentCalendar]:
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl:
+                self._calendars = {}
+                query = {"end": {"$gt": _format(datetime.now())}}
+                for booking in self.db.find_documents(BOOKINGS_COLLECTION, query):
+                    self._add_booking(booking)
+                self._loaded_at = time.monotonic()
+            return self._calendars
+
+    def _add_booking(self, booking: Dict):
+        try:
+            start, end = datetime.fromisoformat(booking["start"]), datetime.fromisoformat(booking["end"])
+        except (KeyError, TypeError, ValueError):
+            logger.warning("Skipping booking with invalid times", extra={"booking_id": booking.get("booking_id")})
+            return
+        calendar = self._calendars.setdefault(booking["agent_phone"], AgentCalendar())
+        calendar.add(start, end, booking["booking_id"], booking.get("job_id"))
+
+    def refresh_agent(self, agent_phone: str):
+        """Reload one agent's bookings from storage."""
+        bookings = self.db.find_documents(BOOKINGS_COLLECTION, {"agent_phone": agent_phone, "end": {"$gt": _format(datetime.now())}})
+        with self._lock:
+            self._index()
+            self._calendars.pop(agent_phone, None)
+            for booking in bookings:
+                self._add_booking(booking)
+
+    def conflicts(self, agent_phone: str, start: datetime, end: datetime, ignore_job_id: Optional[str] = None) -> List[Dict]:
+        """Bookings of an agent overlapping [start, end)."""
+        with self._lock:
+            calendar = self._index().get(agent_phone)
+            entries = calendar.overlapping(start, end, ignore_job_id) if calendar else []
+        return [
+            {"booking_id": booking_id, "job_id": job_id, "start": _format(s), "end": _format(e)}
+            for s, e, booking_id, job_id in entries
+        ]
+
+    def busy_agents(self, agent_phones: Iterable[str], start: datetime, end: datetime) -> Set[str]:
+        """The agents among ``agent_phones`` with a booking overlapping [start, end)."""
+        with self._lock:
+            calendars = self._index()
+            return {
+                phone for phone in agent_phones
+                if phone in calendars and calendars[phone].overlapping(start, end)
+            }
+
+    def book(self, agent_phone: str, start: datetime, end: datetime, kind: str = "inspection",
+             job_id: Optional[str] = None, note: Optional[str] = None) -> Dict:
+        """Record a booking; the caller is responsible for checking conflicts first."""
+        if kind not in BOOKING_KINDS:
+            raise ValueError(f"Invalid booking kind: {kind}")
+        if end <= start:
+            raise ValueError("Booking must end after it starts")
+        booking = {
+            "booking_id": str(uuid.uuid4()),
+            "agent_phone": agent_phone,
+            "job_id": job_id,
+            "kind": kind,
+            "start": _format(start),
+            "end": _format(end),
+            "note": note,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.db.insert_document(BOOKINGS_COLLECTION, dict(booking))
+        with self._lock:
+            self._index()
+            self._add_booking(booking)
+        return booking
+
+    def release_job(self, job_id: str) -> int:
+        """Delete the bookings held for a job; returns how many were removed."""
+        return self._release(self.db.find_documents(BOOKINGS_COLLECTION, {"job_id": job_id}))
+
+    def release_booking(self, agent_phone: str, booking_id: str) -> bool:
+        bookings = self.db.find_documents(BOOKINGS_COLLECTION, {"booking_id": booking_id, "agent_phone": agent_phone})
+        return self._release(bookings) > 0
+
+    def _release(self, bookings: List[Dict]) -> int:
+        released = 0
+        for booking in bookings:
+            if self.db.delete_document(BOOKINGS_COLLECTION, booking["_id"]):
+                released += 1
+            with self._lock:
+                calendar = self._calendars.get(booking["agent_phone"])
+                if calendar:
+                    calendar.remove(booking["booking_id"])
+        return released
+
+    def get_bookings(self, agent_phone: str, since: Optional[datetime] = None) -> List[Dict]:
+        query: Dict = {"agent_phone": agent_phone}
+        if since is not None:
+            query["end"] = {"$gt": _format(since)}
+        bookings = self.db.find_documents(BOOKINGS_COLLECTION, query)
+        for booking in bookings:
+            booking.pop("_id", None)
+        return sorted(bookings, key=lambda booking: booking["start"])
+
+# Global availability service instance
+availability_service = AvailabilityService()
@@ -1,14 +1,21 @@
+import logging
 import os
 from typing import Dict, Optional
 from datetime import datetime, timezone
 from app.services.database import db_service
+from app.services.job_state import NEXT_ACTIONS
+from app.services.storage import StorageBackend
+from app.services.tracing import traced
+
+logger = logging.getLogger(__name__)
 
 class ConfirmationService:
     """Service for managing agent confirmations and flow control."""
     
-    def __init__(self):
-        self.db = db_service
+    def __init__(self, db: Optional[StorageBackend] = None):
+        self.db = db if db is not None else db_service
     
+    @traced()
     def record_agent_response(self, job_id: str, agent_phone: str, response: str) -> Dict:
         """Record an agent's response to a job."""
         try:
@@ -36,7 +43,7 @@ class ConfirmationService:
             return {"success": True, "message": "Response recorded"}
             
         except Exception as e:
-            print(f"Error recording agent response: {str(e)}")
+            logger.error("Error recording agent response: %s", e, extra={"job_id": job_id, "agent_phone": agent_phone})
             return {"success": False, "error": str(e)}
     
     def get_pending_confirmations(self, job_id: str) -> list:
@@ -48,9 +55,10 @@ class ConfirmationService:
             })
             return confirmations
         except Exception as e:
-            print(f"Error getting pending confirmations: {str(e)}")
+            logger.error("Error getting pending confirmations: %s", e, extra={"job_id": job_id})
             return []
     
+    @traced()
     def mark_confirmation_complete(self, job_id: str, agent_phone: str) -> bool:
         """Mark a confirmation as complete."""
         try:
@@ -69,7 +77,7 @@ class ConfirmationService:
             return False
             
         except Exception as e:
-            print(f"Error marking confirmation complete: {str(e)}")
+            logger.error("Error marking confirmation complete: %s", e, extra={"job_id": job_id, "agent_phone": agent_phone})
             return False
     
     def can_send_next_prompt(self, job_id: str, prompt_type: str) -> bool:
@@ -91,7 +99,7 @@ class ConfirmationService:
             return flow_requirements.get(prompt_type, False)
             
         except Exception as e:
-            print(f"Error checking prompt requirements: {str(e)}")
+            logger.error("Error checking prompt requirements: %s", e, extra={"job_id": job_id})
             return False
     
     def get_next_required_action(self, job_id: str) -> Optional[str]:
@@ -101,24 +109,10 @@ class ConfirmationService:
             if not job:
                 return None
             
-            job_status = job.get('status', 'pending')
-            
-            # Define the flow
-            if job_status == 'pending':
-                return 'wait_for_yes'
-            elif job_status == 'assigned':
-                return 'wait_for_confirm'
-            elif job_status == 'approved':
-                return 'wait_for_inspection_time'
-            elif job_status == 'in_progress':
-                return 'wait_for_complete'
-            elif job_status == 'completed':
-                return 'completed'
-            
-            return None
+            return NEXT_ACTIONS.get(job.get('status', 'pending'))
             
         except Exception as e:
-            print(f"Error getting next action: {str(e)}")
+            logger.error("Error getting next action: %s", e, extra={"job_id": job_id})
             return None
 
 # Global confirmation service instance
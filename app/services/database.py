@@ -1,13 +1,20 @@
+import logging
 import os
 from typing import Dict, List, Optional
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
 from pymongo.collection import Collection
 from pymongo.database import Database
 from datetime import datetime, timezone
+from app.services.storage import InsertDefaults, SortSpec, StorageBackend, timed_operation
+from app.services.unit_of_work import IdentityMapStorage
 
-class DatabaseService:
+logger = logging.getLogger(__name__)
+
+class DatabaseService(StorageBackend):
     """Service for MongoDB database operations."""
     
+    name = "mongo"
+    
     def __init__(self):
         self.client: Optional[MongoClient] = None
         self.db: Optional[Database] = None
@@ -24,19 +31,28 @@ class DatabaseService:
             
             # Test connection
             self.client.admin.command('ping')
-            print("Successfully connected to MongoDB")
+            logger.info("Successfully connected to MongoDB")
             
         except Exception as e:
-            print(f"Failed to connect to MongoDB: {str(e)}")
+            logger.error("Failed to connect to MongoDB: %s", e)
             self.client = None
             self.db = None
     
+    def is_connected(self) -> bool:
+        """Whether the MongoDB connection is available."""
+        return self.db is not None
+    
+    @property
+    def database_name(self) -> str:
+        return self.db.name if self.db is not None else "NOT_CONNECTED"
+    
     def get_collection(self, collection_name: str) -> Optional[Collection]:
         """Get a MongoDB collection."""
         if self.db is not None:
             return self.db[collection_name]
         return None
     
+    @timed_operation("insert")
     def insert_document(self, collection_name: str, document: Dict) -> Optional[str]:
         """Insert a document into a collection."""
         try:
@@ -50,10 +66,11 @@ class DatabaseService:
                 result = collection.insert_one(document)
                 return str(result.inserted_id)
         except Exception as e:
-            print(f"Error inserting document: {str(e)}")
+            logger.error("Error inserting document: %s", e)
         return None
     
-    def find_documents(self, collection_name: str, query: Dict = None, limit: int = 0) -> List[Dict]:
+    @timed_operation("find")
+    def find_documents(self, collection_name: str, query: Dict = None, limit: int = 0, sort: Optional[SortSpec] = None) -> List[Dict]:
         """Find documents in a collection."""
         try:
             collection = self.get_collection(collection_name)
@@ -61,6 +78,8 @@ class DatabaseService:
                 if query is None:
                     query = {}
                 cursor = collection.find(query)
+                if sort:
+                    cursor = cursor.sort(sort)
                 if limit > 0:
                     cursor = cursor.limit(limit)
                 documents = list(cursor)
@@ -75,11 +94,10 @@ class DatabaseService:
                 
                 return documents
         except Exception as e:
-            print(f"Error finding documents: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error finding documents")
         return []
     
+    @timed_operation("find_by_id")
     def find_document_by_id(self, collection_name: str, document_id: str) -> Optional[Dict]:
         """Find a document by its ID."""
         try:
@@ -107,9 +125,10 @@ class DatabaseService:
                 except:
                     pass
         except Exception as e:
-            print(f"Error finding document by ID: {str(e)}")
+            logger.error("Error finding document by ID: %s", e)
         return None
     
+    @timed_operation("update")
     def update_document(self, collection_name: str, document_id: str, update_data: Dict) -> bool:
         """Update a document in a collection."""
         try:
@@ -136,9 +155,35 @@ class DatabaseService:
                 except:
                     pass
         except Exception as e:
-            print(f"Error updating document: {str(e)}")
+            logger.error("Error updating document: %s", e)
         return False
     
+    @timed_operation("find_and_update")
+    def find_and_update(self, collection_name: str, document_id: str, condition: Dict, update_data: Dict) -> Optional[Dict]:
+        """Update a document by its job_id or _id if it matches ``condition``, returning it."""
+        try:
+            from bson import ObjectId
+            collection = self.get_collection(collection_name)
+            if collection is not None:
+                update_data['updated_at'] = datetime.now(timezone.utc)
+                id_filters = [{"job_id": document_id}]
+                if ObjectId.is_valid(document_id):
+                    id_filters.append({"_id": ObjectId(document_id)})
+                doc = collection.find_one_and_update(
+                    {"$or": id_filters, **condition},
+                    {"$set": update_data},
+                    return_document=ReturnDocument.AFTER
+                )
+                if doc:
+                    for key, value in doc.items():
+                        if hasattr(value, 'isoformat'):
+                            doc[key] = value.isoformat()
+                    return doc
+        except Exception as e:
+            logger.error("Error updating document: %s", e)
+        return None
+    
+    @timed_operation("delete")
     def delete_document(self, collection_name: str, document_id: str) -> bool:
         """Delete a document from a collection."""
         try:
@@ -148,22 +193,85 @@ class DatabaseService:
                 result = collection.delete_one({"_id": ObjectId(document_id)})
                 return result.deleted_count > 0
         except Exception as e:
-            print(f"Error deleting document: {str(e)}")
+            logger.error("Error deleting document: %s", e)
         return False
     
-    def create_index(self, collection_name: str, field: str, unique: bool = False):
+    @timed_operation("bulk_upsert")
+    def bulk_upsert(self, collection_name: str, key_field: str, documents: List[Dict],
+                    insert_defaults: Optional[InsertDefaults] = None) -> Dict:
+        """Upsert documents keyed on a field with a single unordered bulk write."""
+        result = {"inserted": 0, "updated": 0, "errors": []}
+        try:
+            from pymongo import UpdateOne
+            from pymongo.errors import BulkWriteError
+            collection = self.get_collection(collection_name)
+            if collection is None or not documents:
+                return result
+
+            now = datetime.now(timezone.utc)
+            operations = []
+            for document in documents:
+                fields = {k: v for k, v in document.items() if k not in ('_id', 'created_at')}
+                fields['updated_at'] = now
+                on_insert = {k: v for k, v in (insert_defaults(document) if insert_defaults else {}).items() if k not in fields}
+                on_insert['created_at'] = document.get('created_at', now)
+                operations.append(UpdateOne(
+                    {key_field: document[key_field]},
+                    {"$set": fields, "$setOnInsert": on_insert},
+                    upsert=True
+                ))
+
+            try:
+                write_result = collection.bulk_write(operations, ordered=False)
+                result["inserted"] = write_result.upserted_count
+                result["updated"] = write_result.matched_count
+            except BulkWriteError as bwe:
+                # Unordered writes keep going past failures; report what did land
+                details = bwe.details
+                result["inserted"] = details.get("nUpserted", 0)
+                result["updated"] = details.get("nMatched", 0)
+                for error in details.get("writeErrors", []):
+                    result["errors"].append({
+                        key_field: documents[error["index"]].get(key_field),
+                        "error": error.get("errmsg", "write error")
+                    })
+        except Exception as e:
+            logger.error("Error in bulk upsert: %s", e)
+            result["errors"].append({key_field: None, "error": str(e)})
+        return result
+
+    def create_index(self, collection_name: str, field, unique: bool = False):
         """Create an index on a collection field."""
         try:
             collection = self.get_collection(collection_name)
             if collection is not None:
                 collection.create_index(field, unique=unique)
         except Exception as e:
-            print(f"Error creating index: {str(e)}")
+            logger.error("Error creating index: %s", e)
     
     def close(self):
         """Close the database connection."""
         if self.client is not None:
             self.client.close()
 
+def create_database_service(backend: Optional[str] = None) -> StorageBackend:
+    """Create the storage backend selected by STORAGE_BACKEND (mongo, memory or sqlite)."""
+    backend = (backend or os.getenv("STORAGE_BACKEND", "mongo")).lower()
+    if backend == "memory":
+        from app.services.memory_storage import MemoryStorage
+        service = MemoryStorage()
+    elif backend == "sqlite":
+        from app.services.sqlite_storage import SqliteStorage
+        service = SqliteStorage()
+    elif backend == "mongo":
+        service = DatabaseService()
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+    
+    if service.is_connected():
+        service.ensure_indexes()
+    # Calls made while serving a request share that request's identity map
+    return IdentityMapStorage(service)
+
 # Global database service instance
-db_service = DatabaseService()
+db_service = create_database_service()
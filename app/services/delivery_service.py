@@ -0,0 +1,195 @@
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from app.services.database import db_service
+from app.services.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+MESSAGES_COLLECTION = "messages"
+
+# Twilio message statuses in lifecycle order; failed/undelivered are terminal
+STATUS_RANK = {
+    "accepted": 0,
+    "queued": 1,
+    "sending": 2,
+    "sent": 3,
+    "delivered": 4,
+    "read": 5,
+    "undelivered": 6,
+    "failed": 7,
+}
+
+# Field holding the time each status was first seen; sent_at is when we
+# submitted the message, so Twilio's own "sent" status gets its own field
+STATUS_FIELDS = {status: f"{status}_at" for status in STATUS_RANK}
+STATUS_FIELDS["sent"] = "carrier_sent_at"
+
+def current_status(message: Dict) -> Optional[str]:
+    """Furthest status reached, from the per-status timestamps.
+
+    Callbacks can arrive out of order, so the stored ``status`` field may
+    lag; the timestamps are the source of truth.
+    """
+    reached = [status for status, field in STATUS_FIELDS.items() if message.get(field)]
+    if not reached:
+        return message.get("status")
+    return max(reached, key=STATUS_RANK.get)
+
+def timeline(message: Dict) -> List[Dict]:
+    """Status transitions of a message ordered by time."""
+    events = [
+        {"status": status, "at": message[field]}
+        for status, field in STATUS_FIELDS.items() if message.get(field)
+    ]
+    return sorted(events, key=lambda event: str(event["at"]))
+
+def _parse_time(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(str(value))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+class DeliveryService:
+    """Records outbound messages and their Twilio status callbacks.
+
+    Writes are buffered per message SID and applied as one bulk upsert every
+    DELIVERY_FLUSH_INTERVAL seconds, or sooner once DELIVERY_BATCH_SIZE
+    messages are pending, so neither sends nor callbacks wait on storage.
+    """
+
+    def __init__(self, db: Optional[StorageBackend] = None, flush_interval: Optional[float] = None, batch_size: Optional[int] = None):
+        self.db = db if db is not None else db_service
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv("DELIVERY_FLUSH_INTERVAL", "1.0"))
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv("DELIVERY_BATCH_SIZE", "500"))
+        self._pending: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+
+    def record_sent(self, message_sid: str, to: str, job_id: Optional[str] = None, template: Optional[str] = None,
+                    status: Optional[str] = None, sender: Optional[str] = None):
+        """Record a message Twilio accepted for delivery."""
+        now = datetime.now(timezone.utc)
+        fields = {"message_sid": message_sid, "to": to, "job_id": job_id, "template": template, "sender": sender, "sent_at": now}
+        if status in STATUS_FIELDS:
+            fields["status"] = status
+            fields[STATUS_FIELDS[status]] = now
+        self._enqueue(message_sid, fields)
+
+    def record_status(self, message_sid: str, status: str, error_code: Optional[str] = None):
+        """Apply a status callback to a message."""
+        status = status.lower()
+        fields = {"message_sid": message_sid, "status": status}
+        if status in STATUS_FIELDS:
+            fields[STATUS_FIELDS[status]] = datetime.now(timezone.utc)
+        if error_code:
+            fields["error_code"] = error_code
+        self._enqueue(message_sid, fields)
+
+    def _enqueue(self, message_sid: str, fields: Dict):
+        with self._lock:
+            pending = self._pending.get(message_sid)
+            if pending is None:
+                self._pending[message_sid] = fields
+            else:
+                for key, value in fields.items():
+                    if key == "status":
+                        if STATUS_RANK.get(value, -1) >= STATUS_RANK.get(pending.get("status"), -1):
+                            pending["status"] = value
+                    elif key.endswith("_at"):
+                        # Keep the first time a status was seen
+                        pending.setdefault(key, value)
+                    elif value is not None:
+                        pending[key] = value
+            backlog = len(self._pending)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="delivery-flush", daemon=True)
+                self._worker.start()
+        if backlog >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write all pending records; returns how many messages were written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            documents = [{k: v for k, v in fields.items() if v is not None} for fields in batch.values()]
+            result = self.db.bulk_upsert(MESSAGES_COLLECTION, "message_sid", documents)
+            if result["errors"]:
+                logger.error("Failed to record %d message status updates", len(result["errors"]), extra={"errors": result["errors"][:5]})
+            return len(documents)
+
+    def get_message(self, message_sid: str) -> Optional[Dict]:
+        self.flush()
+        messages = self.db.find_documents(MESSAGES_COLLECTION, {"message_sid": message_sid}, limit=1)
+        return self._present(messages[0]) if messages else None
+
+    def get_messages_for_job(self, job_id: str) -> List[Dict]:
+        self.flush()
+        return [self._present(message) for message in self.db.find_documents(MESSAGES_COLLECTION, {"job_id": job_id})]
+
+    def get_stats(self, since: Optional[datetime] = None, template: Optional[str] = None) -> Dict:
+        """Status counts and send-to-delivered/read latency percentiles."""
+        self.flush()
+        since = _parse_time(since) or datetime.now(timezone.utc) - timedelta(hours=24)
+        query: Dict = {"sent_at": {"$gte": since}}
+        if template:
+            query["template"] = template
+        messages = self.db.find_documents(MESSAGES_COLLECTION, query)
+
+        counts: Dict[str, int] = {}
+        latencies: Dict[str, List[float]] = {"delivered": [], "read": []}
+        for message in messages:
+            status = current_status(message) or "unknown"
+            counts[status] = counts.get(status, 0) + 1
+            sent_at = _parse_time(message.get("sent_at"))
+            for target in latencies:
+                reached_at = _parse_time(message.get(STATUS_FIELDS[target]))
+                if sent_at and reached_at:
+                    latencies[target].append(max(0.0, (reached_at - sent_at).total_seconds()))
+
+        return {
+            "since": since.isoformat(),
+            "template": template,
+            "total": len(messages),
+            "by_status": counts,
+            "latency_seconds": {
+                f"sent_to_{target}": {
+                    "count": len(values),
+                    **{f"p{pct}": percentile(values, pct) for pct in (50, 90, 95, 99)},
+                }
+                for target, values in latencies.items()
+            },
+        }
+
+    @staticmethod
+    def _present(message: Dict) -> Dict:
+        message["status"] = current_status(message)
+        message["timeline"] = timeline(message)
+        return message
+
+# Global delivery service instance
+delivery_service = DeliveryService()
+atexit.register(delivery_service.flush)
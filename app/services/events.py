@@ -0,0 +1,118 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple, Type
+from app.services.metrics import EVENT_HANDLER_SECONDS, JOB_EVENTS
+from app.services.tracing import current_trace_id, start_trace
+from app.services.unit_of_work import flush_unit_of_work
+
+logger = logging.getLogger(__name__)
+
+class JobEvent:
+    """A job state transition; ``job`` is the job as it stands after the change."""
+
+    name = "job_event"
+
+    def __init__(self, job: Dict, **details):
+        self.job = job
+        self.job_id = job.get('job_id') or job.get('id')
+        self.details = details
+        self.occurred_at = datetime.now(timezone.utc)
+
+class JobAssigned(JobEvent):
+    name = "job_assigned"
+
+class ScheduleApproved(JobEvent):
+    name = "schedule_approved"
+
+class InspectionStarted(JobEvent):
+    name = "inspection_started"
+
+class InspectionCompleted(JobEvent):
+    name = "inspection_completed"
+
+class JobCancelled(JobEvent):
+    name = "job_cancelled"
+
+Handler = Callable[[JobEvent], None]
+
+class EventBus:
+    """In-process publish/subscribe for job events.
+
+    ``publish`` only queues the subscribers; they run on a pool of
+    EVENT_BUS_WORKERS threads, all subscribers of an event concurrently,
+    so a transition returns after its database write and its messages go
+    out in parallel behind it. A failing subscriber is logged and does not
+    affect the others. Each run is its own trace, linked to the request
+    that published the event. With EVENT_BUS_WORKERS=0 subscribers run
+    inline, in subscription order.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers if workers is not None else int(os.getenv("EVENT_BUS_WORKERS", "8"))
+        self._subscribers: Dict[Type[JobEvent], List[Tuple[str, Handler]]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: set = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, event_type: Type[JobEvent], handler: Handler, name: Optional[str] = None):
+        self._subscribers.setdefault(event_type, []).append((name or handler.__name__, handler))
+
+    def publish(self, event: JobEvent) -> List[Future]:
+        """Queue every subscriber of the event; returns their futures."""
+        JOB_EVENTS.labels(event.name).inc()
+        # Subscribers run on other threads and read the database directly
+        flush_unit_of_work()
+        handlers = [
+            subscriber for event_type, subscribers in self._subscribers.items()
+            if isinstance(event, event_type) for subscriber in subscribers
+        ]
+        origin_trace_id = current_trace_id()
+        if self.workers <= 0:
+            for name, handler in handlers:
+                self._run(event, name, handler, origin_trace_id)
+            return []
+        futures = []
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="event-bus")
+            for name, handler in handlers:
+                future = self._executor.submit(self._run, event, name, handler, origin_trace_id)
+                self._pending.add(future)
+                future.add_done_callback(self._pending.discard)
+                futures.append(future)
+        return futures
+
+    def _run(self, event: JobEvent, name: str, handler: Handler, origin_trace_id: Optional[str]):
+        started = time.perf_counter()
+        outcome = "success"
+        attributes = {"origin_trace_id": origin_trace_id} if origin_trace_id else {}
+        try:
+            with start_trace(f"event.{event.name}.{name}", job_id=event.job_id, **attributes):
+                handler(event)
+        except Exception as e:
+            outcome = "error"
+            logger.exception("Event handler %s failed: %s", name, e, extra={"job_id": event.job_id, "event": event.name})
+        finally:
+            EVENT_HANDLER_SECONDS.labels(event.name, name, outcome).observe(time.perf_counter() - started)
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait for queued subscribers to finish; returns False on timeout."""
+        with self._lock:
+            pending = list(self._pending)
+        _, not_done = wait(pending, timeout=timeout)
+        return not not_done
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+# Global event bus instance
+event_bus = EventBus()
+atexit.register(event_bus.shutdown)
@@ -0,0 +1,141 @@
+import heapq
+import math
+from collections import defaultdict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def geo_point(latitude: float, longitude: float) -> Dict:
+    """GeoJSON point, the shape MongoDB's 2dsphere index expects ([lng, lat] order)."""
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+def coordinates(document: Optional[Dict]) -> Optional[Tuple[float, float]]:
+    """(latitude, longitude) of an agent or property, from lat/lng fields or a GeoJSON location."""
+    if not document:
+        return None
+    latitude, longitude = document.get("latitude"), document.get("longitude")
+    if latitude is None or longitude is None:
+        location = document.get("location")
+        if not isinstance(location, dict) or len(location.get("coordinates") or []) != 2:
+            return None
+        longitude, latitude = location["coordinates"]
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+class GridIndex:
+    """Uniform lat/lng grid for k-nearest-neighbour lookups.
+
+    Points are bucketed into square cells of ``cell_degrees``. A lookup
+    scans rings of cells outward from the query's cell and stops once no
+    unvisited cell can hold a point closer than the k-th best found, so
+    dense cities cost a handful of cells rather than the whole roster.
+    """
+
+    def __init__(self, cell_degrees: float = 0.02):
+        self.cell_degrees = cell_degrees
+        self._cells: Dict[Tuple[int, int], List[Tuple[float, float, Hashable]]] = defaultdict(list)
+        self._bounds: Optional[List[int]] = None
+        self.size = 0
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees)
+
+    def add(self, key: Hashable, latitude: float, longitude: float):
+        row, col = self._cell(latitude, longitude)
+        self._cells[(row, col)].append((latitude, longitude, key))
+        if self._bounds is None:
+            self._bounds = [row, row, col, col]
+        else:
+            bounds = self._bounds
+            bounds[0], bounds[1] = min(bounds[0], row), max(bounds[1], row)
+            bounds[2], bounds[3] = min(bounds[2], col), max(bounds[3], col)
+        self.size += 1
+
+    def nearest(self, latitude: float, longitude: float, count: int, max_km: Optional[float] = None,
+                accept: Optional[Callable[[Hashable], bool]] = None) -> List[Tuple[float, Hashable]]:
+        """Up to ``count`` (distance_km, key) pairs closest to the point, nearest first.
+
+        Keys ``accept`` rejects are skipped, so the search carries on outward
+        until it has ``count`` accepted keys or runs out of points.
+        """
+        if count <= 0 or self._bounds is None:
+            return []
+        row, col = self._cell(latitude, longitude)
+        min_row, max_row, min_col, max_col = self._bounds
+        last_ring = max(row - min_row, max_row - row, col - min_col, max_col - col)
+
+        best: List[Tuple[float, Hashable]] = []  # max-heap of the closest so far, as (-distance, key)
+
+        def consider(points):
+            for point_lat, point_lng, key in points:
+                distance = haversine_km(latitude, longitude, point_lat, point_lng)
+                if max_km is not None and distance > max_km:
+                    continue
+                if len(best) == count and distance >= -best[0][0]:
+                    continue
+                if accept is not None and not accept(key):
+                    continue
+                if len(best) < count:
+                    heapq.heappush(best, (-distance, key))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, key))
+
+        visited = 0
+        for ring in range(last_ring + 1):
+            visited += max(1, 8 * ring)
+            if visited > 2 * len(self._cells):
+                # Sparse outskirts: visiting the remaining occupied cells nearest-ring first
+                # beats walking empty rings
+                remaining = sorted((max(abs(cell[0] - row), abs(cell[1] - col)), cell) for cell in self._cells)
+                for cell_ring, cell in remaining:
+                    if cell_ring < ring:
+                        continue
+                    if len(best) == count and -best[0][0] <= self._ring_distance_km(latitude, cell_ring - 1):
+                        break
+                    consider(self._cells[cell])
+                break
+            for cell in self._ring(row, col, ring):
+                points = self._cells.get(cell)
+                if points:
+                    consider(points)
+            bound = self._ring_distance_km(latitude, ring)
+            if max_km is not None and bound > max_km:
+                break
+            if len(best) == count and -best[0][0] <= bound:
+                break
+        return sorted((-negative, key) for negative, key in best)
+
+    def _ring_distance_km(self, latitude: float, ring: int) -> float:
+        """Lower bound on the distance to any point outside the first ``ring`` rings."""
+        span = ring * self.cell_degrees
+        # Such a point is more than `span` degrees away in latitude, or in longitude
+        # at a latitude no further poleward than the ring reaches
+        poleward = math.radians(min(90.0, abs(latitude) + span + self.cell_degrees))
+        along_parallel = EARTH_RADIUS_KM * math.asin(math.cos(poleward) * math.sin(math.radians(min(span, 90.0))))
+        return min(span * KM_PER_DEGREE, along_parallel)
+
+    @staticmethod
+    def _ring(row: int, col: int, ring: int):
+        if ring == 0:
+            yield row, col
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield row - ring, c
+            yield row + ring, c
+        for r in range(row - ring + 1, row + ring):
+            yield r, col - ring
+            yield r, col + ring
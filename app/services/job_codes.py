@@ -0,0 +1,90 @@
+import logging
+import os
+import secrets
+from typing import Optional
+from app.services.database import db_service
+from app.services.job_state import FINAL_STATUSES
+from app.services.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+JOB_CODES_COLLECTION = "job_codes"
+
+# Upper-case letters and digits, without the ones easily misread or mistyped (0/O, 1/I/L, U/V)
+JOB_CODE_ALPHABET = "23456789ABCDEFGHJKMNPQRSTWXYZ"
+JOB_CODE_DIGITS = "23456789"
+
+def normalize_code(code: str) -> str:
+    return code.strip().upper()
+
+def reply_command(command: str, job_code: Optional[str]) -> str:
+    """The reply an agent should send for a job, e.g. ``YES 4K7``, or the bare command for jobs without a code."""
+    return f"{command} {job_code}" if job_code else command
+
+class JobCodeRegistry:
+    """Short codes agents type to say which job a reply is about.
+
+    Each open job holds a JOB_CODE_LENGTH-character code, recorded in the
+    job_codes collection whose unique index on ``code`` guarantees no two
+    open jobs share one. Every code has at least one digit, so no word an
+    agent might add to a reply ("YES AND", "YES THE") can pass for one.
+    Codes are released when a job is completed, cancelled or deleted and
+    may then be handed out again; a code still
+    recorded for a job that is gone or finished is reclaimed when
+    allocation draws it, so a missed release cannot use up the code space.
+    """
+
+    def __init__(self, db: Optional[StorageBackend] = None, length: Optional[int] = None, attempts: int = 8):
+        self.db = db if db is not None else db_service
+        self.length = length if length is not None else int(os.getenv("JOB_CODE_LENGTH", "3"))
+        self.attempts = attempts
+
+    def is_code(self, text: str) -> bool:
+        """Whether text has the shape of a job code, as opposed to an ordinary word."""
+        code = normalize_code(text)
+        return (len(code) == self.length and all(char in JOB_CODE_ALPHABET for char in code)
+                and any(char in JOB_CODE_DIGITS for char in code))
+
+    def _generate(self) -> str:
+        chars = [secrets.choice(JOB_CODE_ALPHABET) for _ in range(self.length)]
+        if not any(char in JOB_CODE_DIGITS for char in chars):
+            chars[secrets.randbelow(self.length)] = secrets.choice(JOB_CODE_DIGITS)
+        return "".join(chars)
+
+    def allocate(self, job_id: str) -> Optional[str]:
+        """Reserve a free code for a job; None if every attempt collided."""
+        for _ in range(self.attempts):
+            code = self._generate()
+            # The unique index rejects a code another job already holds
+            if self.db.insert_document(JOB_CODES_COLLECTION, {"code": code, "job_id": job_id}):
+                return code
+            if self._reclaim(code) and self.db.insert_document(JOB_CODES_COLLECTION, {"code": code, "job_id": job_id}):
+                return code
+        logger.error("No free job code after %d attempts", self.attempts, extra={"job_id": job_id})
+        return None
+
+    def _reclaim(self, code: str) -> bool:
+        """Drop a code's entry if the job holding it is gone or finished; True if it was dropped."""
+        entries = self.db.find_documents(JOB_CODES_COLLECTION, {"code": code}, limit=1)
+        if not entries:
+            return False
+        job = self.db.find_document_by_id("jobs", entries[0]["job_id"])
+        if job and job.get("status") not in FINAL_STATUSES:
+            return False
+        logger.info("Reclaimed job code %s", code, extra={"job_id": entries[0]["job_id"]})
+        return self.db.delete_document(JOB_CODES_COLLECTION, entries[0]["_id"])
+
+    def resolve(self, code: str) -> Optional[str]:
+        """The job_id holding a code, if any."""
+        entries = self.db.find_documents(JOB_CODES_COLLECTION, {"code": normalize_code(code)}, limit=1)
+        return entries[0]["job_id"] if entries else None
+
+    def release(self, job_id: str) -> int:
+        released = 0
+        for entry in self.db.find_documents(JOB_CODES_COLLECTION, {"job_id": job_id}):
+            if self.db.delete_document(JOB_CODES_COLLECTION, entry["_id"]):
+                released += 1
+        return released
+
+# Global job code registry instance
+job_codes = JobCodeRegistry()
@@ -1,20 +1,52 @@
+import functools
+import logging
+import os
 import uuid
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
+from app.services.agent_index import agent_index
+from app.services.assignment_policy import OPEN_STATUSES, assignment_policy, workload_index
+from app.services.availability_service import availability_service, inspection_window
+from app.services.confirmation_service import confirmation_service
 from app.services.database import db_service
+from app.services.events import (
+    InspectionCompleted, InspectionStarted, JobAssigned, JobCancelled, JobEvent, ScheduleApproved, event_bus
+)
+from app.services.job_codes import job_codes
+from app.services.job_state import FINAL_STATUSES, JobStateMachine
+from app.services.metrics import JOB_TIME_TO_ASSIGN_SECONDS
+from app.services.notification_digest import job_taken_digest
+from app.services.offer_ledger import AWAITING_STATES, OFFERS_COLLECTION, offer_ledger
+from app.services.storage import StorageBackend
 from app.services.whatsapp_service import WhatsAppService
 from app.services.scheduler import scheduler_service
+from app.services.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+def dispatch_wave_size() -> int:
+    """Agents offered a job per wave; 0 offers it to every matched agent at once."""
+    return int(os.getenv("DISPATCH_WAVE_SIZE", "0"))
+
+def dispatch_wave_timeout() -> float:
+    """Seconds to wait for a YES before offering the job to the next wave."""
+    return float(os.getenv("DISPATCH_WAVE_TIMEOUT", "300"))
+
+# The order an agent's jobs are worked through: soonest inspection first
+CURRENT_JOB_SORT = [('inspection_date', 1), ('inspection_time', 1)]
 
 class JobService:
     """Service class for managing real estate inspection jobs with WhatsApp integration."""
     
-    def __init__(self):
+    def __init__(self, db: Optional[StorageBackend] = None):
+        self.db = db if db is not None else db_service
         self.whatsapp_service = WhatsAppService()
+        self.state_machine = JobStateMachine(self.db)
     
     def get_all_jobs(self) -> List[Dict]:
         """Get all inspection jobs from database."""
         try:
-            jobs = db_service.find_documents('jobs')
+            jobs = self.db.find_documents('jobs')
             # Convert ObjectId to string for JSON serialization
             for job in jobs:
                 if '_id' in job:
@@ -25,13 +57,13 @@ class JobService:
                     job['id'] = job['job_id']
             return jobs
         except Exception as e:
-            print(f"Error getting all jobs: {str(e)}")
+            logger.error("Error getting all jobs: %s", e)
             return []
     
     def get_job_by_id(self, job_id: str) -> Optional[Dict]:
         """Get a job by its ID from database."""
         try:
-            job = db_service.find_document_by_id('jobs', job_id)
+            job = self.db.find_document_by_id('jobs', job_id)
             if job and '_id' in job:
                 job['id'] = str(job['_id'])
                 del job['_id']
@@ -40,15 +72,17 @@ class JobService:
                 job['id'] = job['job_id']
             return job
         except Exception as e:
-            print(f"Error getting job by ID: {str(e)}")
+            logger.error("Error getting job by ID: %s", e, extra={"job_id": job_id})
             return None
     
+    @traced()
     def create_inspection_request(self, data: Dict) -> Dict:
-        """Create a new inspection request and notify all agents."""
+        """Create a new inspection request and notify the agents it matches."""
         try:
             job_id = str(uuid.uuid4())
             job = {
                 'job_id': job_id,  # Changed from 'id' to 'job_id' to match database schema
+                'job_code': job_codes.allocate(job_id),
                 'property_id': data.get('property_id'),
                 'client_id': data.get('client_id'),
                 'inspection_date': data.get('inspection_date'),
@@ -58,36 +92,127 @@ class JobService:
                 'notes': data.get('notes'),
                 'property_details': data.get('property_details'),
                 'client_details': data.get('client_details'),
+                'dispatched_to': [],
+                'dispatch_queue': [],
+                'dispatch_wave': 0,
+                'dispatch_strategy': None,
                 'created_at': datetime.now(timezone.utc).isoformat(),
                 'updated_at': datetime.now(timezone.utc).isoformat()
             }
             
+            # Pick the free agents serving this property's zone and type
+            plan = agent_index.match(job['property_details'] or {}, available=self._availability_check(job))
+            candidates = plan.phones
+            wave_size = dispatch_wave_size()
+            if wave_size > 0:
+                agent_numbers, waiting = candidates[:wave_size], candidates[wave_size:]
+            else:
+                agent_numbers, waiting = candidates, []
+            job['dispatched_to'] = agent_numbers
+            job['dispatch_queue'] = waiting
+            job['dispatch_wave'] = 1
+            job['dispatch_strategy'] = plan.strategy
+            
             # Save to database
-            db_id = db_service.insert_document('jobs', job)
+            db_id = self.db.insert_document('jobs', job)
             if db_id:
                 job['_id'] = db_id
             
-            # Get all active agents
-            agents = self.get_active_agents()
-            agent_numbers = [agent.get('phone') for agent in agents if agent.get('phone')]
+            if candidates:
+                logger.info("Dispatching job to %d of %d agents (%s)", len(agent_numbers), len(candidates), plan.strategy,
+                            extra={"job_id": job_id, "event": "job_dispatched", "wave": 1})
+            else:
+                logger.warning("No free agent to dispatch the job to (%s)", plan.strategy,
+                               extra={"job_id": job_id, "event": "job_not_dispatched"})
             
-            # Send inspection request to all agents
+            # Send inspection request to the matched agents
             if agent_numbers:
-                self.whatsapp_service.send_inspection_request_to_agents(
+                sent = self.whatsapp_service.send_inspection_request_to_agents(
                     job['property_details'],
                     job['inspection_date'],
                     job['inspection_time'],
-                    agent_numbers
+                    agent_numbers,
+                    job_id=job.get('job_id'),
+                    job_code=job.get('job_code'),
+                    on_queued_result=functools.partial(offer_ledger.record_queued_result, job_id)
                 )
+                offer_ledger.record_offers(job_id, sent['results'])
+            
+            # Offer the job to the next wave if nobody accepts in time
+            if waiting:
+                scheduler_service.schedule_dispatch_wave(job_id, dispatch_wave_timeout())
             
             # Ensure the response has the correct id field for API
             response_job = job.copy()
             response_job['id'] = job['job_id']
             return response_job
         except Exception as e:
-            print(f"Error creating inspection request: {str(e)}")
+            logger.error("Error creating inspection request: %s", e)
             raise
     
+    def _availability_check(self, job: Dict) -> Optional[Callable[[str], bool]]:
+        """Whether an agent is free for the job's inspection slot, or None when the job has no slot."""
+        window = inspection_window(job.get('inspection_date'), job.get('inspection_time'))
+        if window is None:
+            return None
+        return lambda phone: not availability_service.busy_agents((phone,), *window)
+    
+    def _available_agents(self, agent_phones: List[str], job: Dict) -> List[str]:
+        """Drop agents whose bookings overlap the job's inspection slot, keeping the order."""
+        window = inspection_window(job.get('inspection_date'), job.get('inspection_time'))
+        if window is None:
+            return list(agent_phones)
+        busy = availability_service.busy_agents(agent_phones, *window)
+        return [phone for phone in agent_phones if phone not in busy]
+    
+    @traced()
+    def dispatch_next_wave(self, job_id: str) -> List[str]:
+        """Offer a still-pending job to the next wave of ranked agents.
+
+        Called by the scheduler when a wave times out without a YES; returns
+        the phones the job was offered to.
+        """
+        job = self.get_job_by_id(job_id)
+        if not job or job['status'] != 'pending':
+            return []
+        # Agents booked since the job was created can no longer take it
+        waiting = self._available_agents(job.get('dispatch_queue') or [], job)
+        if not waiting:
+            return []
+        
+        wave_size = dispatch_wave_size()
+        if wave_size > 0:
+            wave, waiting = waiting[:wave_size], waiting[wave_size:]
+        else:
+            wave, waiting = waiting, []
+        wave_number = (job.get('dispatch_wave') or 1) + 1
+        update_data = {
+            'dispatched_to': (job.get('dispatched_to') or []) + wave,
+            'dispatch_queue': waiting,
+            'dispatch_wave': wave_number
+        }
+        # Only a job nobody has taken since it was read gets another wave
+        if not self.db.find_and_update('jobs', job_id, {'status': 'pending'}, update_data):
+            logger.info("Job left pending before dispatch wave %d", wave_number, extra={"job_id": job_id})
+            return []
+        
+        logger.info("Escalating job to %d more agents, %d still waiting", len(wave), len(waiting),
+                    extra={"job_id": job.get('job_id'), "event": "job_dispatched", "wave": wave_number})
+        sent = self.whatsapp_service.send_inspection_request_to_agents(
+            job['property_details'],
+            job['inspection_date'],
+            job['inspection_time'],
+            wave,
+            job_id=job.get('job_id'),
+            job_code=job.get('job_code'),
+            on_queued_result=functools.partial(offer_ledger.record_queued_result, job.get('job_id', job_id))
+        )
+        offer_ledger.record_offers(job.get('job_id', job_id), sent['results'])
+        if waiting:
+            scheduler_service.schedule_dispatch_wave(job.get('job_id', job_id), dispatch_wave_timeout())
+        return wave
+    
+    @traced()
     def handle_agent_response(self, job_id: str, agent_phone: str, response: str) -> Dict:
         """Handle agent response to inspection request."""
         try:
@@ -99,193 +224,192 @@ class JobService:
                 # Job already assigned, notify agent
                 self.whatsapp_service.send_job_already_assigned(
                     agent_phone, 
-                    job['property_details']
+                    job['property_details'],
+                    job_id=job.get('job_id')
                 )
+                offer_ledger.mark(job.get('job_id', job_id), agent_phone, 'answered')
                 return {"success": False, "error": "Job already assigned"}
             
             if response.upper() == 'YES':
-                # Assign job to this agent
-                update_data = {
-                    'status': 'assigned',
-                    'assigned_agent': agent_phone,
-                    'assigned_at': datetime.now(timezone.utc).isoformat()
-                }
-                
-                success = db_service.update_document('jobs', job_id, update_data)
-                if success:
-                    # Get agent details for client notification
-                    agent_details = self.get_agent_details(agent_phone)
-                    
-                    # Send confirmation to assigned agent
-                    self.whatsapp_service.send_job_assigned_confirmation(
-                        agent_phone,
-                        job['property_details'],
-                        job['client_details'],
-                        job['inspection_date'],
-                        job['inspection_time']
-                    )
-                    
-                    # Send notification to client about assigned agent
-                    if job['client_details'].get('phone'):
-                        self.whatsapp_service.send_agent_assigned_to_client(
-                            job['client_details']['phone'],
-                            agent_details,
+                # Re-read the agent's bookings; the cached calendar may predate a claim made elsewhere
+                window = inspection_window(job.get('inspection_date'), job.get('inspection_time'))
+                if window is not None:
+                    availability_service.refresh_agent(agent_phone)
+                    if availability_service.conflicts(agent_phone, *window, ignore_job_id=job.get('job_id')):
+                        self.whatsapp_service.send_schedule_conflict(
+                            agent_phone,
                             job['property_details'],
                             job['inspection_date'],
-                            job['inspection_time']
+                            job['inspection_time'],
+                            job_id=job.get('job_id')
                         )
-                    
-                    # Notify other agents that the job is taken
-                    self.notify_other_agents_job_taken(job, agent_phone)
-                    
-                    # Schedule inspection reminder
-                    self.schedule_inspection_reminder(job)
-                    
+                        offer_ledger.mark(job.get('job_id', job_id), agent_phone, 'answered')
+                        return {"success": False, "error": "Schedule conflict"}
+                
+                # Gather competing claims and let the policy pick, when a window is configured
+                if assignment_policy.enabled:
+                    job_key = job.get('job_id', job_id)
+                    if assignment_policy.add_claim(job_key, agent_phone):
+                        scheduler_service.schedule_assignment_window(job_key, assignment_policy.window)
+                    offer_ledger.mark(job_key, agent_phone, 'claimed')
                     return {
                         "success": True,
-                        "message": "Job assigned successfully",
-                        "assigned_agent": agent_phone
+                        "pending": True,
+                        "message": "Claim recorded"
                     }
-                else:
-                    return {"success": False, "error": "Failed to assign job"}
+                
+                return self._assign(job, job_id, agent_phone, window)
             else:
                 return {"success": False, "error": "Invalid response"}
                 
         except Exception as e:
-            print(f"Error handling agent response: {str(e)}")
+            logger.error("Error handling agent response: %s", e, extra={"job_id": job_id, "agent_phone": agent_phone})
             return {"success": False, "error": str(e)}
     
-    def approve_inspection_schedule(self, job_id: str) -> Dict:
-        """Approve inspection schedule by assigned agent."""
-        try:
-            job = self.get_job_by_id(job_id)
-            if not job:
-                return {"success": False, "error": "Inspection job not found"}
+    def _assign(self, job: Dict, job_id: str, agent_phone: str, window) -> Dict:
+        """Assign a pending job to an agent and send the resulting notifications."""
+        # Only matches while the job is still pending, so concurrent YES replies cannot both win
+        result = self.state_machine.apply(job_id, 'assign', assigned_agent=agent_phone)
+        if result.success:
+            workload_index.job_changed(None, result.from_status, agent_phone, 'assigned')
+            
+            # Hold the slot so overlapping jobs are no longer offered to this agent
+            if window is not None:
+                availability_service.book(agent_phone, *window, job_id=job.get('job_id'))
             
-            if job['status'] != 'assigned':
-                return {"success": False, "error": "Job not in assigned status"}
+            # Confirmations, job-taken notices and reminders are handled off the request path
+            event_bus.publish(JobAssigned(result.job))
             
-            update_data = {
-                'status': 'approved',
-                'approved_at': datetime.now(timezone.utc).isoformat()
+            return {
+                "success": True,
+                "message": "Job assigned successfully",
+                "assigned_agent": agent_phone
             }
+        elif result.from_status is not None:
+            # Another agent took the job since it was read
+            self.whatsapp_service.send_job_already_assigned(agent_phone, job['property_details'], job_id=job.get('job_id'))
+            offer_ledger.mark(job.get('job_id', job_id), agent_phone, 'answered')
+            return {"success": False, "error": "Job already assigned"}
+        else:
+            return {"success": False, "error": result.error}
+    
+    @traced()
+    def resolve_claims(self, job_id: str) -> Optional[Dict]:
+        """Close a job's claim window and assign it to the best-scoring claimant."""
+        try:
+            job = self.get_job_by_id(job_id)
+            claims = assignment_policy.take_claims(job_id)
+            if not job or job['status'] != 'pending' or not claims:
+                return None
             
-            success = db_service.update_document('jobs', job_id, update_data)
-            if success:
-                # Get agent details for client notification
-                agent_details = self.get_agent_details(job['assigned_agent'])
-                
-                # Send schedule confirmation to agent
-                self.whatsapp_service.send_schedule_confirmation(
-                    job['assigned_agent'],
-                    job['property_details'],
-                    job['inspection_date'],
-                    job['inspection_time']
-                )
-                
-                # Send notification to client about schedule confirmation
-                if job['client_details'].get('phone'):
-                    self.whatsapp_service.send_schedule_confirmed_to_client(
-                        job['client_details']['phone'],
-                        agent_details,
-                        job['property_details'],
-                        job['inspection_date'],
-                        job['inspection_time']
-                    )
+            window = inspection_window(job.get('inspection_date'), job.get('inspection_time'))
+            claimants = []
+            for agent_phone, _ in claims:
+                # A claimant may have been booked elsewhere while the window was open
+                if window is not None:
+                    availability_service.refresh_agent(agent_phone)
+                    if availability_service.conflicts(agent_phone, *window, ignore_job_id=job.get('job_id')):
+                        continue
+                claimants.append((agent_phone, agent_index.get_agent(agent_phone) or {'phone': agent_phone}))
+            
+            for agent_phone in assignment_policy.rank(claimants):
+                result = self._assign(job, job_id, agent_phone, window)
+                if result['success']:
+                    logger.info("Assigned job to best of %d claimants", len(claims),
+                                extra={"job_id": job.get('job_id'), "agent_phone": agent_phone, "event": "claims_resolved"})
+                    confirmation_service.mark_confirmation_complete(job['id'], agent_phone)
+                    return result
+            return None
+        except Exception as e:
+            logger.error("Error resolving claims: %s", e, extra={"job_id": job_id})
+            return None
+    
+    @traced()
+    def approve_inspection_schedule(self, job_id: str) -> Dict:
+        """Approve inspection schedule by assigned agent."""
+        try:
+            result = self.state_machine.apply(job_id, 'approve')
+            if result.success:
+                job = result.job
+                workload_index.job_changed(job.get('assigned_agent'), result.from_status, job.get('assigned_agent'), 'approved')
+                event_bus.publish(ScheduleApproved(job))
                 
                 return {
                     "success": True,
                     "message": "Inspection schedule approved"
                 }
             else:
-                return {"success": False, "error": "Failed to approve schedule"}
+                return {"success": False, "error": result.error}
                 
         except Exception as e:
-            print(f"Error approving inspection schedule: {str(e)}")
+            logger.error("Error approving inspection schedule: %s", e, extra={"job_id": job_id})
             return {"success": False, "error": str(e)}
     
+    @traced()
     def start_inspection(self, job_id: str) -> Dict:
         """Start an inspection."""
         try:
-            job = self.get_job_by_id(job_id)
-            if not job:
-                return {"success": False, "error": "Inspection job not found"}
-            
-            update_data = {
-                'status': 'in_progress',
-                'started_at': datetime.now(timezone.utc).isoformat()
-            }
-            
-            success = db_service.update_document('jobs', job_id, update_data)
-            if success:
-                # Get agent details for client notification
-                agent_details = self.get_agent_details(job['assigned_agent'])
-                
-                # Send start confirmation to agent
-                self.whatsapp_service.send_inspection_started_confirmation(
-                    job['assigned_agent'],
-                    job['property_details']
-                )
-                
-                # Send notification to client that inspection has started
-                if job['client_details'].get('phone'):
-                    self.whatsapp_service.send_inspection_started_to_client(
-                        job['client_details']['phone'],
-                        agent_details,
-                        job['property_details']
-                    )
+            result = self.state_machine.apply(job_id, 'start')
+            if result.success:
+                job = result.job
+                workload_index.job_changed(job.get('assigned_agent'), result.from_status, job.get('assigned_agent'), 'in_progress')
+                event_bus.publish(InspectionStarted(job))
                 
                 return {
                     "success": True,
                     "message": "Inspection started successfully"
                 }
             else:
-                return {"success": False, "error": "Failed to start inspection"}
+                return {"success": False, "error": result.error}
                 
         except Exception as e:
-            print(f"Error starting inspection: {str(e)}")
+            logger.error("Error starting inspection: %s", e, extra={"job_id": job_id})
             return {"success": False, "error": str(e)}
     
+    @traced()
     def complete_inspection(self, job_id: str) -> Dict:
         """Mark inspection as completed."""
         try:
-            job = self.get_job_by_id(job_id)
-            if not job:
-                return {"success": False, "error": "Inspection job not found"}
-            
-            update_data = {
-                'status': 'completed',
-                'completed_at': datetime.now(timezone.utc).isoformat()
-            }
-            
-            success = db_service.update_document('jobs', job_id, update_data)
-            if success:
-                # Get agent details for client notification
-                agent_details = self.get_agent_details(job['assigned_agent'])
+            result = self.state_machine.apply(job_id, 'complete')
+            if result.success:
+                job = result.job
+                workload_index.job_changed(job.get('assigned_agent'), result.from_status, job.get('assigned_agent'), 'completed')
+                job_codes.release(job.get('job_id'))
+                event_bus.publish(InspectionCompleted(job))
                 
-                # Send completion confirmation to agent
-                self.whatsapp_service.send_inspection_completed_confirmation(
-                    job['assigned_agent'],
-                    job['property_details']
-                )
+                return {
+                    "success": True,
+                    "message": "Inspection marked as completed"
+                }
+            else:
+                return {"success": False, "error": result.error}
                 
-                # Send notification to client that inspection is completed
-                if job['client_details'].get('phone'):
-                    self.whatsapp_service.send_inspection_completed_to_client(
-                        job['client_details']['phone'],
-                        agent_details,
-                        job['property_details']
-                    )
+        except Exception as e:
+            logger.error("Error completing inspection: %s", e, extra={"job_id": job_id})
+            return {"success": False, "error": str(e)}
+    
+    @traced()
+    def cancel_job(self, job_id: str, reason: Optional[str] = None) -> Dict:
+        """Cancel a job that has not started yet."""
+        try:
+            fields = {'cancellation_reason': reason} if reason else {}
+            result = self.state_machine.apply(job_id, 'cancel', **fields)
+            if result.success:
+                job = result.job
+                workload_index.job_changed(job.get('assigned_agent'), result.from_status, None, None)
+                availability_service.release_job(job.get('job_id'))
+                job_codes.release(job.get('job_id'))
+                event_bus.publish(JobCancelled(job, from_status=result.from_status))
                 
                 return {
                     "success": True,
-                    "message": "Inspection marked as completed"
+                    "message": "Inspection job cancelled"
                 }
             else:
-                return {"success": False, "error": "Failed to complete inspection"}
+                return {"success": False, "error": result.error}
                 
         except Exception as e:
-            print(f"Error completing inspection: {str(e)}")
+            logger.error("Error cancelling job: %s", e, extra={"job_id": job_id})
             return {"success": False, "error": str(e)}
     
     def update_job(self, job_id: str, data: Dict) -> Optional[Dict]:
@@ -295,6 +419,7 @@ class JobService:
             existing_job = self.get_job_by_id(job_id)
             if not existing_job:
                 return None
+            before_agent, before_status = existing_job.get('assigned_agent'), existing_job.get('status')
             
             # Update fields
             for key, value in data.items():
@@ -304,30 +429,39 @@ class JobService:
             existing_job['updated_at'] = datetime.now(timezone.utc).isoformat()
             
             # Update in database
-            success = db_service.update_document('jobs', job_id, existing_job)
+            success = self.db.update_document('jobs', job_id, existing_job)
             if success:
+                workload_index.job_changed(before_agent, before_status, existing_job.get('assigned_agent'), existing_job.get('status'))
+                if existing_job.get('status') in FINAL_STATUSES and before_status not in FINAL_STATUSES:
+                    job_codes.release(existing_job.get('job_id'))
                 return existing_job
             return None
         except Exception as e:
-            print(f"Error updating job: {str(e)}")
+            logger.error("Error updating job: %s", e, extra={"job_id": job_id})
             return None
     
     def delete_job(self, job_id: str) -> bool:
         """Delete a job from database."""
         try:
-            success = db_service.delete_document('jobs', job_id)
+            job = self.get_job_by_id(job_id)
+            # Deletes go by _id, while callers may pass either id
+            success = self.db.delete_document('jobs', job['id'] if job else job_id)
             if success:
+                if job:
+                    workload_index.job_changed(job.get('assigned_agent'), job.get('status'), None, None)
+                    job_codes.release(job.get('job_id'))
                 # Cancel any scheduled jobs for this job
                 scheduler_service.cancel_job(f"inspection_reminder_{job_id}")
             return success
         except Exception as e:
-            print(f"Error deleting job: {str(e)}")
+            logger.error("Error deleting job: %s", e, extra={"job_id": job_id})
             return False
     
+    @traced()
     def get_jobs_by_agent(self, agent_phone: str) -> List[Dict]:
         """Get all jobs assigned to a specific agent."""
         try:
-            jobs = db_service.find_documents('jobs', {'assigned_agent': agent_phone})
+            jobs = self.db.find_documents('jobs', {'assigned_agent': agent_phone})
             for job in jobs:
                 if '_id' in job:
                     job['id'] = str(job['_id'])
@@ -337,13 +471,53 @@ class JobService:
                     job['id'] = job['job_id']
             return jobs
         except Exception as e:
-            print(f"Error getting jobs by agent: {str(e)}")
+            logger.error("Error getting jobs by agent: %s", e, extra={"agent_phone": agent_phone})
             return []
     
+    @traced()
+    def get_current_job_for_agent(self, agent_phone: str, status: str) -> Optional[Dict]:
+        """The agent's job in ``status`` with the soonest inspection, in one indexed query."""
+        try:
+            jobs = self.db.find_documents('jobs', {'assigned_agent': agent_phone, 'status': status}, limit=1, sort=CURRENT_JOB_SORT)
+            if not jobs:
+                return None
+            job = jobs[0]
+            if '_id' in job:
+                job['id'] = str(job['_id'])
+                del job['_id']
+            return job
+        except Exception as e:
+            logger.error("Error getting current job: %s", e, extra={"agent_phone": agent_phone})
+            return None
+    
+    @traced()
+    def get_job_by_code(self, job_code: str) -> Optional[Dict]:
+        """The open job holding a short job code."""
+        job_id = job_codes.resolve(job_code)
+        return self.get_job_by_id(job_id) if job_id else None
+    
+    @traced()
+    def get_open_items_for_agent(self, agent_phone: str) -> Dict[str, List[Dict]]:
+        """Offers still awaiting the agent's answer and the agent's unfinished jobs, soonest first."""
+        try:
+            awaiting = self.db.find_documents(OFFERS_COLLECTION, {'agent_phone': agent_phone, 'state': {'$in': list(AWAITING_STATES)}})
+            offers = []
+            if awaiting:
+                offers = self.db.find_documents(
+                    'jobs', {'job_id': {'$in': [offer['job_id'] for offer in awaiting]}, 'status': 'pending'}, sort=CURRENT_JOB_SORT
+                )
+            jobs = self.db.find_documents(
+                'jobs', {'assigned_agent': agent_phone, 'status': {'$in': list(OPEN_STATUSES)}}, sort=CURRENT_JOB_SORT
+            )
+            return {"offers": offers, "jobs": jobs}
+        except Exception as e:
+            logger.error("Error getting open items: %s", e, extra={"agent_phone": agent_phone})
+            return {"offers": [], "jobs": []}
+    
     def get_jobs_by_client(self, client_id: str) -> List[Dict]:
         """Get all jobs for a specific client."""
         try:
-            jobs = db_service.find_documents('jobs', {'client_id': client_id})
+            jobs = self.db.find_documents('jobs', {'client_id': client_id})
             for job in jobs:
                 if '_id' in job:
                     job['id'] = str(job['_id'])
@@ -353,13 +527,13 @@ class JobService:
                     job['id'] = job['job_id']
             return jobs
         except Exception as e:
-            print(f"Error getting jobs by client: {str(e)}")
+            logger.error("Error getting jobs by client: %s", e)
             return []
     
     def get_jobs_by_property(self, property_id: str) -> List[Dict]:
         """Get all jobs for a specific property."""
         try:
-            jobs = db_service.find_documents('jobs', {'property_id': property_id})
+            jobs = self.db.find_documents('jobs', {'property_id': property_id})
             for job in jobs:
                 if '_id' in job:
                     job['id'] = str(job['_id'])
@@ -369,22 +543,23 @@ class JobService:
                     job['id'] = job['job_id']
             return jobs
         except Exception as e:
-            print(f"Error getting jobs by property: {str(e)}")
+            logger.error("Error getting jobs by property: %s", e)
             return []
     
+    @traced()
     def get_active_agents(self) -> List[Dict]:
-        """Get all active agents from database."""
+        """Get all active agents from the agent index."""
         try:
-            agents = db_service.find_documents('agents', {'status': 'active'})
-            return agents
+            return agent_index.active_agents()
         except Exception as e:
-            print(f"Error getting active agents: {str(e)}")
+            logger.error("Error getting active agents: %s", e)
             return []
     
+    @traced()
     def get_pending_jobs(self) -> List[Dict]:
         """Get all pending inspection jobs."""
         try:
-            jobs = db_service.find_documents('jobs', {'status': 'pending'})
+            jobs = self.db.find_documents('jobs', {'status': 'pending'})
             for job in jobs:
                 if '_id' in job:
                     job['id'] = str(job['_id'])
@@ -394,9 +569,10 @@ class JobService:
                     job['id'] = job['job_id']
             return jobs
         except Exception as e:
-            print(f"Error getting pending jobs: {str(e)}")
+            logger.error("Error getting pending jobs: %s", e)
             return []
     
+    @traced()
     def schedule_inspection_reminder(self, job: Dict) -> bool:
         """Schedule inspection reminder for the assigned agent."""
         try:
@@ -405,7 +581,8 @@ class JobService:
             
             # Schedule reminder 30 minutes before inspection
             reminder_data = {
-                'job_id': job['id'],
+                'job_id': job.get('job_id', job['id']),
+                'job_code': job.get('job_code'),
                 'agent_phone': job['assigned_agent'],
                 'property_details': job['property_details'],
                 'client_details': job['client_details'],
@@ -421,25 +598,157 @@ class JobService:
             
             return reminder_scheduled and start_prompt_scheduled
         except Exception as e:
-            print(f"Error scheduling inspection reminder: {str(e)}")
+            logger.error("Error scheduling inspection reminder: %s", e)
             return False
     
+    @traced()
     def notify_other_agents_job_taken(self, job: Dict, assigned_agent_phone: str) -> None:
-        """Notify other agents that a job has been taken."""
+        """Notify the other agents still waiting on an offer for a job that it has been taken."""
         try:
-            # Get all active agents
-            active_agents = self.get_active_agents()
+            # Open, delivered offers; agents who already got a reply or never received the offer are left out
+            recipients = offer_ledger.recipients_to_notify(job.get('job_id'), assigned_agent_phone)
+            if recipients is None:
+                # Jobs created before the offer ledger, or before targeted dispatch
+                recipients = job.get('dispatched_to')
+            if recipients is None:
+                recipients = [agent.get('phone') for agent in self.get_active_agents()]
             
-            for agent in active_agents:
-                agent_phone = agent.get('phone')
+            for agent_phone in recipients:
                 if agent_phone and agent_phone != assigned_agent_phone:
-                    # Send notification that job is taken
-                    self.whatsapp_service.send_job_taken_notification(
-                        agent_phone,
-                        job['property_details']
-                    )
+                    # Buffered and sent with any other jobs taken in the digest window
+                    job_taken_digest.add(agent_phone, job['property_details'], job_id=job.get('job_id'))
         except Exception as e:
-            print(f"Error notifying other agents: {str(e)}")
+            logger.error("Error notifying other agents: %s", e)
+    
+    # Event bus subscribers; each runs on its own worker thread after the transition is saved
+    
+    def send_assignment_to_agent(self, event: JobEvent):
+        """Confirm the assignment to the agent who won the job."""
+        job = event.job
+        self.whatsapp_service.send_job_assigned_confirmation(
+            job['assigned_agent'],
+            job['property_details'],
+            job['client_details'],
+            job['inspection_date'],
+            job['inspection_time'],
+            job_id=job.get('job_id'),
+            job_code=job.get('job_code')
+        )
+    
+    def send_assignment_to_client(self, event: JobEvent):
+        """Introduce the assigned agent to the client."""
+        job = event.job
+        if job['client_details'].get('phone'):
+            self.whatsapp_service.send_agent_assigned_to_client(
+                job['client_details']['phone'],
+                self.get_agent_details(job['assigned_agent']),
+                job['property_details'],
+                job['inspection_date'],
+                job['inspection_time'],
+                job_id=job.get('job_id')
+            )
+    
+    def close_offers(self, event: JobEvent):
+        """Record the winning offer and tell the agents still waiting on theirs that the job is taken."""
+        job = event.job
+        offer_ledger.mark(job.get('job_id'), job['assigned_agent'], 'accepted')
+        self.notify_other_agents_job_taken(job, job['assigned_agent'])
+    
+    def schedule_assigned_job(self, event: JobEvent):
+        """Cancel the job's remaining dispatch waves and schedule its reminders."""
+        job = event.job
+        if job.get('dispatch_queue'):
+            scheduler_service.cancel_job(f"dispatch_wave_{job.get('job_id')}")
+        self.schedule_inspection_reminder(job)
+    
+    def record_assignment_metrics(self, event: JobEvent):
+        created_at = job_timestamp(event.job.get('created_at'))
+        if created_at is not None:
+            JOB_TIME_TO_ASSIGN_SECONDS.observe(max(0.0, (event.occurred_at - created_at).total_seconds()))
+    
+    def send_schedule_approved_to_agent(self, event: JobEvent):
+        job = event.job
+        self.whatsapp_service.send_schedule_confirmation(
+            job['assigned_agent'],
+            job['property_details'],
+            job['inspection_date'],
+            job['inspection_time'],
+            job_id=job.get('job_id')
+        )
+    
+    def send_schedule_approved_to_client(self, event: JobEvent):
+        job = event.job
+        if job['client_details'].get('phone'):
+            self.whatsapp_service.send_schedule_confirmed_to_client(
+                job['client_details']['phone'],
+                self.get_agent_details(job['assigned_agent']),
+                job['property_details'],
+                job['inspection_date'],
+                job['inspection_time'],
+                job_id=job.get('job_id')
+            )
+    
+    def send_inspection_started_to_agent(self, event: JobEvent):
+        job = event.job
+        self.whatsapp_service.send_inspection_started_confirmation(
+            job['assigned_agent'],
+            job['property_details'],
+            job_id=job.get('job_id'),
+            job_code=job.get('job_code')
+        )
+    
+    def send_inspection_started_to_client(self, event: JobEvent):
+        job = event.job
+        if job['client_details'].get('phone'):
+            self.whatsapp_service.send_inspection_started_to_client(
+                job['client_details']['phone'],
+                self.get_agent_details(job['assigned_agent']),
+                job['property_details'],
+                job_id=job.get('job_id')
+            )
+    
+    def send_inspection_completed_to_agent(self, event: JobEvent):
+        job = event.job
+        self.whatsapp_service.send_inspection_completed_confirmation(
+            job['assigned_agent'],
+            job['property_details'],
+            job_id=job.get('job_id')
+        )
+    
+    def send_inspection_completed_to_client(self, event: JobEvent):
+        job = event.job
+        if job['client_details'].get('phone'):
+            self.whatsapp_service.send_inspection_completed_to_client(
+                job['client_details']['phone'],
+                self.get_agent_details(job['assigned_agent']),
+                job['property_details'],
+                job_id=job.get('job_id')
+            )
+    
+    def send_cancellation_to_agent(self, event: JobEvent):
+        """Stand down the agent the cancelled job was assigned to."""
+        job = event.job
+        if job.get('assigned_agent'):
+            self.whatsapp_service.send_job_cancelled(
+                job['assigned_agent'],
+                job['property_details'],
+                job['inspection_date'],
+                job['inspection_time'],
+                job_id=job.get('job_id')
+            )
+    
+    def unschedule_cancelled_job(self, event: JobEvent):
+        """Drop the cancelled job's pending dispatch, claim window and reminders."""
+        job = event.job
+        job_key = job.get('job_id')
+        if event.details.get('from_status') == 'pending':
+            if job.get('dispatch_queue'):
+                scheduler_service.cancel_job(f"dispatch_wave_{job_key}")
+            if assignment_policy.take_claims(job_key):
+                scheduler_service.cancel_job(f"assignment_window_{job_key}")
+        else:
+            scheduler_service.cancel_job(f"inspection_reminder_{job_key}")
+            scheduler_service.cancel_job(f"inspection_start_{job_key}")
     
     def handle_multiple_property_request(self, client_id: str, new_property_data: Dict) -> Dict:
         """Handle additional property inspection request for existing client."""
@@ -462,7 +771,8 @@ class JobService:
             result = self.whatsapp_service.send_multiple_property_notification(
                 agent_phone,
                 client_name,
-                new_property_data
+                new_property_data,
+                job_id=active_jobs[0].get('job_id')
             )
             
             return {
@@ -473,15 +783,18 @@ class JobService:
             }
             
         except Exception as e:
-            print(f"Error handling multiple property request: {str(e)}")
+            logger.error("Error handling multiple property request: %s", e)
             return {"success": False, "error": str(e)}
     
+    @traced()
     def get_agent_details(self, agent_phone: str) -> Dict:
         """Get agent details by phone number."""
         try:
-            agents = db_service.find_documents('agents', {'phone': agent_phone})
-            if agents:
-                agent = agents[0]
+            agent = agent_index.get_agent(agent_phone)
+            if agent is None:
+                agents = self.db.find_documents('agents', {'phone': agent_phone})
+                agent = agents[0] if agents else None
+            if agent:
                 return {
                     'name': agent.get('name', 'Unknown Agent'),
                     'phone': agent.get('phone', agent_phone),
@@ -503,7 +816,7 @@ class JobService:
                     'specializations': []
                 }
         except Exception as e:
-            print(f"Error getting agent details: {str(e)}")
+            logger.error("Error getting agent details: %s", e, extra={"agent_phone": agent_phone})
             return {
                 'name': 'Unknown Agent',
                 'phone': agent_phone,
@@ -513,3 +826,33 @@ class JobService:
                 'experience_years': 'N/A',
                 'specializations': []
             }
+
+def job_timestamp(value) -> Optional[datetime]:
+    """Parse a stored ISO timestamp, treating naive values as UTC."""
+    if not value:
+        return None
+    try:
+        parsed = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def _subscriber(method_name: str):
+    """Run a JobService event handler on a fresh service, as scheduler callbacks do."""
+    def handle(event: JobEvent):
+        getattr(JobService(), method_name)(event)
+    handle.__name__ = method_name
+    return handle
+
+# The side effects of each transition, run concurrently by the event bus
+JOB_EVENT_SUBSCRIBERS = {
+    JobAssigned: ("send_assignment_to_agent", "send_assignment_to_client", "close_offers",
+                  "schedule_assigned_job", "record_assignment_metrics"),
+    ScheduleApproved: ("send_schedule_approved_to_agent", "send_schedule_approved_to_client"),
+    InspectionStarted: ("send_inspection_started_to_agent", "send_inspection_started_to_client"),
+    InspectionCompleted: ("send_inspection_completed_to_agent", "send_inspection_completed_to_client"),
+    JobCancelled: ("send_cancellation_to_agent", "unschedule_cancelled_job"),
+}
+for _event_type, _method_names in JOB_EVENT_SUBSCRIBERS.items():
+    for _method_name in _method_names:
+        event_bus.subscribe(_event_type, _subscriber(_method_name), _method_name)
@@ -0,0 +1,93 @@
+import logging
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple, Optional, Tuple
+from app.services.database import db_service
+from app.services.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("pending", "assigned", "approved", "in_progress", "completed", "cancelled")
+
+# Statuses a job never leaves
+FINAL_STATUSES = ("completed", "cancelled")
+
+class Transition(NamedTuple):
+    sources: Tuple[str, ...]
+    target: str
+    timestamp_field: str
+
+# Every status change a job may make; anything not listed here is refused
+TRANSITIONS: Dict[str, Transition] = {
+    "assign": Transition(("pending",), "assigned", "assigned_at"),
+    "approve": Transition(("assigned",), "approved", "approved_at"),
+    "start": Transition(("approved",), "in_progress", "started_at"),
+    "complete": Transition(("in_progress",), "completed", "completed_at"),
+    "cancel": Transition(("pending", "assigned", "approved"), "cancelled", "cancelled_at"),
+}
+
+# What a job is waiting for in each status
+NEXT_ACTIONS = {
+    "pending": "wait_for_yes",
+    "assigned": "wait_for_confirm",
+    "approved": "wait_for_inspection_time",
+    "in_progress": "wait_for_complete",
+    "completed": "completed",
+    "cancelled": "cancelled",
+}
+
+def _or(statuses: Tuple[str, ...]) -> str:
+    return statuses[0] if len(statuses) == 1 else f"{', '.join(statuses[:-1])} or {statuses[-1]}"
+
+# The reply that moves a job on from each status, as agents type it
+AGENT_COMMANDS = {
+    "pending": "YES",
+    "assigned": "CONFIRM",
+    "approved": "START",
+    "in_progress": "COMPLETE",
+}
+
+class TransitionResult(NamedTuple):
+    job: Optional[Dict] = None
+    from_status: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.job is not None
+
+class JobStateMachine:
+    """Applies the TRANSITIONS table to stored jobs.
+
+    Each transition is one conditional update that only matches while the
+    job is still in a source status, and hands back the updated job, so a
+    transition costs a single round trip and two concurrent transitions
+    from the same status cannot both succeed. Only a refused transition
+    reads the job again, to say why.
+    """
+
+    def __init__(self, db: Optional[StorageBackend] = None):
+        self.db = db if db is not None else db_service
+
+    def apply(self, job_id: str, action: str, **fields) -> TransitionResult:
+        """Move a job through ``action``, also setting ``fields`` in the same write."""
+        transition = TRANSITIONS[action]
+        update_data = dict(fields)
+        update_data['status'] = transition.target
+        update_data[transition.timestamp_field] = datetime.now(timezone.utc).isoformat()
+
+        # Multi-source transitions try each source in turn so the caller learns which one it left
+        for source in transition.sources:
+            job = self.db.find_and_update('jobs', job_id, {'status': source}, dict(update_data))
+            if job is not None:
+                if '_id' in job:
+                    job['id'] = str(job['_id'])
+                    del job['_id']
+                return TransitionResult(job=job, from_status=source)
+
+        current = self.db.find_document_by_id('jobs', job_id)
+        if not current:
+            return TransitionResult(error="Inspection job not found")
+        logger.info("Refused %s of a %s job", action, current.get('status'),
+                    extra={"job_id": job_id, "event": "transition_refused"})
+        return TransitionResult(from_status=current.get('status'),
+                                error=f"Job not in {_or(transition.sources)} status")
@@ -0,0 +1,303 @@
+import copy
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+from bson import ObjectId
+from app.services.storage import (
+    InsertDefaults, SortSpec, StorageBackend, get_field, index_fields, match_document, serialize_document, sort_documents, timed_operation
+)
+
+logger = logging.getLogger(__name__)
+
+class _FieldIndex:
+    """Secondary index mapping a field's values to document ids."""
+
+    def __init__(self, field: str, unique: bool = False):
+        self.field = field
+        self.unique = unique
+        self.entries: Dict = defaultdict(set)
+        # Documents whose value cannot be hashed are always scanned
+        self.unindexed: Set[str] = set()
+
+    def _keys(self, document: Dict) -> Optional[List]:
+        found, value = get_field(document, self.field)
+        if not found:
+            return [None]
+        values = value if isinstance(value, list) else [value]
+        keys = []
+        for item in values:
+            if hasattr(item, 'isoformat'):
+                item = item.isoformat()
+            try:
+                hash(item)
+            except TypeError:
+                return None
+            keys.append(item)
+        return keys
+
+    def add(self, doc_id: str, document: Dict):
+        keys = self._keys(document)
+        if keys is None:
+            self.unindexed.add(doc_id)
+            return
+        for key in keys:
+            self.entries[key].add(doc_id)
+
+    def remove(self, doc_id: str, document: Dict):
+        self.unindexed.discard(doc_id)
+        keys = self._keys(document) or []
+        for key in keys:
+            ids = self.entries.get(key)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self.entries[key]
+
+    def conflicts(self, doc_id: str, document: Dict) -> bool:
+        """Whether adding the document would violate a unique constraint."""
+        if not self.unique:
+            return False
+        for key in self._keys(document) or []:
+            if key is None:
+                continue
+            if self.entries.get(key, set()) - {doc_id}:
+                return True
+        return False
+
+    def lookup(self, condition) -> Optional[Set[str]]:
+        """Candidate ids for a query condition, or None if the index cannot narrow it."""
+        if isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition):
+            if set(condition) - {'$eq', '$in'}:
+                return None
+            values = [condition['$eq']] if '$eq' in condition else list(condition['$in'])
+        else:
+            values = [condition]
+        ids: Set[str] = set(self.unindexed)
+        for value in values:
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            try:
+                ids |= self.entries.get(value, set())
+            except TypeError:
+                return None
+        return ids
+
+class MemoryStorage(StorageBackend):
+    """In-process storage engine with secondary indexes, for benchmarks and CI."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._collections: Dict[str, Dict[str, Dict]] = defaultdict(dict)
+        self._indexes: Dict[str, Dict[str, _FieldIndex]] = defaultdict(dict)
+        # Insertion sequence, so narrowed scans keep MongoDB's natural order
+        self._sequence: Dict[str, int] = {}
+        self._next_sequence = 0
+        self._lock = threading.RLock()
+        logger.info("Using in-memory storage")
+
+    def is_connected(self) -> bool:
+        return True
+
+    @timed_operation("insert")
+    def insert_document(self, collection_name: str, document: Dict) -> Optional[str]:
+        """Insert a document into a collection."""
+        try:
+            with self._lock:
+                if 'created_at' not in document:
+                    document['created_at'] = datetime.now(timezone.utc)
+                if 'updated_at' not in document:
+                    document['updated_at'] = datetime.now(timezone.utc)
+                doc_id = str(document.get('_id') or ObjectId())
+                stored = copy.deepcopy(document)
+                stored['_id'] = doc_id
+                self._add(collection_name, doc_id, stored)
+                document['_id'] = doc_id
+                return doc_id
+        except Exception as e:
+            logger.error("Error inserting document: %s", e)
+        return None
+
+    @timed_operation("find")
+    def find_documents(self, collection_name: str, query: Dict = None, limit: int = 0, sort: Optional[SortSpec] = None) -> List[Dict]:
+        """Find documents in a collection."""
+        try:
+            with self._lock:
+                matches = []
+                for doc_id in self._candidates(collection_name, query):
+                    document = self._collections[collection_name].get(doc_id)
+                    if document is not None and match_document(document, query):
+                        matches.append(document)
+                        if not sort and limit > 0 and len(matches) >= limit:
+                            break
+                if sort:
+                    sort_documents(matches, sort)
+                if limit > 0:
+                    matches = matches[:limit]
+                return [serialize_document(copy.deepcopy(document)) for document in matches]
+        except Exception as e:
+            logger.error("Error finding documents: %s", e)
+        return []
+
+    @timed_operation("find_by_id")
+    def find_document_by_id(self, collection_name: str, document_id: str) -> Optional[Dict]:
+        """Find a document by its job_id or _id."""
+        with self._lock:
+            doc_id = self._resolve_id(collection_name, document_id)
+            if doc_id is None:
+                return None
+            return serialize_document(copy.deepcopy(self._collections[collection_name][doc_id]))
+
+    @timed_operation("update")
+    def update_document(self, collection_name: str, document_id: str, update_data: Dict) -> bool:
+        """Update a document by its job_id or _id."""
+        try:
+            with self._lock:
+                doc_id = self._resolve_id(collection_name, document_id)
+                if doc_id is None:
+                    return False
+                update_data['updated_at'] = datetime.now(timezone.utc)
+                current = self._collections[collection_name][doc_id]
+                updated = dict(current)
+                updated.update(copy.deepcopy({k: v for k, v in update_data.items() if k != '_id'}))
+                self._replace(collection_name, doc_id, current, updated)
+                return True
+        except Exception as e:
+            logger.error("Error updating document: %s", e)
+        return False
+
+    @timed_operation("find_and_update")
+    def find_and_update(self, collection_name: str, document_id: str, condition: Dict, update_data: Dict) -> Optional[Dict]:
+        """Update a document by its job_id or _id if it matches ``condition``, returning it."""
+        try:
+            with self._lock:
+                doc_id = self._resolve_id(collection_name, document_id)
+                if doc_id is None:
+                    return None
+                current = self._collections[collection_name][doc_id]
+                if not match_document(current, condition):
+                    return None
+                update_data['updated_at'] = datetime.now(timezone.utc)
+                updated = dict(current)
+                updated.update(copy.deepcopy({k: v for k, v in update_data.items() if k != '_id'}))
+                self._replace(collection_name, doc_id, current, updated)
+                return serialize_document(copy.deepcopy(updated))
+        except Exception as e:
+            logger.error("Error updating document: %s", e)
+        return None
+
+    @timed_operation("delete")
+    def delete_document(self, collection_name: str, document_id: str) -> bool:
+        """Delete a document by its _id."""
+        with self._lock:
+            document = self._collections[collection_name].pop(str(document_id), None)
+            if document is None:
+                return False
+            for index in self._indexes[collection_name].values():
+                index.remove(str(document_id), document)
+            self._sequence.pop(str(document_id), None)
+            return True
+
+    @timed_operation("bulk_upsert")
+    def bulk_upsert(self, collection_name: str, key_field: str, documents: List[Dict],
+                    insert_defaults: Optional[InsertDefaults] = None) -> Dict:
+        """Upsert documents keyed on a field."""
+        result = {"inserted": 0, "updated": 0, "errors": []}
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for document in documents:
+                try:
+                    fields = {k: v for k, v in document.items() if k not in ('_id', 'created_at')}
+                    fields['updated_at'] = now
+                    existing = self._find_ids(collection_name, {key_field: document[key_field]})
+                    if existing:
+                        doc_id = existing[0]
+                        current = self._collections[collection_name][doc_id]
+                        updated = dict(current)
+                        updated.update(copy.deepcopy(fields))
+                        self._replace(collection_name, doc_id, current, updated)
+                        result["updated"] += 1
+                    else:
+                        doc_id = str(ObjectId())
+                        stored = copy.deepcopy({**(insert_defaults(document) if insert_defaults else {}), **fields})
+                        stored['_id'] = doc_id
+                        stored['created_at'] = document.get('created_at', now)
+                        self._add(collection_name, doc_id, stored)
+                        result["inserted"] += 1
+                except Exception as e:
+                    result["errors"].append({key_field: document.get(key_field), "error": str(e)})
+        return result
+
+    def create_index(self, collection_name: str, field, unique: bool = False):
+        """Create secondary indexes for the fields of an index spec."""
+        with self._lock:
+            fields = index_fields(field)
+            for name in fields:
+                if name in self._indexes[collection_name]:
+                    continue
+                # Uniqueness only applies to single-field indexes, as in MongoDB
+                index = _FieldIndex(name, unique=unique and len(fields) == 1)
+                for doc_id, document in self._collections[collection_name].items():
+                    index.add(doc_id, document)
+                self._indexes[collection_name][name] = index
+
+    def _add(self, collection_name: str, doc_id: str, document: Dict):
+        indexes = self._indexes[collection_name].values()
+        if doc_id in self._collections[collection_name]:
+            raise ValueError(f"Duplicate _id: {doc_id}")
+        for index in indexes:
+            if index.conflicts(doc_id, document):
+                raise ValueError(f"Duplicate key for unique index on {index.field}")
+        self._collections[collection_name][doc_id] = document
+        self._sequence[doc_id] = self._next_sequence
+        self._next_sequence += 1
+        for index in indexes:
+            index.add(doc_id, document)
+
+    def _replace(self, collection_name: str, doc_id: str, current: Dict, updated: Dict):
+        indexes = self._indexes[collection_name].values()
+        for index in indexes:
+            if index.conflicts(doc_id, updated):
+                raise ValueError(f"Duplicate key for unique index on {index.field}")
+        for index in indexes:
+            index.remove(doc_id, current)
+            index.add(doc_id, updated)
+        self._collections[collection_name][doc_id] = updated
+
+    def _candidates(self, collection_name: str, query: Optional[Dict]):
+        """Narrow the scan to the documents every indexed condition allows."""
+        best = None
+        if query:
+            indexes = self._indexes[collection_name]
+            matches = []
+            for field, condition in query.items():
+                index = indexes.get(field)
+                if index is None:
+                    continue
+                ids = index.lookup(condition)
+                if ids is not None:
+                    matches.append(ids)
+            # Intersect from the most selective, as a compound index would narrow on each field
+            for ids in sorted(matches, key=len):
+                best = set(ids) if best is None else best & ids
+                if not best:
+                    break
+        if best is None:
+            return list(self._collections[collection_name].keys())
+        return sorted(best, key=lambda doc_id: self._sequence.get(doc_id, 0))
+
+    def _find_ids(self, collection_name: str, query: Dict) -> List[str]:
+        collection = self._collections[collection_name]
+        return [doc_id for doc_id in self._candidates(collection_name, query)
+                if doc_id in collection and match_document(collection[doc_id], query)]
+
+    def _resolve_id(self, collection_name: str, document_id: str) -> Optional[str]:
+        # Look up by job_id first (UUID-style IDs), then by _id
+        ids = self._find_ids(collection_name, {"job_id": document_id})
+        if ids:
+            return ids[0]
+        if str(document_id) in self._collections[collection_name]:
+            return str(document_id)
+        return None
@@ -0,0 +1,266 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond DB hits to slow provider calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """Base class holding one child per label combination."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+    def labels(self, *values):
+        """Return the child for a label combination, creating it on first use."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.get())}"]
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def get(self) -> float:
+        return self._value
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = float(value)
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+class _HistogramChild:
+    __slots__ = ("_upper_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, upper_bounds: Sequence[float]):
+        self._upper_bounds = upper_bounds
+        self._counts = [0] * (len(upper_bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default.dec(amount)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def _render_child(self, key, child) -> List[str]:
+        counts, total = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Holds every metric and renders them in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                return self._metrics[metric.name]
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        _update_cache_hit_ratios()
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Global metrics registry
+registry = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+DB_OPERATION_SECONDS = registry.histogram(
+    "db_operation_duration_seconds", "Storage operation latency", ("backend", "collection", "operation")
+)
+TWILIO_SEND_SECONDS = registry.histogram(
+    "twilio_send_duration_seconds", "Twilio message send latency", ("outcome",)
+)
+TWILIO_SEND_ERRORS = registry.counter(
+    "twilio_send_errors_total", "Failed Twilio message sends", ("reason",)
+)
+TWILIO_SEND_RETRIES = registry.counter(
+    "twilio_send_retries_total", "Twilio sends retried after a transient failure", ("reason",)
+)
+CIRCUIT_STATE = registry.gauge(
+    "circuit_breaker_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)", ("circuit",)
+)
+CIRCUIT_TRANSITIONS = registry.counter(
+    "circuit_breaker_transitions_total", "Circuit breaker state changes by the state entered", ("circuit", "state")
+)
+SEND_QUEUE_DEPTH = registry.gauge(
+    "send_queue_depth", "Messages waiting for the provider to recover", ("queue",)
+)
+TWILIO_SENDER_MESSAGES = registry.counter(
+    "twilio_sender_messages_total", "Messages handed to Twilio per sender number", ("sender",)
+)
+TWILIO_SENDER_WAIT_SECONDS = registry.histogram(
+    "twilio_sender_wait_seconds", "Time a send was deferred for its sender's rate limit", ("sender",)
+)
+SCHEDULER_FIRE_LAG_SECONDS = registry.histogram(
+    "scheduler_fire_lag_seconds", "Delay between a scheduled job's run time and its submission", ("job_type",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0)
+)
+JOB_TAKEN_NOTICES = registry.counter(
+    "job_taken_notices_total", "Job-taken notices buffered for agents and the messages that carried them", ("stage",)
+)
+JOB_EVENTS = registry.counter(
+    "job_events_total", "Job state transitions published on the event bus", ("event",)
+)
+EVENT_HANDLER_SECONDS = registry.histogram(
+    "event_handler_duration_seconds", "Time event bus subscribers take per event", ("event", "handler", "outcome")
+)
+JOB_TIME_TO_ASSIGN_SECONDS = registry.histogram(
+    "job_time_to_assign_seconds", "Time from a job's creation to its assignment", (),
+    buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+)
+DB_ROUND_TRIPS_PER_REQUEST = registry.histogram(
+    "db_round_trips_per_request", "Storage round trips made while serving a request", ("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+)
+UNIT_OF_WORK_WRITES = registry.counter(
+    "unit_of_work_writes_total", "Updates held by a request's unit of work, flushed or merged into another", ("collection", "outcome")
+)
+AGENT_MAILBOXES = registry.gauge(
+    "agent_mailboxes", "Agents with inbound commands queued or running"
+)
+AGENT_COMMAND_WAIT_SECONDS = registry.histogram(
+    "agent_command_wait_seconds", "Time an inbound agent command waited behind the same agent's earlier ones", (),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+CACHE_REQUESTS = registry.counter(
+    "cache_requests_total", "Cache lookups by result", ("cache", "result")
+)
+CACHE_HIT_RATIO = registry.gauge(
+    "cache_hit_ratio", "Fraction of cache lookups served from the cache", ("cache",)
+)
+
+def record_cache_access(cache: str, hit: bool):
+    """Count a cache lookup; hit ratios are derived when metrics are rendered."""
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+def _update_cache_hit_ratios():
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), child in list(CACHE_REQUESTS._children.items()):
+        hits_and_total = totals.setdefault(cache, [0.0, 0.0])
+        if result == "hit":
+            hits_and_total[0] += child.get()
+        hits_and_total[1] += child.get()
+    for cache, (hits, total) in totals.items():
+        CACHE_HIT_RATIO.labels(cache).set(hits / total if total else 0.0)
@@ -0,0 +1,83 @@
+import atexit
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+from app.services.metrics import JOB_TAKEN_NOTICES
+from app.services.scheduler import scheduler_service
+from app.services.whatsapp_service import WhatsAppService
+
+logger = logging.getLogger(__name__)
+
+class JobTakenDigest:
+    """Buffers "job taken" notices per agent and sends them as one message.
+
+    Opt-in: with the default JOB_TAKEN_DIGEST_WINDOW of 0 each notice is
+    sent on its own, as before. With a window set, the first notice
+    buffered for an agent opens a window of that many seconds, and when
+    the scheduler closes it the agent gets a single message listing every
+    job taken in the meantime. A buffer is sent straight away once it
+    holds JOB_TAKEN_DIGEST_MAX_ITEMS jobs, or as soon as the agent sends
+    any command, so nobody acts on an offer they were owed a notice for.
+    Buffers live in this process's memory: each worker process keeps its
+    own, and whatever is left is sent at a clean exit but lost if the
+    process is killed.
+    """
+
+    def __init__(self, window: Optional[float] = None, max_items: Optional[int] = None):
+        self.window = window if window is not None else float(os.getenv("JOB_TAKEN_DIGEST_WINDOW", "0"))
+        self.max_items = max_items if max_items is not None else int(os.getenv("JOB_TAKEN_DIGEST_MAX_ITEMS", "10"))
+        self.whatsapp_service = WhatsAppService()
+        # agent phone -> (job_id, property_details) in the order the jobs were taken
+        self._pending: Dict[str, List[Tuple[Optional[str], Dict]]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, agent_phone: str, property_details: Dict, job_id: Optional[str] = None):
+        """Queue a notice that a job the agent was offered went to someone else."""
+        JOB_TAKEN_NOTICES.labels("buffered").inc()
+        if self.window <= 0:
+            self._send(agent_phone, [(job_id, property_details)])
+            return
+        with self._lock:
+            buffered = self._pending.setdefault(agent_phone, [])
+            opens_window = not buffered
+            if job_id is None or all(job_id != queued_id for queued_id, _ in buffered):
+                buffered.append((job_id, property_details))
+            full = len(buffered) >= self.max_items > 0
+        if full:
+            self.flush(agent_phone)
+        elif opens_window:
+            scheduler_service.schedule_job_taken_digest(agent_phone, self.window)
+
+    def flush(self, agent_phone: str) -> int:
+        """Send an agent's buffered notices; returns how many jobs they covered."""
+        with self._lock:
+            buffered = self._pending.pop(agent_phone, None)
+        if not buffered:
+            return 0
+        self._send(agent_phone, buffered)
+        return len(buffered)
+
+    def flush_all(self) -> int:
+        with self._lock:
+            agent_phones = list(self._pending)
+        return sum(self.flush(agent_phone) for agent_phone in agent_phones)
+
+    def pending(self, agent_phone: str) -> List[Dict]:
+        with self._lock:
+            return [property_details for _, property_details in self._pending.get(agent_phone, [])]
+
+    def _send(self, agent_phone: str, buffered: List[Tuple[Optional[str], Dict]]):
+        JOB_TAKEN_NOTICES.labels("sent").inc()
+        if len(buffered) == 1:
+            job_id, property_details = buffered[0]
+            result = self.whatsapp_service.send_job_taken_notification(agent_phone, property_details, job_id=job_id)
+        else:
+            result = self.whatsapp_service.send_job_taken_digest(agent_phone, [property_details for _, property_details in buffered])
+        if not result.get("success"):
+            logger.error("Failed to send job-taken notice: %s", result.get("error"),
+                         extra={"agent_phone": agent_phone, "jobs": len(buffered)})
+
+# Global job-taken digest instance
+job_taken_digest = JobTakenDigest()
+atexit.register(job_taken_digest.flush_all)
@@ -0,0 +1,148 @@
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set
+from app.services.database import db_service
+from app.services.delivery_service import delivery_service
+from app.services.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+OFFERS_COLLECTION = "offers"
+
+# open: sent and unanswered; claimed: YES recorded during a claim window;
+# answered: the agent already got a direct reply; accepted: the agent won the job
+OFFER_STATES = ("open", "claimed", "answered", "accepted")
+AWAITING_STATES = ("open", "claimed")
+
+# The states an offer may be marked from for each target; nothing moves an offer out of accepted
+MARK_SOURCES = {
+    "claimed": ("open",),
+    "answered": ("open", "claimed"),
+    "accepted": ("open", "claimed", "answered"),
+}
+
+# Statuses that prove an offer reached the agent, and those that prove it never will
+DELIVERED_STATUSES = ("delivered", "read")
+UNDELIVERABLE_STATUSES = ("failed", "undelivered")
+
+def offer_id(job_id: str, agent_phone: str) -> str:
+    return f"{job_id}:{agent_phone}"
+
+class OfferLedger:
+    """One record per (job, agent) offer: the message that carried it and where it stands.
+
+    When a job is taken, the agents to tell are the ones still awaiting an
+    answer, less the winner and anyone whose offer never reached them. With
+    TWILIO_STATUS_CALLBACK_URL set only offers with a delivered/read callback
+    count as reached; without callbacks every send Twilio accepted does. An
+    offer whose send is waiting in the send queue is recorded as ``queued``
+    and counts as on its way until ``record_queued_result`` says otherwise.
+    """
+
+    def __init__(self, db: Optional[StorageBackend] = None):
+        self.db = db if db is not None else db_service
+
+    def record_offers(self, job_id: str, send_results: List[Dict]):
+        """Record a wave of offers from ``send_inspection_request_to_agents`` results."""
+        now = datetime.now(timezone.utc).isoformat()
+        documents = []
+        for sent in send_results:
+            document = {
+                "offer_id": offer_id(job_id, sent["agent_number"]),
+                "job_id": job_id,
+                "agent_phone": sent["agent_number"],
+                "state": "open",
+                "offered_at": now,
+            }
+            if not sent["result"].get("queued"):
+                document["message_sid"] = sent["result"].get("message_id") if sent["result"].get("success") else None
+                document["queued"] = False
+            documents.append(document)
+        if not documents:
+            return
+        # The queue may have sent a queued offer already; its outcome must not be written over
+        result = self.db.bulk_upsert(OFFERS_COLLECTION, "offer_id", documents, self._queued_defaults)
+        if result["errors"]:
+            logger.error("Failed to record %d offers", len(result["errors"]), extra={"job_id": job_id})
+
+    @staticmethod
+    def _queued_defaults(document: Dict) -> Dict:
+        return {"message_sid": None, "queued": True}
+
+    def record_queued_result(self, job_id: str, agent_phone: str, result: Dict):
+        """Record how a queued offer's send ended: its message SID, or that it never went out."""
+        fields = {
+            "offer_id": offer_id(job_id, agent_phone),
+            "job_id": job_id,
+            "agent_phone": agent_phone,
+            "message_sid": result.get("message_id") if result.get("success") else None,
+            "queued": False,
+        }
+        outcome = self.db.bulk_upsert(OFFERS_COLLECTION, "offer_id", [fields])
+        if outcome["errors"]:
+            logger.error("Failed to record a queued offer's send", extra={"job_id": job_id, "agent_phone": agent_phone})
+
+    def mark(self, job_id: str, agent_phone: str, state: str) -> bool:
+        """Move an offer to ``state`` if MARK_SOURCES allows it from where it stands; returns whether it moved.
+
+        The move is a conditional update, so a late reply from the winning
+        agent cannot turn their accepted offer back into an answered one.
+        """
+        if state not in MARK_SOURCES:
+            raise ValueError(f"Invalid offer state: {state}")
+        answered_at = datetime.now(timezone.utc).isoformat()
+        offers = self.db.find_documents(OFFERS_COLLECTION, {"offer_id": offer_id(job_id, agent_phone)}, limit=1)
+        if offers:
+            moved = self.db.find_and_update(
+                OFFERS_COLLECTION, offers[0]["_id"], {"state": {"$in": list(MARK_SOURCES[state])}},
+                {"state": state, "answered_at": answered_at}
+            )
+            if moved is None:
+                logger.info("Kept %s offer instead of marking it %s", offers[0].get("state"), state,
+                            extra={"job_id": job_id, "agent_phone": agent_phone})
+            return moved is not None
+        # Jobs dispatched before the ledger have no offer to move
+        result = self.db.bulk_upsert(OFFERS_COLLECTION, "offer_id", [{
+            "offer_id": offer_id(job_id, agent_phone),
+            "job_id": job_id,
+            "agent_phone": agent_phone,
+            "state": state,
+            "answered_at": answered_at,
+        }])
+        return not result["errors"]
+
+    def get_offers(self, job_id: str) -> List[Dict]:
+        return self.db.find_documents(OFFERS_COLLECTION, {"job_id": job_id})
+
+    def recipients_to_notify(self, job_id: str, assigned_agent_phone: str) -> Optional[List[str]]:
+        """Agents to tell that a job was taken, or None when the job predates the ledger."""
+        offers = self.get_offers(job_id)
+        if not any(offer.get("offered_at") for offer in offers):
+            return None
+        awaiting = {offer["agent_phone"] for offer in offers if offer.get("state") in AWAITING_STATES}
+        recipients = awaiting - {assigned_agent_phone} - self._unreached(offers, job_id)
+        # Keep dispatch order so notices go out best-ranked first, as the offers did
+        ordered = sorted(offers, key=lambda offer: str(offer.get("offered_at")))
+        return [offer["agent_phone"] for offer in ordered if offer["agent_phone"] in recipients]
+
+    def _unreached(self, offers: Iterable[Dict], job_id: str) -> Set[str]:
+        sids = {offer["message_sid"]: offer["agent_phone"] for offer in offers if offer.get("message_sid")}
+        # Queued offers are still on their way; only a send that was refused or given up never arrives
+        unreached = {offer["agent_phone"] for offer in offers if not offer.get("message_sid") and not offer.get("queued")}
+        if not sids:
+            return unreached
+        statuses = {
+            message["message_sid"]: message.get("status")
+            for message in delivery_service.get_messages_for_job(job_id)
+            if message.get("message_sid") in sids
+        }
+        require_delivery = bool(os.getenv("TWILIO_STATUS_CALLBACK_URL"))
+        for sid, agent_phone in sids.items():
+            status = statuses.get(sid)
+            if status in UNDELIVERABLE_STATUSES or (require_delivery and status not in DELIVERED_STATUSES):
+                unreached.add(agent_phone)
+        return unreached
+
+# Global offer ledger instance
+offer_ledger = OfferLedger()
@@ -0,0 +1,123 @@
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+# Frames under this directory are application code
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class SamplingProfiler:
+    """Periodically samples thread stacks while a request runs.
+
+    The thread that started the profile (the event loop for async routes) is
+    always sampled, idle or not, so time spent awaiting shows up too. Other
+    threads are sampled only while they are executing application code,
+    which picks up work handed to the threadpool. Concurrent requests
+    sharing those threads appear in the profile as well.
+    """
+
+    def __init__(self, interval: float = 0.005, target_thread_id: Optional[int] = None):
+        self.interval = interval
+        self.target_thread_id = target_thread_id or threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Tell the sampler to finish without waiting for it; call join() before reading the stacks."""
+        self._stop.set()
+        self.duration = time.time() - self.started_at
+
+    def join(self):
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = _fold(frame)
+                if thread_id == self.target_thread_id or APP_ROOT in stack:
+                    self.stacks[stack] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        """Collapsed stacks, one ``frame;frame;frame count`` line each (flamegraph.pl / speedscope)."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+def _fold(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    parts.reverse()
+    return ";".join(parts)
+
+class ProfileStore:
+    """Keeps recent profiles in memory and, when PROFILE_DIR is set, writes them to disk."""
+
+    def __init__(self, directory: Optional[str] = None, keep: int = 50):
+        self.directory = directory if directory is not None else os.getenv("PROFILE_DIR")
+        self.keep = keep
+        self._profiles: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex[:12]
+
+    def save(self, profile_id: str, profiler: SamplingProfiler, method: str, path: str, trace_id: Optional[str], reason: str):
+        folded = profiler.folded()
+        entry = {
+            "profile_id": profile_id,
+            "method": method,
+            "path": path,
+            "trace_id": trace_id,
+            "reason": reason,
+            "started_at": datetime.fromtimestamp(profiler.started_at, timezone.utc).isoformat(),
+            "duration_ms": round(profiler.duration * 1000, 3),
+            "samples": profiler.samples,
+            "folded": folded,
+        }
+        with self._lock:
+            self._profiles[profile_id] = entry
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, f"{profile_id}.folded"), "w") as f:
+                f.write(folded)
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            entries = list(self._profiles.values())
+        return [{key: value for key, value in entry.items() if key != "folded"} for entry in reversed(entries)]
+
+profile_store = ProfileStore()
+
+def is_admin_key(key: Optional[str]) -> bool:
+    """Check a key against ADMIN_API_KEY; always false when no admin key is configured."""
+    admin_key = os.getenv("ADMIN_API_KEY")
+    if not admin_key or not key:
+        return False
+    return hmac.compare_digest(key.encode(), admin_key.encode())
@@ -0,0 +1,251 @@
+import logging
+import os
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from app.services.metrics import CIRCUIT_STATE, CIRCUIT_TRANSITIONS, SEND_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+class RetryPolicy:
+    """Exponential backoff with full jitter.
+
+    Attempt ``n`` (from 0) waits a uniformly random time up to
+    ``min(max_delay, base_delay * 2**n)``, which spreads retries from many
+    callers instead of having them hit a recovering provider in lockstep.
+    """
+
+    def __init__(self, attempts: Optional[int] = None, base_delay: Optional[float] = None, max_delay: Optional[float] = None):
+        self.attempts = max(0, attempts if attempts is not None else int(os.getenv("TWILIO_RETRY_ATTEMPTS", "3")))
+        self.base_delay = base_delay if base_delay is not None else float(os.getenv("TWILIO_RETRY_BASE_DELAY", "0.25"))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv("TWILIO_RETRY_MAX_DELAY", "4"))
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+class CircuitBreaker:
+    """Fails fast after repeated provider failures.
+
+    Closed: calls go through, and ``failure_threshold`` consecutive
+    failures open the circuit. Open: calls are refused until
+    ``reset_timeout`` seconds have passed, then one probe is let through
+    (half-open); its success closes the circuit and its failure re-opens it.
+    Only failures that say something about the provider's health should be
+    recorded; a rejected phone number is not one.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold if failure_threshold is not None else int(os.getenv("TWILIO_BREAKER_THRESHOLD", "5"))
+        self.reset_timeout = reset_timeout if reset_timeout is not None else float(os.getenv("TWILIO_BREAKER_RESET_SECONDS", "30"))
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(name).set(0)
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        logger.warning("Circuit %s %s -> %s", self.name, self.state, state,
+                       extra={"event": "circuit_transition", "circuit": self.name, "state": state})
+        self.state = state
+        CIRCUIT_STATE.labels(self.name).set(self._STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(self.name, state).inc()
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; in half-open only one probe is allowed at a time."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self._transition(self.HALF_OPEN)
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def ready(self) -> bool:
+        """Whether ``allow`` would let a call through now, without claiming the probe."""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return self.state == self.CLOSED or not self._probing
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._transition(self.CLOSED)
+
+    def release(self):
+        """End a call that said nothing about the provider's health, such as a rejected number."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._transition(self.OPEN)
+
+    @property
+    def is_open(self) -> bool:
+        return self.state != self.CLOSED
+
+class _QueuedSend:
+    __slots__ = ("queued_at", "not_before", "retries", "send", "args", "kwargs", "on_done", "seq")
+
+    def __init__(self, send: Callable[..., Dict], args: tuple, kwargs: dict, delay: float,
+                 on_done: Optional[Callable[[Dict], None]] = None, seq: int = 0):
+        self.queued_at = time.time()
+        self.not_before = self.queued_at + delay
+        self.retries = 0
+        self.send = send
+        self.args = args
+        self.kwargs = kwargs
+        self.on_done = on_done
+        # Breaks not_before ties in the order sends were queued
+        self.seq = seq
+
+    def __lt__(self, other: "_QueuedSend") -> bool:
+        return (self.not_before, self.seq) < (other.not_before, other.seq)
+
+    def finish(self, result: Dict):
+        """Tell the caller how the send ended: its last result, or why it was dropped."""
+        if self.on_done is None:
+            return
+        try:
+            self.on_done(result)
+        except Exception:
+            logger.exception("Error handling the outcome of a queued send")
+
+class SendQueue:
+    """Retries sends in the background so callers never wait on backoff.
+
+    Sends are held in a heap ordered by when they are next due, so one
+    send backing off never holds up others that are due. A background
+    thread replays every due send while the circuit would let a call
+    through, so while the provider is down the first replay doubles as
+    the half-open probe. A replay that fails transiently is rescheduled
+    ``retry.delay`` later, or after the ``retry_after`` its result asks
+    for; a send that keeps failing while the circuit is closed is dropped
+    after ``retry.attempts`` retries. A result's ``retry_with`` is merged
+    into the send's keyword arguments for its next replay. Entries older
+    than ``max_age`` seconds are dropped, and once ``max_size`` are held the
+    oldest make way for new ones. A send's ``on_done`` is called with its
+    final result once it leaves the queue, sent, refused or dropped.
+    """
+
+    def __init__(self, name: str, breaker: CircuitBreaker, retry: Optional[RetryPolicy] = None,
+                 max_size: Optional[int] = None, max_age: Optional[float] = None, poll_interval: float = 1.0):
+        self.name = name
+        self.breaker = breaker
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.max_size = max_size if max_size is not None else int(os.getenv("TWILIO_SEND_QUEUE_SIZE", "1000"))
+        self.max_age = max_age if max_age is not None else float(os.getenv("TWILIO_SEND_QUEUE_MAX_AGE", "3600"))
+        self.poll_interval = poll_interval
+        self._items: List[_QueuedSend] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+    def put(self, send: Callable[..., Dict], *args, delay: float = 0.0,
+            on_done: Optional[Callable[[Dict], None]] = None, **kwargs) -> bool:
+        """Queue ``send(*args, **kwargs)``, which returns a result with ``success`` and ``retryable``.
+
+        The first replay waits at least ``delay`` seconds. Returns False when
+        queueing is disabled (a size of 0).
+        """
+        if self.max_size <= 0:
+            return False
+        dropped = None
+        with self._lock:
+            if len(self._items) >= self.max_size:
+                dropped = min(self._items, key=lambda item: item.queued_at)
+                self._items.remove(dropped)
+                heapq.heapify(self._items)
+                logger.error("Send queue %s full, dropping its oldest message", self.name)
+            heapq.heappush(self._items, _QueuedSend(send, args, kwargs, delay, on_done, next(self._seq)))
+            SEND_QUEUE_DEPTH.labels(self.name).set(len(self._items))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=f"{self.name}-send-queue", daemon=True)
+                self._worker.start()
+        # The worker may be sleeping until a later send is due
+        self._wakeup.set()
+        if dropped is not None:
+            dropped.finish({"success": False, "error": "Dropped from a full send queue"})
+        return True
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _next_wait(self) -> float:
+        with self._lock:
+            if not self._items:
+                return self.poll_interval
+            return min(self.poll_interval, max(0.0, self._items[0].not_before - time.time()))
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self._next_wait())
+            self._wakeup.clear()
+            try:
+                self.drain()
+            except Exception:
+                logger.exception("Error draining send queue %s", self.name)
+
+    def _pop_due(self) -> Optional[_QueuedSend]:
+        """The next send that is due, dropping any that waited past ``max_age`` on the way."""
+        while True:
+            with self._lock:
+                now = time.time()
+                if not self._items or self._items[0].not_before > now:
+                    SEND_QUEUE_DEPTH.labels(self.name).set(len(self._items))
+                    return None
+                item = heapq.heappop(self._items)
+                SEND_QUEUE_DEPTH.labels(self.name).set(len(self._items))
+            if now - item.queued_at <= self.max_age:
+                return item
+            logger.error("Dropping message queued for over %ds", int(self.max_age), extra={"queue": self.name})
+            item.finish({"success": False, "error": "Dropped after waiting too long in the send queue"})
+
+    def drain(self) -> int:
+        """Replay queued sends that are due while the circuit allows; returns how many left the queue."""
+        replayed = 0
+        with self._drain_lock:
+            while self.breaker.ready():
+                item = self._pop_due()
+                if item is None:
+                    return replayed
+                # Failures while the provider is down only probe it; they do not use up a send's retries
+                healthy = not self.breaker.is_open
+                result = item.send(*item.args, **item.kwargs)
+                if not result.get("success") and result.get("retryable"):
+                    item.kwargs.update(result.get("retry_with") or {})
+                    if healthy:
+                        item.retries += 1
+                    if item.retries <= self.retry.attempts:
+                        item.not_before = time.time() + max(result.get("retry_after", 0.0), self.retry.delay(item.retries))
+                        with self._lock:
+                            heapq.heappush(self._items, item)
+                            SEND_QUEUE_DEPTH.labels(self.name).set(len(self._items))
+                        continue
+                    logger.error("Dropping message after %d retries: %s", item.retries - 1, result.get("error"),
+                                 extra={"queue": self.name})
+                item.finish(result)
+                replayed += 1
+        return replayed
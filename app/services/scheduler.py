@@ -1,18 +1,31 @@
+import logging
 import os
 from typing import Dict, Optional, Callable
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from apscheduler.events import EVENT_JOB_SUBMITTED
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.date import DateTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
 from app.services.whatsapp_service import WhatsAppService
+from app.services.job_codes import reply_command
 from app.services.database import db_service
+from app.services.storage import StorageBackend
+from app.services.metrics import SCHEDULER_FIRE_LAG_SECONDS
+from app.services.tracing import traced_job
+
+logger = logging.getLogger(__name__)
+
+# Prefixes of the scheduler job ids, used as the job_type metric label
+SCHEDULED_JOB_TYPES = ("inspection_reminder", "inspection_start", "job_followup", "recurring_notification", "daily_report", "dispatch_wave", "assignment_window", "job_taken_digest")
 
 class SchedulerService:
     """Service for scheduling jobs and notifications."""
     
-    def __init__(self):
+    def __init__(self, db: Optional[StorageBackend] = None):
+        self.db = db if db is not None else db_service
         self.scheduler = BackgroundScheduler()
+        self.scheduler.add_listener(self._record_fire_lag, EVENT_JOB_SUBMITTED)
         self.whatsapp_service = WhatsAppService()
         self.start()
     
@@ -20,17 +33,24 @@ class SchedulerService:
         """Start the scheduler."""
         try:
             self.scheduler.start()
-            print("Scheduler started successfully")
+            logger.info("Scheduler started successfully")
         except Exception as e:
-            print(f"Failed to start scheduler: {str(e)}")
+            logger.error("Failed to start scheduler: %s", e)
+    
+    def _record_fire_lag(self, event):
+        """Observe how late each job was handed to the executor."""
+        job_type = next((prefix for prefix in SCHEDULED_JOB_TYPES if event.job_id.startswith(prefix)), "other")
+        now = datetime.now(timezone.utc)
+        for run_time in event.scheduled_run_times:
+            SCHEDULER_FIRE_LAG_SECONDS.labels(job_type).observe(max(0.0, (now - run_time).total_seconds()))
     
     def stop(self):
         """Stop the scheduler."""
         try:
             self.scheduler.shutdown()
-            print("Scheduler stopped")
+            logger.info("Scheduler stopped")
         except Exception as e:
-            print(f"Failed to stop scheduler: {str(e)}")
+            logger.error("Failed to stop scheduler: %s", e)
     
     def schedule_inspection_reminder(self, inspection_data: Dict) -> bool:
         """Schedule an inspection reminder."""
@@ -49,21 +69,21 @@ class SchedulerService:
                 job_id = f"inspection_reminder_{inspection_data.get('job_id', 'unknown')}"
                 
                 self.scheduler.add_job(
-                    func=self._send_inspection_reminder,
+                    func=traced_job(self._send_inspection_reminder),
                     trigger=DateTrigger(run_date=reminder_time),
                     args=[inspection_data],
                     id=job_id,
                     replace_existing=True
                 )
                 
-                print(f"Scheduled inspection reminder for {reminder_time}")
+                logger.info("Scheduled inspection reminder for %s", reminder_time, extra={"job_id": inspection_data.get('job_id')})
                 return True
             else:
-                print("Inspection time has already passed")
+                logger.info("Inspection time has already passed")
                 return False
                 
         except Exception as e:
-            print(f"Failed to schedule inspection reminder: {str(e)}")
+            logger.error("Failed to schedule inspection reminder: %s", e)
             return False
     
     def schedule_job_follow_up(self, job_data: Dict, follow_up_hours: int = 48) -> bool:
@@ -73,18 +93,18 @@ class SchedulerService:
             job_id = f"job_followup_{job_data.get('id', 'unknown')}"
             
             self.scheduler.add_job(
-                func=self._send_job_follow_up,
+                func=traced_job(self._send_job_follow_up),
                 trigger=DateTrigger(run_date=follow_up_time),
                 args=[job_data],
                 id=job_id,
                 replace_existing=True
             )
             
-            print(f"Scheduled job follow-up for {follow_up_time}")
+            logger.info("Scheduled job follow-up for %s", follow_up_time, extra={"job_id": job_data.get('id')})
             return True
             
         except Exception as e:
-            print(f"Failed to schedule job follow-up: {str(e)}")
+            logger.error("Failed to schedule job follow-up: %s", e)
             return False
     
     def schedule_recurring_notifications(self, job_data: Dict, interval_hours: int = 24) -> bool:
@@ -93,18 +113,18 @@ class SchedulerService:
             job_id = f"recurring_notification_{job_data.get('id', 'unknown')}"
             
             self.scheduler.add_job(
-                func=self._send_job_status_update,
+                func=traced_job(self._send_job_status_update),
                 trigger=IntervalTrigger(hours=interval_hours),
                 args=[job_data],
                 id=job_id,
                 replace_existing=True
             )
             
-            print(f"Scheduled recurring notifications every {interval_hours} hours")
+            logger.info("Scheduled recurring notifications every %s hours", interval_hours, extra={"job_id": job_data.get('id')})
             return True
             
         except Exception as e:
-            print(f"Failed to schedule recurring notifications: {str(e)}")
+            logger.error("Failed to schedule recurring notifications: %s", e)
             return False
     
     def schedule_daily_report(self, phone_number: str, time: str = "09:00") -> bool:
@@ -113,18 +133,18 @@ class SchedulerService:
             job_id = f"daily_report_{phone_number}"
             
             self.scheduler.add_job(
-                func=self._send_daily_report,
+                func=traced_job(self._send_daily_report),
                 trigger=CronTrigger(hour=time.split(':')[0], minute=time.split(':')[1]),
                 args=[phone_number],
                 id=job_id,
                 replace_existing=True
             )
             
-            print(f"Scheduled daily report for {time}")
+            logger.info("Scheduled daily report for %s", time)
             return True
             
         except Exception as e:
-            print(f"Failed to schedule daily report: {str(e)}")
+            logger.error("Failed to schedule daily report: %s", e)
             return False
     
     def schedule_inspection_start_prompt(self, inspection_data: Dict) -> bool:
@@ -142,31 +162,89 @@ class SchedulerService:
                 job_id = f"inspection_start_{inspection_data.get('job_id', 'unknown')}"
                 
                 self.scheduler.add_job(
-                    func=self._send_inspection_start_prompt,
+                    func=traced_job(self._send_inspection_start_prompt),
                     trigger=DateTrigger(run_date=inspection_datetime),
                     args=[inspection_data],
                     id=job_id,
                     replace_existing=True
                 )
                 
-                print(f"Scheduled inspection start prompt for {inspection_datetime}")
+                logger.info("Scheduled inspection start prompt for %s", inspection_datetime, extra={"job_id": inspection_data.get('job_id')})
                 return True
             else:
-                print("Inspection time has already passed")
+                logger.info("Inspection time has already passed")
                 return False
                 
         except Exception as e:
-            print(f"Failed to schedule inspection start prompt: {str(e)}")
+            logger.error("Failed to schedule inspection start prompt: %s", e)
+            return False
+    
+    def schedule_dispatch_wave(self, job_id: str, delay_seconds: float) -> bool:
+        """Schedule offering a pending job to its next wave of agents."""
+        try:
+            run_time = datetime.now() + timedelta(seconds=delay_seconds)
+            
+            self.scheduler.add_job(
+                func=traced_job(self._dispatch_next_wave),
+                trigger=DateTrigger(run_date=run_time),
+                args=[job_id],
+                id=f"dispatch_wave_{job_id}",
+                replace_existing=True
+            )
+            
+            logger.info("Scheduled next dispatch wave for %s", run_time, extra={"job_id": job_id})
+            return True
+            
+        except Exception as e:
+            logger.error("Failed to schedule dispatch wave: %s", e, extra={"job_id": job_id})
+            return False
+    
+    def schedule_assignment_window(self, job_id: str, delay_seconds: float) -> bool:
+        """Schedule choosing among the agents who claimed a job during its claim window."""
+        try:
+            run_time = datetime.now() + timedelta(seconds=delay_seconds)
+            
+            self.scheduler.add_job(
+                func=traced_job(self._resolve_assignment_window),
+                trigger=DateTrigger(run_date=run_time),
+                args=[job_id],
+                id=f"assignment_window_{job_id}",
+                replace_existing=True
+            )
+            
+            logger.info("Scheduled claim resolution for %s", run_time, extra={"job_id": job_id})
+            return True
+            
+        except Exception as e:
+            logger.error("Failed to schedule claim resolution: %s", e, extra={"job_id": job_id})
+            return False
+    
+    def schedule_job_taken_digest(self, agent_phone: str, delay_seconds: float) -> bool:
+        """Schedule sending an agent the job-taken notices buffered for them."""
+        try:
+            run_time = datetime.now() + timedelta(seconds=delay_seconds)
+            
+            self.scheduler.add_job(
+                func=traced_job(self._send_job_taken_digest),
+                trigger=DateTrigger(run_date=run_time),
+                args=[agent_phone],
+                id=f"job_taken_digest_{agent_phone}",
+                replace_existing=True
+            )
+            return True
+            
+        except Exception as e:
+            logger.error("Failed to schedule job-taken digest: %s", e, extra={"agent_phone": agent_phone})
             return False
     
     def cancel_job(self, job_id: str) -> bool:
         """Cancel a scheduled job."""
         try:
             self.scheduler.remove_job(job_id)
-            print(f"Cancelled job: {job_id}")
+            logger.info("Cancelled scheduled job: %s", job_id)
             return True
         except Exception as e:
-            print(f"Failed to cancel job {job_id}: {str(e)}")
+            logger.error("Failed to cancel job %s: %s", job_id, e)
             return False
     
     def get_scheduled_jobs(self) -> list:
@@ -174,12 +252,13 @@ class SchedulerService:
         try:
             return self.scheduler.get_jobs()
         except Exception as e:
-            print(f"Failed to get scheduled jobs: {str(e)}")
+            logger.error("Failed to get scheduled jobs: %s", e)
             return []
     
     def _send_inspection_reminder(self, inspection_data: Dict):
         """Send inspection reminder message to both agent and client."""
         try:
+            job_id = inspection_data.get('job_id')
             agent_phone = inspection_data.get('agent_phone')
             client_phone = inspection_data.get('client_details', {}).get('phone')
             property_details = inspection_data.get('property_details', {})
@@ -199,20 +278,20 @@ Date: {inspection_data.get('inspection_date', 'N/A')}
 Time: {inspection_data.get('inspection_time', 'N/A')}
 
 Please prepare to start the inspection.
-Reply START when you begin the inspection.
+Reply {reply_command('START', inspection_data.get('job_code'))} when you begin the inspection.
                 """.strip()
                 
-                result = self.whatsapp_service.send_message(agent_phone, message)
+                result = self.whatsapp_service.send_message(agent_phone, message, job_id=job_id, template="inspection_reminder")
                 if result['success']:
-                    print(f"Inspection reminder sent to agent {agent_phone}")
+                    logger.info("Inspection reminder sent to agent", extra={"job_id": job_id, "agent_phone": agent_phone})
                 else:
-                    print(f"Failed to send inspection reminder to agent: {result['error']}")
+                    logger.error("Failed to send inspection reminder to agent: %s", result['error'], extra={"job_id": job_id, "agent_phone": agent_phone})
             
             # Send reminder to client
             if client_phone:
                 # Get agent details for client notification
                 from app.services.job_service import JobService
-                job_service = JobService()
+                job_service = JobService(self.db)
                 agent_details = job_service.get_agent_details(agent_phone)
                 
                 result = self.whatsapp_service.send_inspection_reminder_to_client(
@@ -220,19 +299,21 @@ Reply START when you begin the inspection.
                     agent_details,
                     property_details,
                     inspection_data.get('inspection_date', 'N/A'),
-                    inspection_data.get('inspection_time', 'N/A')
+                    inspection_data.get('inspection_time', 'N/A'),
+                    job_id=job_id
                 )
                 if result['success']:
-                    print(f"Inspection reminder sent to client {client_phone}")
+                    logger.info("Inspection reminder sent to client %s", client_phone, extra={"job_id": job_id})
                 else:
-                    print(f"Failed to send inspection reminder to client: {result['error']}")
+                    logger.error("Failed to send inspection reminder to client: %s", result['error'], extra={"job_id": job_id})
                     
         except Exception as e:
-            print(f"Error sending inspection reminder: {str(e)}")
+            logger.error("Error sending inspection reminder: %s", e)
     
     def _send_inspection_start_prompt(self, inspection_data: Dict):
         """Send inspection start prompt message to both agent and client."""
         try:
+            job_id = inspection_data.get('job_id')
             agent_phone = inspection_data.get('agent_phone')
             client_phone = inspection_data.get('client_details', {}).get('phone')
             property_details = inspection_data.get('property_details', {})
@@ -251,35 +332,60 @@ Client: {client_details.get('name', 'N/A')}
 Date: {inspection_data.get('inspection_date', 'N/A')}
 Time: {inspection_data.get('inspection_time', 'N/A')}
 
-Reply START to begin the inspection process.
-Reply COMPLETE when you finish the inspection.
+Reply {reply_command('START', inspection_data.get('job_code'))} to begin the inspection process.
+Reply {reply_command('COMPLETE', inspection_data.get('job_code'))} when you finish the inspection.
                 """.strip()
                 
-                result = self.whatsapp_service.send_message(agent_phone, message)
+                result = self.whatsapp_service.send_message(agent_phone, message, job_id=job_id, template="inspection_start_prompt")
                 if result['success']:
-                    print(f"Inspection start prompt sent to agent {agent_phone}")
+                    logger.info("Inspection start prompt sent to agent", extra={"job_id": job_id, "agent_phone": agent_phone})
                 else:
-                    print(f"Failed to send inspection start prompt to agent: {result['error']}")
+                    logger.error("Failed to send inspection start prompt to agent: %s", result['error'], extra={"job_id": job_id, "agent_phone": agent_phone})
             
             # Send start notification to client
             if client_phone:
                 # Get agent details for client notification
                 from app.services.job_service import JobService
-                job_service = JobService()
+                job_service = JobService(self.db)
                 agent_details = job_service.get_agent_details(agent_phone)
                 
                 result = self.whatsapp_service.send_inspection_started_to_client(
                     client_phone,
                     agent_details,
-                    property_details
+                    property_details,
+                    job_id=job_id
                 )
                 if result['success']:
-                    print(f"Inspection start notification sent to client {client_phone}")
+                    logger.info("Inspection start notification sent to client %s", client_phone, extra={"job_id": job_id})
                 else:
-                    print(f"Failed to send inspection start notification to client: {result['error']}")
+                    logger.error("Failed to send inspection start notification to client: %s", result['error'], extra={"job_id": job_id})
                     
         except Exception as e:
-            print(f"Error sending inspection start prompt: {str(e)}")
+            logger.error("Error sending inspection start prompt: %s", e)
+    
+    def _dispatch_next_wave(self, job_id: str):
+        """Offer a job nobody has accepted yet to the next wave of agents."""
+        try:
+            from app.services.job_service import JobService
+            JobService(self.db).dispatch_next_wave(job_id)
+        except Exception as e:
+            logger.error("Error dispatching next wave: %s", e, extra={"job_id": job_id})
+    
+    def _resolve_assignment_window(self, job_id: str):
+        """Assign a job to the best of the agents who claimed it."""
+        try:
+            from app.services.job_service import JobService
+            JobService(self.db).resolve_claims(job_id)
+        except Exception as e:
+            logger.error("Error resolving claims: %s", e, extra={"job_id": job_id})
+    
+    def _send_job_taken_digest(self, agent_phone: str):
+        """Send an agent the job-taken notices buffered for them."""
+        try:
+            from app.services.notification_digest import job_taken_digest
+            job_taken_digest.flush(agent_phone)
+        except Exception as e:
+            logger.error("Error sending job-taken digest: %s", e, extra={"agent_phone": agent_phone})
     
     def _send_job_follow_up(self, job_data: Dict):
         """Send job follow-up message."""
@@ -295,13 +401,13 @@ Status: {job_data.get('status', 'N/A')}
 Please provide an update on the progress of this job.
                 """.strip()
                 
-                result = self.whatsapp_service.send_message(phone_number, message)
+                result = self.whatsapp_service.send_message(phone_number, message, job_id=job_data.get('id'), template="job_follow_up")
                 if result['success']:
-                    print(f"Job follow-up sent to {phone_number}")
+                    logger.info("Job follow-up sent", extra={"job_id": job_data.get('id'), "agent_phone": phone_number})
                 else:
-                    print(f"Failed to send job follow-up: {result['error']}")
+                    logger.error("Failed to send job follow-up: %s", result['error'], extra={"job_id": job_data.get('id'), "agent_phone": phone_number})
         except Exception as e:
-            print(f"Error sending job follow-up: {str(e)}")
+            logger.error("Error sending job follow-up: %s", e)
     
     def _send_job_status_update(self, job_data: Dict):
         """Send job status update message."""
@@ -310,18 +416,18 @@ Please provide an update on the progress of this job.
             if phone_number:
                 result = self.whatsapp_service.send_job_status_update(phone_number, job_data)
                 if result['success']:
-                    print(f"Job status update sent to {phone_number}")
+                    logger.info("Job status update sent", extra={"job_id": job_data.get('id'), "agent_phone": phone_number})
                 else:
-                    print(f"Failed to send job status update: {result['error']}")
+                    logger.error("Failed to send job status update: %s", result['error'], extra={"job_id": job_data.get('id'), "agent_phone": phone_number})
         except Exception as e:
-            print(f"Error sending job status update: {str(e)}")
+            logger.error("Error sending job status update: %s", e)
     
     def _send_daily_report(self, phone_number: str):
         """Send daily report message."""
         try:
             # Get jobs for the day
             today = datetime.now().date()
-            jobs = db_service.find_documents('jobs', {
+            jobs = self.db.find_documents('jobs', {
                 'created_at': {
                     '$gte': today.isoformat(),
                     '$lt': (today + timedelta(days=1)).isoformat()
@@ -348,14 +454,14 @@ No jobs created today.
 Have a great day!
                 """.strip()
             
-            result = self.whatsapp_service.send_message(phone_number, message)
+            result = self.whatsapp_service.send_message(phone_number, message, template="daily_report")
             if result['success']:
-                print(f"Daily report sent to {phone_number}")
+                logger.info("Daily report sent to %s", phone_number)
             else:
-                print(f"Failed to send daily report: {result['error']}")
+                logger.error("Failed to send daily report: %s", result['error'])
                 
         except Exception as e:
-            print(f"Error sending daily report: {str(e)}")
+            logger.error("Error sending daily report: %s", e)
 
 # Global scheduler service instance
 scheduler_service = SchedulerService()
@@ -0,0 +1,118 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from app.services.metrics import TWILIO_SENDER_MESSAGES, TWILIO_SENDER_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+def configured_senders() -> List[str]:
+    """Sender numbers from TWILIO_WHATSAPP_NUMBERS, else the single TWILIO_WHATSAPP_NUMBER."""
+    numbers = os.getenv("TWILIO_WHATSAPP_NUMBERS") or os.getenv("TWILIO_WHATSAPP_NUMBER") or ""
+    senders = []
+    for number in numbers.split(","):
+        number = number.strip().replace("whatsapp:", "")
+        if number and number not in senders:
+            senders.append(number)
+    return senders
+
+class TokenBucket:
+    """Reservation-style token bucket: a send always gets a slot, possibly in the future."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self, now: float) -> float:
+        self._refill(now)
+        return self.tokens
+
+    def reserve(self, now: float) -> float:
+        """Take a token, returning how many seconds to wait before using it."""
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class SenderPool:
+    """Picks the sender number for each outbound message.
+
+    Each recipient sticks to one sender, chosen by rendezvous hashing, so
+    their conversation stays on one number and adding a sender only moves
+    the recipients it wins. Every sender has a token bucket of
+    TWILIO_SENDER_RATE messages per second (bursting to TWILIO_SENDER_BURST);
+    a send is deferred until its sender's next slot. With
+    TWILIO_SENDER_SPILLOVER on, a recipient whose sender is saturated goes
+    to the next sender in their hash order that has a slot free instead,
+    trading stickiness for throughput, which suits template messages such
+    as inspection requests.
+    """
+
+    def __init__(self, senders: List[str], rate: Optional[float] = None, burst: Optional[float] = None,
+                 spillover: Optional[bool] = None):
+        self.senders = list(senders)
+        self.rate = rate if rate is not None else float(os.getenv("TWILIO_SENDER_RATE", "0"))
+        burst = burst if burst is not None else float(os.getenv("TWILIO_SENDER_BURST", "0"))
+        self.spillover = spillover if spillover is not None else os.getenv("TWILIO_SENDER_SPILLOVER", "false").lower() == "true"
+        capacity = burst if burst > 0 else max(1.0, self.rate)
+        self._buckets: Dict[str, TokenBucket] = {sender: TokenBucket(self.rate, capacity) for sender in self.senders}
+        self._sent: Dict[str, int] = {sender: 0 for sender in self.senders}
+        self._lock = threading.Lock()
+
+    def ranked(self, recipient: str) -> List[str]:
+        """Senders in the recipient's rendezvous order, sticky sender first."""
+        recipient = recipient.replace("whatsapp:", "")
+        return sorted(
+            self.senders,
+            key=lambda sender: hashlib.blake2b(f"{sender}|{recipient}".encode(), digest_size=8).digest(),
+            reverse=True,
+        )
+
+    def reserve(self, recipient: str) -> Tuple[Optional[str], float]:
+        """Book the next slot for a message to ``recipient``: its sender and the seconds until the slot opens.
+
+        It never sleeps; a caller whose slot is not open yet defers the send.
+        """
+        if not self.senders:
+            return None, 0.0
+        order = self.ranked(recipient) if len(self.senders) > 1 else self.senders
+        if self.rate <= 0:
+            sender = order[0]
+            with self._lock:
+                self._sent[sender] += 1
+            TWILIO_SENDER_MESSAGES.labels(sender).inc()
+            return sender, 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            sender = order[0]
+            if self.spillover and self._buckets[sender].available(now) < 1:
+                # The most rested sender in the recipient's order
+                sender = max(order, key=lambda candidate: self._buckets[candidate].available(now))
+            wait = self._buckets[sender].reserve(now)
+            self._sent[sender] += 1
+        TWILIO_SENDER_MESSAGES.labels(sender).inc()
+        TWILIO_SENDER_WAIT_SECONDS.labels(sender).observe(wait)
+        return sender, wait
+
+    def stats(self) -> List[Dict]:
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "sender": sender,
+                    "messages": self._sent[sender],
+                    "tokens": round(self._buckets[sender].available(now), 3) if self.rate > 0 else None,
+                }
+                for sender in self.senders
+            ]
+
+# Global sender pool shared by every WhatsAppService instance
+sender_pool = SenderPool(configured_senders())
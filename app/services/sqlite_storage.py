@@ -0,0 +1,296 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from bson import ObjectId
+from app.services.storage import InsertDefaults, SortSpec, StorageBackend, index_fields, match_document, serialize_document, timed_operation
+
+logger = logging.getLogger(__name__)
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+_SQL_OPERATORS = {'$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<='}
+
+def _encode(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _sql_value(value: Any):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+class SqliteStorage(StorageBackend):
+    """SQLite storage engine keeping each document as JSON with expression indexes."""
+
+    name = "sqlite"
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("SQLITE_PATH", "whatsapp_agent_system.db")
+        self._lock = threading.RLock()
+        self._tables = set()
+        # Fields with an expression index per collection; only these are pushed down to SQL
+        self._indexed: Dict[str, set] = {}
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        logger.info("Using SQLite storage at %s", self.path)
+
+    def is_connected(self) -> bool:
+        return self.conn is not None
+
+    @property
+    def database_name(self) -> str:
+        return self.path
+
+    @timed_operation("insert")
+    def insert_document(self, collection_name: str, document: Dict) -> Optional[str]:
+        """Insert a document into a collection."""
+        try:
+            with self._lock:
+                table = self._table(collection_name)
+                if 'created_at' not in document:
+                    document['created_at'] = datetime.now(timezone.utc)
+                if 'updated_at' not in document:
+                    document['updated_at'] = datetime.now(timezone.utc)
+                doc_id = str(document.get('_id') or ObjectId())
+                stored = {k: v for k, v in document.items() if k != '_id'}
+                self.conn.execute(
+                    f'INSERT INTO "{table}" (id, doc) VALUES (?, ?)',
+                    (doc_id, json.dumps(stored, default=_encode))
+                )
+                document['_id'] = doc_id
+                return doc_id
+        except Exception as e:
+            logger.error("Error inserting document: %s", e)
+        return None
+
+    @timed_operation("find")
+    def find_documents(self, collection_name: str, query: Dict = None, limit: int = 0, sort: Optional[SortSpec] = None) -> List[Dict]:
+        """Find documents in a collection."""
+        try:
+            with self._lock:
+                documents = []
+                for doc_id, document in self._select(collection_name, query, sort):
+                    if match_document(document, query):
+                        document['_id'] = doc_id
+                        documents.append(serialize_document(document))
+                        if limit > 0 and len(documents) >= limit:
+                            break
+                return documents
+        except Exception as e:
+            logger.error("Error finding documents: %s", e)
+        return []
+
+    @timed_operation("find_by_id")
+    def find_document_by_id(self, collection_name: str, document_id: str) -> Optional[Dict]:
+        """Find a document by its job_id or _id."""
+        try:
+            with self._lock:
+                row = self._resolve(collection_name, document_id)
+                if row is None:
+                    return None
+                doc_id, document = row
+                document['_id'] = doc_id
+                return serialize_document(document)
+        except Exception as e:
+            logger.error("Error finding document by ID: %s", e)
+        return None
+
+    @timed_operation("update")
+    def update_document(self, collection_name: str, document_id: str, update_data: Dict) -> bool:
+        """Update a document by its job_id or _id."""
+        try:
+            with self._lock:
+                row = self._resolve(collection_name, document_id)
+                if row is None:
+                    return False
+                doc_id, document = row
+                update_data['updated_at'] = datetime.now(timezone.utc)
+                document.update({k: v for k, v in update_data.items() if k != '_id'})
+                self.conn.execute(
+                    f'UPDATE "{self._table(collection_name)}" SET doc = ? WHERE id = ?',
+                    (json.dumps(document, default=_encode), doc_id)
+                )
+                return True
+        except Exception as e:
+            logger.error("Error updating document: %s", e)
+        return False
+
+    @timed_operation("find_and_update")
+    def find_and_update(self, collection_name: str, document_id: str, condition: Dict, update_data: Dict) -> Optional[Dict]:
+        """Update a document by its job_id or _id if it matches ``condition``, returning it."""
+        try:
+            with self._lock:
+                row = self._resolve(collection_name, document_id)
+                if row is None:
+                    return None
+                doc_id, document = row
+                if not match_document(document, condition):
+                    return None
+                previous = json.dumps(document, default=_encode)
+                update_data['updated_at'] = datetime.now(timezone.utc)
+                document.update({k: v for k, v in update_data.items() if k != '_id'})
+                # Compare-and-swap on the row we checked, so another process sharing the file cannot interleave
+                cursor = self.conn.execute(
+                    f'UPDATE "{self._table(collection_name)}" SET doc = ? WHERE id = ? AND doc = ?',
+                    (json.dumps(document, default=_encode), doc_id, previous)
+                )
+                if cursor.rowcount == 0:
+                    return None
+                document['_id'] = doc_id
+                return serialize_document(document)
+        except Exception as e:
+            logger.error("Error updating document: %s", e)
+        return None
+
+    @timed_operation("delete")
+    def delete_document(self, collection_name: str, document_id: str) -> bool:
+        """Delete a document by its _id."""
+        try:
+            with self._lock:
+                cursor = self.conn.execute(
+                    f'DELETE FROM "{self._table(collection_name)}" WHERE id = ?',
+                    (str(document_id),)
+                )
+                return cursor.rowcount > 0
+        except Exception as e:
+            logger.error("Error deleting document: %s", e)
+        return False
+
+    @timed_operation("bulk_upsert")
+    def bulk_upsert(self, collection_name: str, key_field: str, documents: List[Dict],
+                    insert_defaults: Optional[InsertDefaults] = None) -> Dict:
+        """Upsert documents keyed on a field inside a single transaction."""
+        result = {"inserted": 0, "updated": 0, "errors": []}
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            table = self._table(collection_name)
+            self.conn.execute("BEGIN")
+            try:
+                for document in documents:
+                    try:
+                        fields = {k: v for k, v in document.items() if k not in ('_id', 'created_at')}
+                        fields['updated_at'] = now
+                        rows = list(self._select(collection_name, {key_field: document[key_field]}))
+                        existing = next((row for row in rows if match_document(row[1], {key_field: document[key_field]})), None)
+                        if existing:
+                            doc_id, current = existing
+                            current.update(fields)
+                            self.conn.execute(
+                                f'UPDATE "{table}" SET doc = ? WHERE id = ?',
+                                (json.dumps(current, default=_encode), doc_id)
+                            )
+                            result["updated"] += 1
+                        else:
+                            fields = {**(insert_defaults(document) if insert_defaults else {}), **fields}
+                            fields['created_at'] = document.get('created_at', now)
+                            self.conn.execute(
+                                f'INSERT INTO "{table}" (id, doc) VALUES (?, ?)',
+                                (str(ObjectId()), json.dumps(fields, default=_encode))
+                            )
+                            result["inserted"] += 1
+                    except sqlite3.IntegrityError as e:
+                        result["errors"].append({key_field: document.get(key_field), "error": str(e)})
+                self.conn.execute("COMMIT")
+            except Exception as e:
+                self.conn.execute("ROLLBACK")
+                logger.error("Error in bulk upsert: %s", e)
+                result = {"inserted": 0, "updated": 0, "errors": [{key_field: None, "error": str(e)}]}
+        return result
+
+    def create_index(self, collection_name: str, field, unique: bool = False):
+        """Create an expression index over the JSON fields of an index spec."""
+        try:
+            with self._lock:
+                table = self._table(collection_name)
+                fields = index_fields(field)
+                if not fields:
+                    return
+                for name in fields:
+                    if not _IDENTIFIER.match(name):
+                        raise ValueError(f"Invalid index field: {name}")
+                columns = ", ".join(f"json_extract(doc, '$.{name}')" for name in fields)
+                index_name = f"ix_{table}_{'_'.join(fields)}"
+                self.conn.execute(
+                    f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS "{index_name}" ON "{table}" ({columns})'
+                )
+                self._indexed.setdefault(table, set()).update(fields)
+        except Exception as e:
+            logger.error("Error creating index: %s", e)
+
+    def close(self):
+        """Close the database connection."""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def _table(self, collection_name: str) -> str:
+        if not _IDENTIFIER.match(collection_name):
+            raise ValueError(f"Invalid collection name: {collection_name}")
+        if collection_name not in self._tables:
+            self.conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{collection_name}" (id TEXT PRIMARY KEY, doc TEXT NOT NULL)'
+            )
+            self._tables.add(collection_name)
+        return collection_name
+
+    def _where(self, table: str, query: Optional[Dict]) -> Tuple[str, list]:
+        """Translate conditions on indexed scalar fields into SQL; the rest is filtered in Python."""
+        clauses, params = [], []
+        indexed = self._indexed.get(table, set())
+        for field, condition in (query or {}).items():
+            if field not in indexed:
+                continue
+            column = f"json_extract(doc, '$.{field}')"
+            if isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition):
+                for operator, operand in condition.items():
+                    if operator == '$eq' and operand is not None:
+                        clauses.append(f"{column} = ?")
+                        params.append(_sql_value(operand))
+                    elif operator == '$in' and operand and None not in operand:
+                        clauses.append(f"{column} IN ({', '.join('?' for _ in operand)})")
+                        params.extend(_sql_value(item) for item in operand)
+                    elif operator in _SQL_OPERATORS and operand is not None:
+                        clauses.append(f"{column} {_SQL_OPERATORS[operator]} ?")
+                        params.append(_sql_value(operand))
+            elif condition is None:
+                clauses.append(f"{column} IS NULL")
+            elif isinstance(condition, (str, int, float)):
+                clauses.append(f"{column} = ?")
+                params.append(condition)
+        if not clauses:
+            return "", []
+        return " WHERE " + " AND ".join(clauses), params
+
+    def _select(self, collection_name: str, query: Optional[Dict], sort: Optional[SortSpec] = None) -> Iterator[Tuple[str, Dict]]:
+        """Rows passing the SQL-side conditions, decoded lazily so a caller's limit stops the scan."""
+        table = self._table(collection_name)
+        where, params = self._where(table, query)
+        order = []
+        for field, direction in sort or []:
+            if not _IDENTIFIER.match(field):
+                raise ValueError(f"Invalid sort field: {field}")
+            order.append(f"json_extract(doc, '$.{field}') {'DESC' if direction == -1 else 'ASC'}")
+        order.append("rowid")
+        for row in self.conn.execute(f'SELECT id, doc FROM "{table}"{where} ORDER BY {", ".join(order)}', params):
+            yield row[0], json.loads(row[1])
+
+    def _resolve(self, collection_name: str, document_id: str) -> Optional[Tuple[str, Dict]]:
+        # Look up by job_id first (UUID-style IDs), then by _id
+        table = self._table(collection_name)
+        row = self.conn.execute(
+            f"""SELECT id, doc FROM "{table}" WHERE json_extract(doc, '$.job_id') = ? LIMIT 1""",
+            (document_id,)
+        ).fetchone()
+        if row is None:
+            row = self.conn.execute(f'SELECT id, doc FROM "{table}" WHERE id = ?', (str(document_id),)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
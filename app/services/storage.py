@@ -0,0 +1,245 @@
+import functools
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from app.services.metrics import DB_OPERATION_SECONDS
+from app.services.tracing import span
+
+# find_documents ordering: (field, 1 ascending or -1 descending) pairs, most significant first
+SortSpec = List[Tuple[str, int]]
+
+# bulk_upsert defaults: the fields to add to a document only when it is inserted
+InsertDefaults = Callable[[Dict], Dict]
+
+# Indexes every backend maintains, as (collection, field or compound key, unique)
+DEFAULT_INDEXES: List[Tuple[str, Union[str, List[Tuple[str, Union[int, str]]]], bool]] = [
+    ("jobs", "job_id", True),
+    ("jobs", "status", False),
+    ("jobs", "assigned_agent", False),
+    # An agent's jobs in a status, soonest inspection first (the webhook's current-job lookup)
+    ("jobs", [("assigned_agent", 1), ("status", 1), ("inspection_date", 1), ("inspection_time", 1)], False),
+    ("jobs", "client_id", False),
+    ("jobs", "property_id", False),
+    # The workload index's recent-assignment range query
+    ("jobs", "assigned_at", False),
+    ("agents", "phone", False),
+    ("agents", "status", False),
+    ("agents", [("location", "2dsphere")], False),
+    ("confirmations", "job_id", False),
+    ("confirmations", "agent_phone", False),
+    ("messages", "message_sid", True),
+    ("messages", "job_id", False),
+    ("messages", "sent_at", False),
+    ("bookings", "booking_id", True),
+    ("bookings", "agent_phone", False),
+    ("bookings", "job_id", False),
+    ("bookings", "end", False),
+    ("offers", "offer_id", True),
+    ("offers", "job_id", False),
+    ("offers", "agent_phone", False),
+    ("job_codes", "code", True),
+    ("job_codes", "job_id", False),
+]
+
+class StorageBackend(ABC):
+    """Interface shared by the MongoDB, in-memory and SQLite storage engines.
+
+    Documents are plain dicts. Reads return copies with datetimes converted
+    to ISO strings and ``_id`` as a string, matching what the MongoDB
+    implementation has always returned to the services and routes.
+    """
+
+    name: str = "storage"
+
+    @abstractmethod
+    def is_connected(self) -> bool:
+        """Whether the backend is ready to serve queries."""
+
+    @property
+    def database_name(self) -> str:
+        """Human-readable name of the underlying database."""
+        return self.name
+
+    @abstractmethod
+    def insert_document(self, collection_name: str, document: Dict) -> Optional[str]:
+        """Insert a document into a collection."""
+
+    @abstractmethod
+    def find_documents(self, collection_name: str, query: Dict = None, limit: int = 0, sort: Optional[SortSpec] = None) -> List[Dict]:
+        """Find documents in a collection, ordered by ``sort`` ((field, 1 or -1) pairs) when given."""
+
+    @abstractmethod
+    def find_document_by_id(self, collection_name: str, document_id: str) -> Optional[Dict]:
+        """Find a document by its job_id or _id."""
+
+    @abstractmethod
+    def update_document(self, collection_name: str, document_id: str, update_data: Dict) -> bool:
+        """Update a document by its job_id or _id."""
+
+    @abstractmethod
+    def find_and_update(self, collection_name: str, document_id: str, condition: Dict, update_data: Dict) -> Optional[Dict]:
+        """Atomically update a document by its job_id or _id if it also matches ``condition``.
+
+        Returns the updated document, or None when no document matched.
+        """
+
+    @abstractmethod
+    def delete_document(self, collection_name: str, document_id: str) -> bool:
+        """Delete a document by its _id."""
+
+    @abstractmethod
+    def bulk_upsert(self, collection_name: str, key_field: str, documents: List[Dict],
+                    insert_defaults: Optional[InsertDefaults] = None) -> Dict:
+        """Upsert documents keyed on a field, returning inserted/updated/errors.
+
+        Only the fields in each document are written to an existing one;
+        ``insert_defaults(document)`` gives fields that are added only when
+        the document is new, where the document itself does not set them.
+        """
+
+    @abstractmethod
+    def create_index(self, collection_name: str, field, unique: bool = False):
+        """Create an index on a collection field."""
+
+    def ensure_indexes(self):
+        """Create the indexes the services rely on."""
+        for collection_name, field, unique in DEFAULT_INDEXES:
+            self.create_index(collection_name, field, unique=unique)
+
+    def close(self):
+        """Release any resources held by the backend."""
+
+def timed_operation(operation: str):
+    """Record a backend method's latency per collection and operation, and trace it as a span."""
+    span_name = f"db.{operation}"
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, collection_name: str, *args, **kwargs):
+            started = time.perf_counter()
+            with span(span_name, backend=self.name, collection=collection_name):
+                try:
+                    return method(self, collection_name, *args, **kwargs)
+                finally:
+                    DB_OPERATION_SECONDS.labels(self.name, collection_name, operation).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+def serialize_document(document: Dict) -> Dict:
+    """Copy a stored document into the JSON-friendly shape the services expect."""
+    serialized = {}
+    for key, value in document.items():
+        if hasattr(value, 'isoformat'):
+            serialized[key] = value.isoformat()
+        elif key == '_id':
+            serialized[key] = str(value)
+        else:
+            serialized[key] = value
+    return serialized
+
+def get_field(document: Dict, path: str) -> Tuple[bool, Any]:
+    """Resolve a dotted field path, returning (found, value)."""
+    value: Any = document
+    for part in path.split('.'):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return False, None
+    return True, value
+
+def _comparable(left: Any, right: Any) -> Tuple[Any, Any]:
+    # Timestamps may be stored as datetimes or ISO strings depending on the writer
+    if isinstance(left, datetime) and isinstance(right, str):
+        return left.isoformat(), right
+    if isinstance(left, str) and isinstance(right, datetime):
+        return left, right.isoformat()
+    return left, right
+
+def _equals(value: Any, expected: Any) -> bool:
+    if isinstance(value, list) and not isinstance(expected, list):
+        return any(_equals(item, expected) for item in value)
+    value, expected = _comparable(value, expected)
+    return value == expected
+
+def _compare(value: Any, operator: str, operand: Any) -> bool:
+    if value is None:
+        return False
+    candidates = value if isinstance(value, list) else [value]
+    for candidate in candidates:
+        left, right = _comparable(candidate, operand)
+        try:
+            if operator == '$gt' and left > right:
+                return True
+            if operator == '$gte' and left >= right:
+                return True
+            if operator == '$lt' and left < right:
+                return True
+            if operator == '$lte' and left <= right:
+                return True
+        except TypeError:
+            continue
+    return False
+
+def _matches_condition(document: Dict, field: str, condition: Any) -> bool:
+    found, value = get_field(document, field)
+    if isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition):
+        for operator, operand in condition.items():
+            if operator == '$eq':
+                if not _equals(value, operand):
+                    return False
+            elif operator == '$ne':
+                if found and _equals(value, operand):
+                    return False
+            elif operator == '$in':
+                if not any(_equals(value, item) for item in operand):
+                    return False
+            elif operator == '$nin':
+                if any(_equals(value, item) for item in operand):
+                    return False
+            elif operator == '$exists':
+                if bool(operand) != found:
+                    return False
+            elif operator in ('$gt', '$gte', '$lt', '$lte'):
+                if not _compare(value, operator, operand):
+                    return False
+            else:
+                raise ValueError(f"Unsupported query operator: {operator}")
+        return True
+    if condition is None:
+        return value is None
+    return found and _equals(value, condition)
+
+def match_document(document: Dict, query: Optional[Dict]) -> bool:
+    """Evaluate the subset of MongoDB query syntax the services use."""
+    if not query:
+        return True
+    for field, condition in query.items():
+        if field == '$and':
+            if not all(match_document(document, sub) for sub in condition):
+                return False
+        elif field == '$or':
+            if not any(match_document(document, sub) for sub in condition):
+                return False
+        elif not _matches_condition(document, field, condition):
+            return False
+    return True
+
+def sort_documents(documents: List[Dict], sort: Optional[SortSpec]) -> List[Dict]:
+    """Order documents by (field, direction) pairs in place; missing values sort first, as in MongoDB."""
+    for field, direction in reversed(sort or []):
+        def key(document, field=field):
+            found, value = get_field(document, field)
+            return (found and value is not None, value if found and value is not None else 0)
+        documents.sort(key=key, reverse=direction == -1)
+    return documents
+
+def index_fields(field) -> List[str]:
+    """Field names covered by an index spec (a name or a list of (name, direction)).
+
+    Special index types such as ``2dsphere`` are MongoDB-only and are skipped;
+    the other engines answer geo queries from the agent index instead.
+    """
+    if isinstance(field, str):
+        return [field]
+    return [name for name, direction in field if isinstance(direction, int)]
@@ -0,0 +1,185 @@
+import contextvars
+import functools
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+# Spans kept per trace; a broadcast to hundreds of agents should not grow a trace unbounded
+MAX_SPANS_PER_TRACE = 2000
+
+class Span:
+    """A timed operation inside a trace."""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "start_time", "_started", "duration", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self) -> Dict:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": datetime.fromtimestamp(self.start_time, timezone.utc).isoformat(),
+            "offset_ms": round((self.start_time - self.trace.root.start_time) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+class Trace:
+    """All spans recorded for one request or scheduler callback."""
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, attributes: Optional[Dict] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+        self.root = self.add_span(name, None, attributes or {})
+
+    def add_span(self, name: str, parent_id: Optional[str], attributes: Dict) -> Span:
+        span = Span(self, name, parent_id, attributes)
+        if len(self.spans) < MAX_SPANS_PER_TRACE:
+            self.spans.append(span)
+        else:
+            self.dropped_spans += 1
+        return span
+
+    @property
+    def duration(self) -> float:
+        return self.root.duration or 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "duration_ms": round(self.duration * 1000, 3),
+            "dropped_spans": self.dropped_spans,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+class TraceCollector:
+    """Exports finished traces and keeps the slowest ones for the debug view."""
+
+    def __init__(self, exporter: Optional[str] = None, path: Optional[str] = None, keep: Optional[int] = None):
+        self.exporter = (exporter or os.getenv("TRACE_EXPORTER", "none")).lower()
+        self.path = path or os.getenv("TRACE_FILE", "traces.jsonl")
+        self.keep = keep if keep is not None else int(os.getenv("TRACE_SLOWEST_LIMIT", "50"))
+        self._slowest: List = []
+        self._counter = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def record(self, trace: Trace):
+        with self._lock:
+            self._counter += 1
+            entry = (trace.duration, self._counter, trace)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, entry)
+            elif self.keep and trace.duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+            if self.exporter == "none":
+                return
+            line = json.dumps(trace.to_dict(), default=str)
+            if self.exporter == "stdout":
+                sys.stdout.write(line + "\n")
+            elif self.exporter == "file":
+                if self._file is None:
+                    self._file = open(self.path, "a", buffering=1)
+                self._file.write(line + "\n")
+
+    def slowest(self, limit: int = 20) -> List[Dict]:
+        with self._lock:
+            entries = sorted(self._slowest, key=lambda entry: entry[0], reverse=True)[:limit]
+        return [trace.to_dict() for _, _, trace in entries]
+
+    def clear(self):
+        with self._lock:
+            self._slowest = []
+
+collector = TraceCollector()
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+def current_trace_id() -> Optional[str]:
+    current = _current_span.get()
+    return current.trace.trace_id if current else None
+
+@contextmanager
+def start_trace(name: str, trace_id: Optional[str] = None, **attributes):
+    """Open a new trace whose root span covers the block."""
+    trace = Trace(name, trace_id, attributes)
+    token = _current_span.set(trace.root)
+    try:
+        yield trace.root
+    except BaseException as e:
+        trace.root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        trace.root.finish()
+        _current_span.reset(token)
+        collector.record(trace)
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the block as a child of the current span; a no-op outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.trace.add_span(name, parent.span_id, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.finish()
+        _current_span.reset(token)
+
+def traced(name: Optional[str] = None):
+    """Decorator wrapping a function call in a span."""
+    def decorator(func: Callable):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def traced_job(func: Callable, name: Optional[str] = None) -> Callable:
+    """Wrap a scheduler callback so each run is its own trace linked to the scheduling one."""
+    origin_trace_id = current_trace_id()
+    trace_name = f"scheduler.{name or func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        attributes = {"origin_trace_id": origin_trace_id} if origin_trace_id else {}
+        with start_trace(trace_name, **attributes):
+            return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,306 @@
+import contextvars
+import copy
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from app.services.metrics import UNIT_OF_WORK_WRITES, record_cache_access
+from app.services.storage import InsertDefaults, SortSpec, StorageBackend, match_document, serialize_document
+
+logger = logging.getLogger(__name__)
+
+QueryKey = Tuple[str, int, str]
+
+class FlushError(Exception):
+    """Held updates that could not be written; the request must not report them as stored."""
+
+    def __init__(self, failed: List[Tuple[str, str]]):
+        super().__init__(f"Failed to write {len(failed)} held update(s)")
+        self.failed = failed
+
+def _query_key(query: Optional[Dict], limit: int, sort: Optional[SortSpec]) -> QueryKey:
+    return json.dumps(query or {}, sort_keys=True, default=str), limit, json.dumps(sort or [])
+
+class UnitOfWork:
+    """Documents read and written while serving one request.
+
+    The identity map holds every document the request has seen, under its
+    ``_id`` and its ``job_id``, plus the ids each query returned, so a
+    document is fetched at most once and a repeated query is answered
+    without a round trip. ``update_document`` on a document already in the
+    map is applied to it and held back; held updates to one document are
+    merged into a single write, and are flushed before the collection is
+    queried, before a conditional update or delete touches it, before
+    events are published and when the request ends. Anything else the
+    unit of work cannot keep exact (bulk upserts, updates to unseen
+    documents, refused conditional updates) drops what it knew.
+    """
+
+    def __init__(self, max_documents: Optional[int] = None):
+        self.max_documents = max_documents if max_documents is not None else int(os.getenv("UNIT_OF_WORK_MAX_DOCUMENTS", "500"))
+        self.round_trips = 0
+        self._documents: Dict[str, Dict[str, Dict]] = {}
+        self._queries: Dict[str, Dict[QueryKey, Tuple[Dict, List[str]]]] = {}
+        self._pending: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.RLock()
+
+    def get(self, collection_name: str, document_id: str) -> Optional[Dict]:
+        document = self._documents.get(collection_name, {}).get(str(document_id))
+        record_cache_access("identity_map", document is not None)
+        return copy.deepcopy(document) if document is not None else None
+
+    def get_query(self, collection_name: str, query: Optional[Dict], limit: int, sort: Optional[SortSpec]) -> Optional[List[Dict]]:
+        cached = self._queries.get(collection_name, {}).get(_query_key(query, limit, sort))
+        record_cache_access("identity_map", cached is not None)
+        if cached is None:
+            return None
+        ids = cached[1]
+        documents = self._documents[collection_name]
+        return [copy.deepcopy(documents[doc_id]) for doc_id in ids]
+
+    def register(self, collection_name: str, document: Dict) -> str:
+        """Take a fetched document into the map, replacing any earlier copy; returns its ``_id``."""
+        stored = serialize_document(document)
+        doc_id = str(stored['_id'])
+        stored['_id'] = doc_id
+        documents = self._documents.setdefault(collection_name, {})
+        previous = documents.get(doc_id)
+        if previous is not None:
+            # Keep one dict per document so every key and query sees the same copy
+            previous.clear()
+            previous.update(stored)
+            stored = previous
+        documents[doc_id] = stored
+        if stored.get('job_id'):
+            documents[str(stored['job_id'])] = stored
+        self._requery(collection_name, doc_id, stored)
+        return doc_id
+
+    def register_query(self, collection_name: str, query: Optional[Dict], limit: int, sort: Optional[SortSpec], documents: List[Dict]):
+        if len(documents) > self.max_documents:
+            return
+        ids = [self.register(collection_name, document) for document in documents]
+        self._queries.setdefault(collection_name, {})[_query_key(query, limit, sort)] = (copy.deepcopy(query or {}), ids)
+
+    def defer_update(self, collection_name: str, document_id: str, update_data: Dict) -> bool:
+        """Apply an update to a mapped document and hold it for the flush; False if the document is not mapped."""
+        document = self._documents.get(collection_name, {}).get(str(document_id))
+        if document is None:
+            return False
+        update_data['updated_at'] = datetime.now(timezone.utc)
+        # The engine gets the values as given, datetimes included; only the mapped copy is serialized
+        fields = copy.deepcopy({k: v for k, v in update_data.items() if k != '_id'})
+        document.update(serialize_document(fields))
+        pending = self._pending.setdefault(collection_name, {})
+        if document['_id'] in pending:
+            UNIT_OF_WORK_WRITES.labels(collection_name, "coalesced").inc()
+        pending.setdefault(document['_id'], {}).update(fields)
+        self._requery(collection_name, document['_id'], document)
+        return True
+
+    def take_pending(self, collection_name: Optional[str] = None) -> List[Tuple[str, str, Dict]]:
+        names = [collection_name] if collection_name is not None else list(self._pending)
+        writes = []
+        for name in names:
+            for doc_id, fields in self._pending.pop(name, {}).items():
+                writes.append((name, doc_id, fields))
+        return writes
+
+    def evict(self, collection_name: str, document_id: str):
+        documents = self._documents.get(collection_name, {})
+        document = documents.pop(str(document_id), None)
+        if document is None:
+            return
+        for key in (document.get('_id'), document.get('job_id')):
+            if key is not None:
+                documents.pop(str(key), None)
+        self._pending.get(collection_name, {}).pop(document.get('_id'), None)
+        for _, ids in self._queries.get(collection_name, {}).values():
+            if document.get('_id') in ids:
+                ids.remove(document['_id'])
+
+    def forget_queries(self, collection_name: str):
+        self._queries.pop(collection_name, None)
+
+    def forget(self, collection_name: str):
+        self._documents.pop(collection_name, None)
+        self._queries.pop(collection_name, None)
+
+    def _requery(self, collection_name: str, doc_id: str, document: Dict):
+        """Keep the cached queries of a collection in step with a document that changed."""
+        queries = self._queries.get(collection_name)
+        if not queries:
+            return
+        for key in list(queries):
+            query, ids = queries[key]
+            matches = match_document(document, query)
+            if matches == (doc_id in ids):
+                continue
+            if key[1] > 0 or key[2] != "[]":
+                # A limited or ordered result may no longer be the right page or order
+                del queries[key]
+            elif matches:
+                ids.append(doc_id)
+            else:
+                ids.remove(doc_id)
+
+_current_unit_of_work: contextvars.ContextVar[Optional[UnitOfWork]] = contextvars.ContextVar("current_unit_of_work", default=None)
+
+def current_unit_of_work() -> Optional[UnitOfWork]:
+    return _current_unit_of_work.get()
+
+class IdentityMapStorage(StorageBackend):
+    """Wraps a storage engine so calls made inside ``unit_of_work()`` share its identity map.
+
+    Outside a unit of work every call goes straight to the engine.
+    """
+
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+        self.name = backend.name
+
+    @property
+    def database_name(self) -> str:
+        return self.backend.database_name
+
+    def is_connected(self) -> bool:
+        return self.backend.is_connected()
+
+    def _call(self, uow: Optional[UnitOfWork], method: str, *args):
+        if uow is not None:
+            uow.round_trips += 1
+        return getattr(self.backend, method)(*args)
+
+    def flush(self, uow: UnitOfWork, collection_name: Optional[str] = None) -> int:
+        """Write the updates held by a unit of work, one per document; returns how many were written.
+
+        Raises FlushError, after attempting every write, if any of them failed.
+        """
+        with uow._lock:
+            writes = uow.take_pending(collection_name)
+            failed = []
+            for name, doc_id, fields in writes:
+                UNIT_OF_WORK_WRITES.labels(name, "flushed").inc()
+                if not self._call(uow, 'update_document', name, doc_id, fields):
+                    logger.error("Failed to flush a held update", extra={"collection": name, "document_id": doc_id})
+                    uow.evict(name, doc_id)
+                    failed.append((name, doc_id))
+            if failed:
+                raise FlushError(failed)
+            return len(writes)
+
+    def insert_document(self, collection_name: str, document: Dict) -> Optional[str]:
+        uow = current_unit_of_work()
+        doc_id = self._call(uow, 'insert_document', collection_name, document)
+        if uow is not None and doc_id:
+            with uow._lock:
+                # The engines fill in _id and the timestamps on the caller's dict
+                uow.register(collection_name, {**document, '_id': doc_id})
+        return doc_id
+
+    def find_documents(self, collection_name: str, query: Dict = None, limit: int = 0, sort: Optional[SortSpec] = None) -> List[Dict]:
+        uow = current_unit_of_work()
+        if uow is None:
+            return self.backend.find_documents(collection_name, query, limit, sort)
+        with uow._lock:
+            documents = uow.get_query(collection_name, query, limit, sort)
+            if documents is not None:
+                return documents
+            self.flush(uow, collection_name)
+            documents = self._call(uow, 'find_documents', collection_name, query, limit, sort)
+            uow.register_query(collection_name, query, limit, sort, documents)
+            return documents
+
+    def find_document_by_id(self, collection_name: str, document_id: str) -> Optional[Dict]:
+        uow = current_unit_of_work()
+        if uow is None:
+            return self.backend.find_document_by_id(collection_name, document_id)
+        with uow._lock:
+            document = uow.get(collection_name, document_id)
+            if document is not None:
+                return document
+            document = self._call(uow, 'find_document_by_id', collection_name, document_id)
+            if document:
+                uow.register(collection_name, document)
+            return document
+
+    def update_document(self, collection_name: str, document_id: str, update_data: Dict) -> bool:
+        uow = current_unit_of_work()
+        if uow is None:
+            return self.backend.update_document(collection_name, document_id, update_data)
+        with uow._lock:
+            if uow.defer_update(collection_name, document_id, update_data):
+                return True
+            success = self._call(uow, 'update_document', collection_name, document_id, update_data)
+            # An unseen document may have moved into or out of cached results
+            uow.forget_queries(collection_name)
+            return success
+
+    def find_and_update(self, collection_name: str, document_id: str, condition: Dict, update_data: Dict) -> Optional[Dict]:
+        uow = current_unit_of_work()
+        if uow is None:
+            return self.backend.find_and_update(collection_name, document_id, condition, update_data)
+        with uow._lock:
+            self.flush(uow, collection_name)
+            document = self._call(uow, 'find_and_update', collection_name, document_id, condition, update_data)
+            if document:
+                uow.register(collection_name, document)
+            else:
+                # What the request saw is out of date, or the document is gone
+                uow.evict(collection_name, document_id)
+                uow.forget_queries(collection_name)
+            return document
+
+    def delete_document(self, collection_name: str, document_id: str) -> bool:
+        uow = current_unit_of_work()
+        if uow is None:
+            return self.backend.delete_document(collection_name, document_id)
+        with uow._lock:
+            uow.evict(collection_name, document_id)
+            return self._call(uow, 'delete_document', collection_name, document_id)
+
+    def bulk_upsert(self, collection_name: str, key_field: str, documents: List[Dict],
+                    insert_defaults: Optional[InsertDefaults] = None) -> Dict:
+        uow = current_unit_of_work()
+        if uow is None:
+            return self.backend.bulk_upsert(collection_name, key_field, documents, insert_defaults)
+        with uow._lock:
+            self.flush(uow, collection_name)
+            result = self._call(uow, 'bulk_upsert', collection_name, key_field, documents, insert_defaults)
+            uow.forget(collection_name)
+            return result
+
+    def create_index(self, collection_name: str, field, unique: bool = False):
+        self.backend.create_index(collection_name, field, unique=unique)
+
+    def ensure_indexes(self):
+        self.backend.ensure_indexes()
+
+    def close(self):
+        self.backend.close()
+
+def flush_unit_of_work():
+    """Write the current unit of work's held updates now, e.g. before other threads read them.
+
+    Raises FlushError if any of them could not be written.
+    """
+    from app.services.database import db_service
+    uow = current_unit_of_work()
+    if uow is not None and isinstance(db_service, IdentityMapStorage):
+        db_service.flush(uow)
+
+@contextmanager
+def unit_of_work():
+    """Give the calls made in this context one identity map, flushing its held writes on exit."""
+    uow = UnitOfWork()
+    token = _current_unit_of_work.set(uow)
+    try:
+        yield uow
+    finally:
+        try:
+            flush_unit_of_work()
+        finally:
+            _current_unit_of_work.reset(token)
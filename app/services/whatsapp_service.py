@@ -1,9 +1,61 @@
+import functools
+import logging
 import os
+import time
 import requests
-from typing import Dict, Optional, List
-from datetime import datetime
+from typing import Callable, Dict, Optional, List
+from datetime import datetime, timedelta, timezone
 from twilio.rest import Client
-from twilio.base.exceptions import TwilioException
+from twilio.base.exceptions import TwilioException, TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
+from app.services.metrics import TWILIO_SEND_ERRORS, TWILIO_SEND_RETRIES, TWILIO_SEND_SECONDS
+from app.services.delivery_service import delivery_service
+from app.services.job_codes import reply_command
+from app.services.job_state import AGENT_COMMANDS
+from app.services.resilience import CircuitBreaker, RetryPolicy, SendQueue
+from app.services.sender_pool import sender_pool
+from app.services.tracing import span, traced
+
+logger = logging.getLogger(__name__)
+
+def _error_reason(error: TwilioException) -> str:
+    """Bucket a Twilio error into a low-cardinality metric label."""
+    if isinstance(error, TwilioRestException):
+        if error.status == 429:
+            return "rate_limited"
+        if error.status >= 500:
+            return "server_error"
+        return "client_error"
+    return "twilio_error"
+
+# Twilio error codes worth retrying whatever the HTTP status: rate limits and service unavailability
+RETRYABLE_ERROR_CODES = {20429, 20500, 20503, 63018}
+
+def _is_retryable(error: Exception) -> bool:
+    """Whether a failed send may succeed later: throttling, Twilio 5xx and network errors.
+
+    Other 4xx errors, such as an invalid number or a closed WhatsApp session,
+    fail the same way every time.
+    """
+    if isinstance(error, TwilioRestException):
+        return error.status == 429 or error.status >= 500 or error.code in RETRYABLE_ERROR_CODES
+    return isinstance(error, (TwilioException, requests.RequestException))
+
+def _is_ambiguous(error: Exception) -> bool:
+    """Whether a failed call may still have created the message.
+
+    A read timeout or a connection dropped mid-request may come after Twilio
+    accepted the message; only a connection that was never made is sure not to.
+    """
+    return isinstance(error, requests.RequestException) and not isinstance(error, requests.ConnectTimeout)
+
+# How far a message's creation time may precede the failed call that created it, for clock skew
+EARLIER_SEND_SKEW = timedelta(minutes=1)
+
+# Shared by every WhatsAppService instance, like the sender pool
+twilio_breaker = CircuitBreaker("twilio")
+send_retry = RetryPolicy()
+send_queue = SendQueue("twilio", twilio_breaker, send_retry)
 
 class WhatsAppService:
     """Service for handling Twilio WhatsApp API interactions."""
@@ -12,54 +64,177 @@ class WhatsAppService:
         self.account_sid = os.getenv("TWILIO_ACCOUNT_SID")
         self.auth_token = os.getenv("TWILIO_AUTH_TOKEN")
         self.whatsapp_number = os.getenv("TWILIO_WHATSAPP_NUMBER")
+        # A Messaging Service picks senders itself; otherwise the local sender pool does
+        self.messaging_service_sid = os.getenv("TWILIO_MESSAGING_SERVICE_SID")
+        self.sender_pool = sender_pool
+        self.status_callback_url = os.getenv("TWILIO_STATUS_CALLBACK_URL")
         
         if self.account_sid and self.auth_token:
-            self.client = Client(self.account_sid, self.auth_token)
+            # Bound each call so a hung connection counts as a failure instead of holding the caller
+            http_client = TwilioHttpClient(timeout=float(os.getenv("TWILIO_HTTP_TIMEOUT", "10")))
+            self.client = Client(self.account_sid, self.auth_token, http_client=http_client)
+            # Point at a local Twilio emulator (see twilio_emulator.py) instead of api.twilio.com
+            api_base_url = os.getenv("TWILIO_API_BASE_URL")
+            if api_base_url:
+                self.client.api.base_url = api_base_url
         else:
             self.client = None
-            print("Warning: Twilio credentials not configured")
+            logger.warning("Twilio credentials not configured")
     
-    def send_message(self, to_number: str, message: str) -> Dict:
-        """Send a WhatsApp message using Twilio."""
+    def send_message(self, to_number: str, message: str, job_id: Optional[str] = None, template: Optional[str] = None,
+                     on_queued_result: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Send a WhatsApp message using Twilio and record it for delivery tracking.
+
+        The caller's thread makes one attempt and never sleeps. Sends that
+        fail with a transient error, that the circuit breaker refuses, or
+        whose sender has no rate-limit slot free yet are handed to the send
+        queue, whose worker retries them with backoff; their result carries
+        ``queued: True``, and ``on_queued_result`` is later called with the
+        result of the queued send once it is sent or given up.
+        """
+        result = self._deliver(to_number, message, job_id, template)
+        if not result["success"] and result.get("retryable") and send_queue.put(
+            self._deliver, to_number, message, job_id, template,
+            delay=result.get("retry_after", 0.0), on_done=on_queued_result, **(result.get("retry_with") or {})
+        ):
+            result["queued"] = True
+        return result
+    
+    def _deliver(self, to_number: str, message: str, job_id: Optional[str] = None, template: Optional[str] = None,
+                 sender: Optional[str] = None, unconfirmed_since: Optional[datetime] = None) -> Dict:
+        with span("twilio.send_message", to=to_number, template=template) as current:
+            result = self._send_message(to_number, message, sender, unconfirmed_since)
+            if result["success"]:
+                delivery_service.record_sent(result["message_id"], to_number, job_id=job_id, template=template,
+                                             status=result.get("status"), sender=result.get("sender"))
+            elif current is not None:
+                current.error = result["error"]
+            return result
+    
+    def _send_message(self, to_number: str, message: str, sender: Optional[str] = None,
+                      unconfirmed_since: Optional[datetime] = None) -> Dict:
+        """Make one attempt at a send.
+
+        ``sender`` pins the number a retried send already booked a slot on.
+        ``unconfirmed_since`` marks a retry of a call whose outcome is
+        unknown: Twilio is asked for a matching message created since then,
+        and only if there is none is the message sent again. Failures say in
+        ``retry_with`` what the next attempt needs.
+        """
+        if not self.client:
+            TWILIO_SEND_ERRORS.labels("not_configured").inc()
+            return {
+                "success": False,
+                "error": "Twilio client not configured"
+            }
+        
+        # Format the number for WhatsApp
+        if not to_number.startswith('whatsapp:'):
+            to_number = f"whatsapp:{to_number}"
+        
+        create_params = {"body": message, "to": to_number}
+        retry_with = {}
+        if self.messaging_service_sid:
+            create_params["messaging_service_sid"] = self.messaging_service_sid
+        else:
+            if sender is None:
+                sender, wait = self.sender_pool.reserve(to_number)
+                sender = sender or self.whatsapp_number
+                if wait > 0:
+                    # The slot is booked; the send queue sends it when it opens
+                    return {
+                        "success": False,
+                        "error": "Sender rate limit reached",
+                        "retryable": True,
+                        "retry_after": wait,
+                        "retry_with": {"sender": sender}
+                    }
+            retry_with["sender"] = sender
+            create_params["from_"] = f"whatsapp:{sender}"
+        if unconfirmed_since is not None:
+            retry_with["unconfirmed_since"] = unconfirmed_since
+        if self.status_callback_url:
+            create_params["status_callback"] = self.status_callback_url
+        
+        if not twilio_breaker.allow():
+            TWILIO_SEND_ERRORS.labels("circuit_open").inc()
+            return {
+                "success": False,
+                "error": "Twilio unavailable, circuit open",
+                "retryable": True,
+                "retry_with": retry_with
+            }
+        
+        started = time.perf_counter()
+        attempted_at = datetime.now(timezone.utc)
         try:
-            if not self.client:
-                return {
-                    "success": False,
-                    "error": "Twilio client not configured"
-                }
-            
-            # Format the number for WhatsApp
-            if not to_number.startswith('whatsapp:'):
-                to_number = f"whatsapp:{to_number}"
-            
-            from_number = f"whatsapp:{self.whatsapp_number}"
-            
-            message_obj = self.client.messages.create(
-                from_=from_number,
-                body=message,
-                to=to_number
-            )
+            message_obj = None
+            if unconfirmed_since is not None:
+                message_obj = self._find_earlier_send(create_params, unconfirmed_since)
+                if message_obj is not None:
+                    logger.info("Earlier send found, not sending again", extra={"to": to_number, "message_sid": message_obj.sid})
+            if message_obj is None:
+                message_obj = self.client.messages.create(**create_params)
+            twilio_breaker.record_success()
+            TWILIO_SEND_SECONDS.labels("success").observe(time.perf_counter() - started)
+            logger.info("WhatsApp message sent", extra={"event": "message_sent", "to": to_number, "message_sid": message_obj.sid})
             
             return {
                 "success": True,
                 "message_id": message_obj.sid,
                 "timestamp": datetime.utcnow().isoformat(),
-                "status": message_obj.status
+                "status": message_obj.status,
+                "sender": (message_obj.from_ or "").replace("whatsapp:", "") or None
             }
                 
-        except TwilioException as e:
-            return {
-                "success": False,
-                "error": f"Twilio API error: {str(e)}"
-            }
         except Exception as e:
+            TWILIO_SEND_SECONDS.labels("error").observe(time.perf_counter() - started)
+            retryable = _is_retryable(e)
+            if isinstance(e, TwilioException):
+                reason = _error_reason(e)
+                error = f"Twilio API error: {str(e)}"
+            else:
+                reason = "network_error" if retryable else "exception"
+                error = f"Failed to send WhatsApp message: {str(e)}"
+            TWILIO_SEND_ERRORS.labels(reason).inc()
+            
+            # Only transient failures say Twilio is unhealthy; a rejected number says nothing either way
+            if retryable:
+                twilio_breaker.record_failure()
+                TWILIO_SEND_RETRIES.labels(reason).inc()
+            else:
+                twilio_breaker.release()
+            if retryable and _is_ambiguous(e) and unconfirmed_since is None:
+                # The message may exist already; retries look for it before sending again
+                retry_with["unconfirmed_since"] = attempted_at
+            
+            if isinstance(e, TwilioException) or retryable:
+                logger.warning("Twilio API error sending to %s: %s", to_number, e, extra={"event": "message_failed"})
+            else:
+                logger.exception("Failed to send WhatsApp message to %s", to_number, extra={"event": "message_failed"})
             return {
                 "success": False,
-                "error": f"Failed to send WhatsApp message: {str(e)}"
+                "error": error,
+                "retryable": retryable,
+                "retry_with": retry_with
             }
     
-    def send_inspection_request_to_agents(self, property_details: Dict, inspection_date: str, inspection_time: str, agent_numbers: List[str]) -> Dict:
-        """Send inspection request to all available agents."""
+    def _find_earlier_send(self, create_params: Dict, since: datetime):
+        """The message an earlier call with unknown outcome created, if Twilio has one."""
+        for message_obj in self.client.messages.list(to=create_params["to"], limit=20):
+            created = message_obj.date_created
+            if message_obj.body == create_params["body"] and created is not None and created >= since - EARLIER_SEND_SKEW:
+                return message_obj
+        return None
+    
+    @traced()
+    def send_inspection_request_to_agents(self, property_details: Dict, inspection_date: str, inspection_time: str, agent_numbers: List[str], job_id: Optional[str] = None, job_code: Optional[str] = None,
+                                          on_queued_result: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+        """Send inspection request to all available agents.
+
+        ``on_queued_result(agent_number, result)`` reports how each queued
+        request ended.
+        """
         message = f"""
 🏠 New Inspection Request
 
@@ -72,12 +247,15 @@ Bathrooms: {property_details.get('bathrooms', 'N/A')}
 Inspection Date: {inspection_date}
 Inspection Time: {inspection_time}
 
-Reply YES to accept this inspection request.
+Reply {reply_command('YES', job_code)} to accept this inspection request.
         """.strip()
         
         results = []
         for agent_number in agent_numbers:
-            result = self.send_message(agent_number, message)
+            result = self.send_message(
+                agent_number, message, job_id=job_id, template="inspection_request",
+                on_queued_result=functools.partial(on_queued_result, agent_number) if on_queued_result else None
+            )
             results.append({
                 "agent_number": agent_number,
                 "result": result
@@ -89,7 +267,8 @@ Reply YES to accept this inspection request.
             "results": results
         }
     
-    def send_job_assigned_confirmation(self, agent_number: str, property_details: Dict, client_details: Dict, inspection_date: str, inspection_time: str) -> Dict:
+    @traced()
+    def send_job_assigned_confirmation(self, agent_number: str, property_details: Dict, client_details: Dict, inspection_date: str, inspection_time: str, job_id: Optional[str] = None, job_code: Optional[str] = None) -> Dict:
         """Send confirmation when job is assigned to an agent."""
         message = f"""
 ✅ Inspection Assigned!
@@ -104,12 +283,13 @@ Client Phone: {client_details.get('phone', 'N/A')}
 Inspection Date: {inspection_date}
 Inspection Time: {inspection_time}
 
-Please confirm the schedule by replying CONFIRM.
+Please confirm the schedule by replying {reply_command('CONFIRM', job_code)}.
         """.strip()
         
-        return self.send_message(agent_number, message)
+        return self.send_message(agent_number, message, job_id=job_id, template="job_assigned_confirmation")
     
-    def send_job_already_assigned(self, agent_number: str, property_details: Dict) -> Dict:
+    @traced()
+    def send_job_already_assigned(self, agent_number: str, property_details: Dict, job_id: Optional[str] = None) -> Dict:
         """Send notification that job is already assigned."""
         message = f"""
 ❌ Job Already Assigned
@@ -119,9 +299,34 @@ The inspection request for {property_details.get('title', 'N/A')} has already be
 Thank you for your interest!
         """.strip()
         
-        return self.send_message(agent_number, message)
+        return self.send_message(agent_number, message, job_id=job_id, template="job_already_assigned")
+    
+    @traced()
+    def send_job_cancelled(self, agent_number: str, property_details: Dict, inspection_date: str, inspection_time: str, job_id: Optional[str] = None) -> Dict:
+        """Tell the assigned agent that their inspection has been cancelled."""
+        message = f"""
+🚫 Inspection Cancelled
+
+The inspection of {property_details.get('title', 'N/A')} on {inspection_date} at {inspection_time} has been cancelled. You do not need to attend.
+        """.strip()
+        
+        return self.send_message(agent_number, message, job_id=job_id, template="job_cancelled")
+    
+    @traced()
+    def send_schedule_conflict(self, agent_number: str, property_details: Dict, inspection_date: str, inspection_time: str, job_id: Optional[str] = None) -> Dict:
+        """Tell an agent they cannot take a job that overlaps one of their bookings."""
+        message = f"""
+⚠️ Schedule Conflict
+
+You already have an inspection or blocked time around {inspection_date} at {inspection_time}, so the request for {property_details.get('title', 'N/A')} cannot be assigned to you.
+
+Reply YES to other requests that fit your schedule.
+        """.strip()
+        
+        return self.send_message(agent_number, message, job_id=job_id, template="schedule_conflict")
     
-    def send_job_taken_notification(self, agent_number: str, property_details: Dict) -> Dict:
+    @traced()
+    def send_job_taken_notification(self, agent_number: str, property_details: Dict, job_id: Optional[str] = None) -> Dict:
         """Send notification that a job has been taken by another agent."""
         message = f"""
 📢 Job Update
@@ -131,9 +336,25 @@ The inspection request for {property_details.get('title', 'N/A')} has been assig
 Keep an eye out for new inspection requests!
         """.strip()
         
-        return self.send_message(agent_number, message)
+        return self.send_message(agent_number, message, job_id=job_id, template="job_taken_notification")
     
-    def send_inspection_reminder(self, agent_number: str, property_details: Dict, client_details: Dict, inspection_date: str, inspection_time: str) -> Dict:
+    @traced()
+    def send_job_taken_digest(self, agent_number: str, taken_jobs: List[Dict]) -> Dict:
+        """Send one notification listing several jobs taken by other agents."""
+        lines = "\n".join(f"• {property_details.get('title', 'N/A')}" for property_details in taken_jobs)
+        message = f"""
+📢 Job Update
+
+These inspection requests have been assigned to other agents:
+{lines}
+
+Keep an eye out for new inspection requests!
+        """.strip()
+        
+        return self.send_message(agent_number, message, template="job_taken_digest")
+    
+    @traced()
+    def send_inspection_reminder(self, agent_number: str, property_details: Dict, client_details: Dict, inspection_date: str, inspection_time: str, job_id: Optional[str] = None) -> Dict:
         """Send inspection reminder to assigned agent."""
         message = f"""
 🔔 Inspection Reminder
@@ -151,9 +372,10 @@ Inspection Time: {inspection_time}
 Please proceed to the property location.
         """.strip()
         
-        return self.send_message(agent_number, message)
+        return self.send_message(agent_number, message, job_id=job_id, template="inspection_reminder")
     
-    def send_schedule_confirmation(self, agent_number: str, property_details: Dict, inspection_date: str, inspection_time: str) -> Dict:
+    @traced()
+    def send_schedule_confirmation(self, agent_number: str, property_details: Dict, inspection_date: str, inspection_time: str, job_id: Optional[str] = None) -> Dict:
         """Send confirmation when agent confirms inspection schedule."""
         message = f"""
 ✅ Schedule Confirmed!
@@ -169,9 +391,10 @@ Inspection Time: {inspection_time}
 You will receive a reminder at the scheduled time.
         """.strip()
         
-        return self.send_message(agent_number, message)
+        return self.send_message(agent_number, message, job_id=job_id, template="schedule_confirmation")
     
-    def send_inspection_started_confirmation(self, agent_number: str, property_details: Dict) -> Dict:
+    @traced()
+    def send_inspection_started_confirmation(self, agent_number: str, property_details: Dict, job_id: Optional[str] = None, job_code: Optional[str] = None) -> Dict:
         """Send confirmation when inspection is started."""
         message = f"""
 🚀 Inspection Started!
@@ -181,12 +404,13 @@ You have successfully started your inspection.
 Property: {property_details.get('title', 'N/A')}
 Address: {property_details.get('address', 'N/A')}
 
-Please conduct a thorough inspection and reply COMPLETE when finished.
+Please conduct a thorough inspection and reply {reply_command('COMPLETE', job_code)} when finished.
         """.strip()
         
-        return self.send_message(agent_number, message)
+        return self.send_message(agent_number, message, job_id=job_id, template="inspection_started_confirmation")
     
-    def send_inspection_completed_confirmation(self, agent_number: str, property_details: Dict) -> Dict:
+    @traced()
+    def send_inspection_completed_confirmation(self, agent_number: str, property_details: Dict, job_id: Optional[str] = None) -> Dict:
         """Send confirmation when inspection is completed."""
         message = f"""
 ✅ Inspection Completed!
@@ -196,9 +420,27 @@ Thank you for completing the inspection for {property_details.get('title', 'N/A'
 Your report has been submitted successfully.
         """.strip()
         
-        return self.send_message(agent_number, message)
+        return self.send_message(agent_number, message, job_id=job_id, template="inspection_completed_confirmation")
+    
+    @traced()
+    def send_agent_items(self, agent_number: str, offers: List[Dict], jobs: List[Dict]) -> Dict:
+        """Answer LIST/STATUS with the agent's open offers and jobs in one message."""
+        lines = []
+        for job in offers:
+            lines.append(f"• {job.get('job_code') or '-'} {job['property_details'].get('title', 'N/A')}, {job.get('inspection_date')} {job.get('inspection_time')}: offered, reply {reply_command('YES', job.get('job_code'))}")
+        for job in jobs:
+            action = AGENT_COMMANDS.get(job.get('status'))
+            hint = f", reply {reply_command(action, job.get('job_code'))}" if action else ""
+            lines.append(f"• {job.get('job_code') or '-'} {job['property_details'].get('title', 'N/A')}, {job.get('inspection_date')} {job.get('inspection_time')}: {job.get('status')}{hint}")
+        if lines:
+            message = "📋 Your Open Inspections\n\n" + "\n".join(lines)
+        else:
+            message = "📋 You have no open offers or inspections."
+        
+        return self.send_message(agent_number, message, template="agent_items")
     
-    def send_multiple_property_notification(self, agent_number: str, client_name: str, new_property_details: Dict) -> Dict:
+    @traced()
+    def send_multiple_property_notification(self, agent_number: str, client_name: str, new_property_details: Dict, job_id: Optional[str] = None) -> Dict:
         """Send notification for additional property inspection for same client."""
         message = f"""
 🏠 Additional Inspection Request
@@ -212,8 +454,9 @@ Type: {new_property_details.get('property_type', 'N/A')}
 Reply YES to accept this additional inspection.
         """.strip()
         
-        return self.send_message(agent_number, message)
+        return self.send_message(agent_number, message, job_id=job_id, template="multiple_property_notification")
     
+    @traced()
     def send_daily_summary(self, agent_number: str, summary_data: Dict) -> Dict:
         """Send daily summary to agent."""
         message = f"""
@@ -227,11 +470,12 @@ In Progress: {summary_data.get('in_progress', 0)}
 Have a great day!
         """.strip()
         
-        return self.send_message(agent_number, message)
+        return self.send_message(agent_number, message, template="daily_summary")
 
     # New methods for client notifications
     
-    def send_agent_assigned_to_client(self, client_phone: str, agent_details: Dict, property_details: Dict, inspection_date: str, inspection_time: str) -> Dict:
+    @traced()
+    def send_agent_assigned_to_client(self, client_phone: str, agent_details: Dict, property_details: Dict, inspection_date: str, inspection_time: str, job_id: Optional[str] = None) -> Dict:
         """Send notification to client when agent is assigned."""
         message = f"""
 ✅ Agent Assigned!
@@ -254,9 +498,10 @@ Inspection Time: {inspection_time}
 The agent will contact you shortly to confirm the schedule.
         """.strip()
         
-        return self.send_message(client_phone, message)
+        return self.send_message(client_phone, message, job_id=job_id, template="agent_assigned_to_client")
     
-    def send_schedule_confirmed_to_client(self, client_phone: str, agent_details: Dict, property_details: Dict, inspection_date: str, inspection_time: str) -> Dict:
+    @traced()
+    def send_schedule_confirmed_to_client(self, client_phone: str, agent_details: Dict, property_details: Dict, inspection_date: str, inspection_time: str, job_id: Optional[str] = None) -> Dict:
         """Send notification to client when agent confirms schedule."""
         message = f"""
 📅 Schedule Confirmed!
@@ -275,9 +520,10 @@ Inspection Time: {inspection_time}
 You will receive a reminder 30 minutes before the inspection.
         """.strip()
         
-        return self.send_message(client_phone, message)
+        return self.send_message(client_phone, message, job_id=job_id, template="schedule_confirmed_to_client")
     
-    def send_inspection_reminder_to_client(self, client_phone: str, agent_details: Dict, property_details: Dict, inspection_date: str, inspection_time: str) -> Dict:
+    @traced()
+    def send_inspection_reminder_to_client(self, client_phone: str, agent_details: Dict, property_details: Dict, inspection_date: str, inspection_time: str, job_id: Optional[str] = None) -> Dict:
         """Send inspection reminder to client."""
         message = f"""
 🔔 Inspection Reminder
@@ -296,9 +542,10 @@ Inspection Time: {inspection_time}
 Please ensure someone is available at the property for the inspection.
         """.strip()
         
-        return self.send_message(client_phone, message)
+        return self.send_message(client_phone, message, job_id=job_id, template="inspection_reminder_to_client")
     
-    def send_inspection_started_to_client(self, client_phone: str, agent_details: Dict, property_details: Dict) -> Dict:
+    @traced()
+    def send_inspection_started_to_client(self, client_phone: str, agent_details: Dict, property_details: Dict, job_id: Optional[str] = None) -> Dict:
         """Send notification to client when inspection starts."""
         message = f"""
 🚀 Inspection Started!
@@ -314,9 +561,10 @@ Phone: {agent_details.get('phone', 'N/A')}
 The agent is now conducting the inspection. You will be notified when it's completed.
         """.strip()
         
-        return self.send_message(client_phone, message)
+        return self.send_message(client_phone, message, job_id=job_id, template="inspection_started_to_client")
     
-    def send_inspection_completed_to_client(self, client_phone: str, agent_details: Dict, property_details: Dict) -> Dict:
+    @traced()
+    def send_inspection_completed_to_client(self, client_phone: str, agent_details: Dict, property_details: Dict, job_id: Optional[str] = None) -> Dict:
         """Send notification to client when inspection is completed."""
         message = f"""
 ✅ Inspection Completed!
@@ -332,4 +580,4 @@ Phone: {agent_details.get('phone', 'N/A')}
 The inspection report will be available shortly. Thank you for choosing our service!
         """.strip()
         
-        return self.send_message(client_phone, message)
+        return self.send_message(client_phone, message, job_id=job_id, template="inspection_completed_to_client")
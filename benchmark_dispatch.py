@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+End-to-End Dispatch Benchmark
+
+Runs the app in-process against an in-memory (or SQLite/Mongo) store and the
+local Twilio emulator, then drives the core flow through the real HTTP routes:
+
+    create job -> broadcast -> concurrent YES replies -> CONFIRM -> START -> COMPLETE
+
+Reports p50/p95/p99 latency and throughput per endpoint and can write the
+results as JSON and fail when they regress against a baseline.
+
+Usage:
+    python benchmark_dispatch.py --agents 200 --jobs 20 --concurrency 50
+    python benchmark_dispatch.py --output bench.json
+    python benchmark_dispatch.py --baseline bench.json --max-regression 0.15
+    python benchmark_dispatch.py --storage mongo   # uses MONGODB_URI
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import requests
+
+ENDPOINTS = ["create_job", "webhook_yes", "webhook_confirm", "webhook_start", "webhook_complete"]
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+class Recorder:
+    """Collects per-endpoint latencies and the wall time spent in each phase."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.busy_time: Dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def timed_post(self, session: requests.Session, endpoint: str, url: str, **kwargs) -> requests.Response:
+        started = time.perf_counter()
+        try:
+            response = session.post(url, timeout=60, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies[endpoint].append(elapsed)
+            if not ok:
+                self.errors[endpoint] += 1
+        return response
+
+    @contextlib.contextmanager
+    def phase(self, endpoint: str):
+        started = time.perf_counter()
+        yield
+        with self._lock:
+            self.busy_time[endpoint] += time.perf_counter() - started
+
+    def summary(self) -> Dict:
+        results = {}
+        for endpoint in ENDPOINTS:
+            values = self.latencies.get(endpoint, [])
+            busy = self.busy_time.get(endpoint, 0.0)
+            results[endpoint] = {
+                "count": len(values),
+                "errors": self.errors.get(endpoint, 0),
+                "p50_ms": round(percentile(values, 50) * 1000, 3),
+                "p95_ms": round(percentile(values, 95) * 1000, 3),
+                "p99_ms": round(percentile(values, 99) * 1000, 3),
+                "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+                "max_ms": round(max(values) * 1000, 3) if values else 0.0,
+                "throughput_rps": round(len(values) / busy, 2) if busy > 0 else 0.0,
+            }
+        return results
+
+def start_app(storage: str, emulator_url: str, verbose: bool):
+    """Configure the environment, import the app and serve it on a local port."""
+    os.environ["STORAGE_BACKEND"] = storage
+    os.environ.setdefault("SQLITE_PATH", ":memory:")
+    os.environ["TWILIO_ACCOUNT_SID"] = "ACbenchmark"
+    os.environ["TWILIO_AUTH_TOKEN"] = "benchmark"
+    os.environ["TWILIO_WHATSAPP_NUMBER"] = "+14155238886"
+    os.environ["TWILIO_API_BASE_URL"] = emulator_url
+    # Offer every job to every agent at once, so each round's responders were all offered its job
+    os.environ["DISPATCH_MODE"] = "broadcast"
+    os.environ["DISPATCH_WAVE_SIZE"] = "0"
+
+    import uvicorn
+    with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+        from app.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("App server did not start")
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+def seed_agents(base_url: str, count: int) -> List[str]:
+    phones = [f"+23480{i:08d}" for i in range(1, count + 1)]
+    lines = ["name,phone,zone,specializations,rating,experience_years"]
+    for i, phone in enumerate(phones):
+        lines.append(f"Bench Agent {i},{phone},Zone {i % 10},Apartments;Duplex,{3 + (i % 20) / 10},{i % 15}")
+    response = requests.post(
+        f"{base_url}/api/agents/bulk",
+        files={"file": ("agents.csv", "\n".join(lines).encode("utf-8"))},
+        timeout=120
+    )
+    response.raise_for_status()
+    return phones
+
+def count_double_assignments(base_url: str, claims: Dict[str, set]) -> int:
+    """Agents told they won a job that the stored job does not name as its agent."""
+    stored = {job["id"]: job for job in requests.get(f"{base_url}/api/jobs/", timeout=120).json()}
+    double_assignments = 0
+    for job_id, phones in claims.items():
+        assigned_agent = stored.get(job_id, {}).get("assigned_agent")
+        double_assignments += len(phones - {assigned_agent})
+    return double_assignments
+
+def run_benchmark(args) -> Dict:
+    from twilio_emulator import TwilioEmulator
+
+    rng = random.Random(args.seed)
+    emulator = TwilioEmulator(latency=args.twilio_latency, seed=args.seed)
+    emulator_url = emulator.start()
+    server, base_url = start_app(args.storage, emulator_url, args.verbose)
+
+    recorder = Recorder()
+    sessions = threading.local()
+
+    def session() -> requests.Session:
+        if not hasattr(sessions, "value"):
+            sessions.value = requests.Session()
+        return sessions.value
+
+    out = sys.stdout if args.verbose else io.StringIO()
+    # job id -> phones whose YES was answered with that job assigned to them
+    claims: Dict[str, set] = {}
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(out), ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        phones = seed_agents(base_url, args.agents)
+        emulator.reset()
+
+        for round_number in range(args.jobs):
+            job = {
+                "property": {
+                    "property_id": f"bench_prop_{round_number}",
+                    "title": f"Benchmark Property {round_number}",
+                    "address": "1 Benchmark Way",
+                    "property_type": "Apartment",
+                    "area": f"Zone {round_number % 10}",
+                },
+                "client": {"client_id": f"bench_client_{round_number}", "name": "Bench Client", "phone": "+2348099999999"},
+                "inspection_date": "2099-01-01",
+                "inspection_time": "10:00",
+            }
+            with recorder.phase("create_job"):
+                created = recorder.timed_post(session(), "create_job", f"{base_url}/api/jobs/", json=job)
+            if created is None or not created.ok:
+                continue
+            # The webhook and the job list name jobs by their stored id, not the one creation returns
+            job_id = session().get(f"{base_url}/api/jobs/{created.json()['id']}", timeout=60).json()["id"]
+
+            responders = rng.sample(phones, min(args.concurrency, len(phones)))
+
+            def reply_yes(phone):
+                response = recorder.timed_post(
+                    session(), "webhook_yes", f"{base_url}/api/webhooks/twilio/whatsapp",
+                    data={"From": f"whatsapp:{phone}", "Body": "YES", "MessageSid": f"SMbench{rng.getrandbits(48):x}"}
+                )
+                return phone, response
+
+            with recorder.phase("webhook_yes"):
+                replies = list(pool.map(reply_yes, responders))
+
+            for phone, response in replies:
+                if response is not None and response.ok and response.json().get("status") == "success":
+                    claims.setdefault(response.json().get("job_id"), set()).add(phone)
+            winners = claims.get(job_id)
+            if not winners:
+                continue
+
+            winner = next(iter(winners))
+            for command, endpoint in (("CONFIRM", "webhook_confirm"), ("START", "webhook_start"), ("COMPLETE", "webhook_complete")):
+                with recorder.phase(endpoint):
+                    recorder.timed_post(
+                        session(), endpoint, f"{base_url}/api/webhooks/twilio/whatsapp",
+                        data={"From": f"whatsapp:{winner}", "Body": command}
+                    )
+
+    wall_time = time.perf_counter() - started
+    double_assignments = count_double_assignments(base_url, claims)
+    server.should_exit = True
+    emulator.stop()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "storage": args.storage,
+            "agents": args.agents,
+            "jobs": args.jobs,
+            "concurrency": args.concurrency,
+            "twilio_latency": args.twilio_latency,
+            "seed": args.seed,
+        },
+        "endpoints": recorder.summary(),
+        "totals": {
+            "wall_time_s": round(wall_time, 3),
+            "twilio_messages": emulator.stats["accepted"],
+            "messages_per_job": round(emulator.stats["accepted"] / args.jobs, 2) if args.jobs else 0,
+            "double_assignments": double_assignments,
+        },
+    }
+
+def compare(results: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Return a description of every endpoint whose p95 or throughput regressed too far."""
+    regressions = []
+    for endpoint, current in results["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(endpoint)
+        if not previous or not current["count"] or not previous.get("count"):
+            continue
+        if previous["p95_ms"] > 0 and current["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{endpoint}: p95 {previous['p95_ms']:.2f}ms -> {current['p95_ms']:.2f}ms")
+        if previous["throughput_rps"] > 0 and current["throughput_rps"] < previous["throughput_rps"] * (1 - max_regression):
+            regressions.append(f"{endpoint}: throughput {previous['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} req/s")
+    return regressions
+
+def print_report(results: Dict):
+    meta = results["meta"]
+    print("📊 Dispatch Benchmark")
+    print("=" * 78)
+    print(f"Commit: {meta['commit']}  Storage: {meta['storage']}  Agents: {meta['agents']}  "
+          f"Jobs: {meta['jobs']}  Concurrency: {meta['concurrency']}")
+    print("=" * 78)
+    print(f"{'endpoint':<18}{'count':>7}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'req/s':>9}")
+    for endpoint, stats in results["endpoints"].items():
+        print(f"{endpoint:<18}{stats['count']:>7}{stats['errors']:>5}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}{stats['throughput_rps']:>9.1f}")
+    totals = results["totals"]
+    print("-" * 78)
+    print(f"Wall time: {totals['wall_time_s']}s  Twilio messages: {totals['twilio_messages']} "
+          f"({totals['messages_per_job']}/job)  Double assignments: {totals['double_assignments']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end dispatch benchmark")
+    parser.add_argument("--storage", choices=["memory", "sqlite", "mongo"], default="memory")
+    parser.add_argument("--agents", type=int, default=100, help="Active agents receiving each broadcast")
+    parser.add_argument("--jobs", type=int, default=20, help="Jobs to push through the full flow")
+    parser.add_argument("--concurrency", type=int, default=20, help="Agents replying YES at once per job")
+    parser.add_argument("--twilio-latency", default="0", help="Emulated Twilio latency spec in ms")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Write results as JSON to this file")
+    parser.add_argument("--baseline", default=None, help="Compare against a previous JSON result")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed fractional p95/throughput regression against the baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show app output during the run")
+    args = parser.parse_args()
+
+    # The app serves ./static relative to the repository root
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    results = run_benchmark(args)
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"❌ Regressions vs {args.baseline} (baseline commit {baseline.get('meta', {}).get('commit')}):")
+            for regression in regressions:
+                print(f"   - {regression}")
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.max_regression:.0%} vs {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Nearest-Agent Lookup Benchmark
+
+Measures k-nearest-agent lookups as used by DISPATCH_MODE=nearest: the
+in-memory grid index behind the agent roster cache against a linear scan
+of every agent, and optionally MongoDB's $nearSphere on a 2dsphere index.
+Agents are scattered around a few city centres with some outliers; every
+grid result is checked against the linear scan.
+
+Usage:
+    python benchmark_geo.py
+    python benchmark_geo.py --agents 10000 --queries 2000 --k 10
+    python benchmark_geo.py --cell 0.05 --max-km 15
+    python benchmark_geo.py --mongo          # also time $nearSphere (uses MONGODB_URI)
+"""
+
+import argparse
+import heapq
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.services.geo import GridIndex, geo_point, haversine_km
+
+# (latitude, longitude, spread in degrees)
+CITIES = [(6.5244, 3.3792, 0.15), (9.0765, 7.3986, 0.12), (4.8156, 7.0498, 0.1), (7.3775, 3.9470, 0.1)]
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+def random_point(rng: random.Random, outlier_rate: float = 0.02) -> Tuple[float, float]:
+    if rng.random() < outlier_rate:
+        return rng.uniform(4.0, 13.5), rng.uniform(2.7, 14.6)
+    latitude, longitude, spread = rng.choice(CITIES)
+    return rng.gauss(latitude, spread), rng.gauss(longitude, spread)
+
+def linear_nearest(points: List[Tuple[float, float, str]], latitude: float, longitude: float, k: int,
+                   max_km: Optional[float]) -> List[Tuple[float, str]]:
+    distances = ((haversine_km(latitude, longitude, lat, lng), key) for lat, lng, key in points)
+    if max_km is not None:
+        distances = (item for item in distances if item[0] <= max_km)
+    return heapq.nsmallest(k, distances)
+
+def time_lookups(lookup, queries: List[Tuple[float, float]]) -> Tuple[List[float], List]:
+    latencies, results = [], []
+    for latitude, longitude in queries:
+        started = time.perf_counter()
+        results.append(lookup(latitude, longitude))
+        latencies.append(time.perf_counter() - started)
+    return latencies, results
+
+def summarize(name: str, latencies: List[float]) -> Dict:
+    return {
+        "method": name,
+        "lookups_per_s": len(latencies) / sum(latencies) if latencies else 0.0,
+        **{f"p{p}_us": percentile(latencies, p) * 1e6 for p in (50, 95, 99)},
+    }
+
+def mongo_lookups(points, queries, k: int, max_km: Optional[float]) -> List[float]:
+    from pymongo import MongoClient
+
+    client = MongoClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017"), serverSelectionTimeoutMS=5000)
+    collection = client[os.getenv("MONGODB_DB_NAME", "whatsapp_agent_system")]["benchmark_geo_agents"]
+    collection.drop()
+    try:
+        collection.insert_many([{"phone": key, "location": geo_point(lat, lng)} for lat, lng, key in points])
+        collection.create_index([("location", "2dsphere")])
+        latencies = []
+        for latitude, longitude in queries:
+            near = {"$geometry": geo_point(latitude, longitude)}
+            if max_km is not None:
+                near["$maxDistance"] = max_km * 1000
+            started = time.perf_counter()
+            list(collection.find({"location": {"$nearSphere": near}}, {"phone": 1}).limit(k))
+            latencies.append(time.perf_counter() - started)
+        return latencies
+    finally:
+        collection.drop()
+        client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nearest-agent lookups")
+    parser.add_argument("--agents", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10, help="Agents returned per lookup (DISPATCH_NEAREST_COUNT)")
+    parser.add_argument("--max-km", type=float, default=None, help="Distance cap (DISPATCH_MAX_DISTANCE_KM)")
+    parser.add_argument("--cell", type=float, default=0.02, help="Grid cell size in degrees")
+    parser.add_argument("--mongo", action="store_true", help="Also benchmark $nearSphere against MongoDB")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", default=None, help="Write the results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    points = [(*random_point(rng), f"+2349{i:09d}") for i in range(args.agents)]
+    queries = [random_point(rng, outlier_rate=0.05) for _ in range(args.queries)]
+
+    print("📍 Nearest-Agent Lookup Benchmark")
+    print("=" * 50)
+    print(f"{args.agents} agents, {args.queries} lookups, k={args.k}, max_km={args.max_km}, cell={args.cell}°\n")
+
+    started = time.perf_counter()
+    grid = GridIndex(args.cell)
+    for latitude, longitude, key in points:
+        grid.add(key, latitude, longitude)
+    build_ms = (time.perf_counter() - started) * 1000
+    print(f"Grid build: {build_ms:.1f} ms ({len(grid._cells)} occupied cells)")
+
+    grid_latencies, grid_results = time_lookups(lambda lat, lng: grid.nearest(lat, lng, args.k, args.max_km), queries)
+    scan_latencies, scan_results = time_lookups(lambda lat, lng: linear_nearest(points, lat, lng, args.k, args.max_km), queries)
+
+    mismatches = sum(
+        1 for got, expected in zip(grid_results, scan_results)
+        if [round(d, 9) for d, _ in got] != [round(d, 9) for d, _ in expected]
+    )
+
+    summaries = [summarize("grid index", grid_latencies), summarize("linear scan", scan_latencies)]
+    if args.mongo:
+        summaries.append(summarize("mongo $nearSphere", mongo_lookups(points, queries, args.k, args.max_km)))
+
+    print(f"\n{'method':<20} {'lookups/s':>12} {'p50 µs':>10} {'p95 µs':>10} {'p99 µs':>10}")
+    for s in summaries:
+        print(f"{s['method']:<20} {s['lookups_per_s']:>12.0f} {s['p50_us']:>10.1f} {s['p95_us']:>10.1f} {s['p99_us']:>10.1f}")
+    print(f"\nSpeed-up at p50: {summaries[1]['p50_us'] / max(summaries[0]['p50_us'], 1e-9):.0f}x")
+
+    if mismatches:
+        print(f"\n❌ {mismatches} lookups differ from the linear scan")
+    else:
+        print("\n✅ Grid results match the linear scan")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"parameters": vars(args), "build_ms": build_ms, "mismatches": mismatches, "results": summaries}, f, indent=2)
+
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == "__main__":
+    main()
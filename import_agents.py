@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Bulk Agent Import Script for WhatsApp Agent Dispatch System
+
+Imports agents from a CSV, JSON array or JSON Lines file, normalizing phone
+numbers and upserting by phone. Replaces the one-off add_agent scripts.
+
+Usage:
+    python import_agents.py agents.csv
+    python import_agents.py agents.json --chunk-size 1000
+    python import_agents.py agents.csv --api-url https://web-production-8cec.up.railway.app
+
+CSV columns: agent_id, name, phone, email, status, zone, specializations
+(separated by ";"), experience_years, rating, total_inspections.
+Only name and phone are required.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import requests
+
+def import_via_api(path: str, api_url: str, file_format: str, chunk_size: int) -> dict:
+    """Upload the file to the /api/agents/bulk endpoint of a running deployment."""
+    params = {}
+    if file_format:
+        params["format"] = file_format
+    if chunk_size:
+        params["chunk_size"] = chunk_size
+
+    with open(path, "rb") as f:
+        response = requests.post(
+            f"{api_url.rstrip('/')}/api/agents/bulk",
+            files={"file": (os.path.basename(path), f)},
+            params=params,
+            timeout=300
+        )
+    response.raise_for_status()
+    return response.json()
+
+def import_direct(path: str, file_format: str, chunk_size: int) -> dict:
+    """Import straight into the configured database."""
+    from app.services.agent_import_service import AgentImportService
+
+    if file_format is None:
+        extension = os.path.splitext(path)[1].lstrip('.').lower()
+        if extension in ('csv', 'json', 'jsonl', 'ndjson'):
+            file_format = extension
+
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return AgentImportService().import_stream(f, file_format, chunk_size)
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import agents from a CSV/JSON file")
+    parser.add_argument("file", help="Path to a .csv, .json or .jsonl file")
+    parser.add_argument("--format", choices=["csv", "json", "jsonl"], default=None,
+                        help="File format (detected from the extension or contents if omitted)")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="Agents per bulk write (default: AGENT_IMPORT_CHUNK_SIZE or 500)")
+    parser.add_argument("--api-url", default=None,
+                        help="Import through a running deployment instead of connecting to MongoDB directly")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"❌ File not found: {args.file}")
+        sys.exit(1)
+
+    print("📥 Importing agents...")
+    print(f"File: {args.file}")
+    print(f"Target: {args.api_url or 'database (MONGODB_URI)'}")
+
+    started = time.perf_counter()
+    try:
+        if args.api_url:
+            summary = import_via_api(args.file, args.api_url, args.format, args.chunk_size)
+        else:
+            summary = import_direct(args.file, args.format, args.chunk_size)
+    except Exception as e:
+        print(f"❌ Import failed: {str(e)}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ Processed {summary['total']} records in {elapsed:.2f}s")
+    print(f"   Inserted: {summary['inserted']}")
+    print(f"   Updated:  {summary['updated']}")
+    print(f"   Rejected: {summary['rejected']}")
+
+    for error in summary.get("errors", []):
+        location = f"line {error['line']}" if error.get("line") else "write"
+        print(f"   - {location} ({error.get('phone') or 'no phone'}): {error['error']}")
+
+    if summary["rejected"]:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Dispatch Strategy Simulator
+
+Replays jobs through the real JobService to compare a full broadcast with
+wave dispatch (DISPATCH_WAVE_SIZE / DISPATCH_WAVE_TIMEOUT). Each offered
+agent accepts with some probability after a log-normally distributed delay.
+For every strategy it reports outbound messages per assigned job, inbound
+replies per job, the share of jobs assigned and time-to-assign percentiles.
+
+Jobs are created with JobService.create_inspection_request on the in-memory
+storage backend, agents' replies go through handle_agent_response, and the
+scheduler is stepped by hand: each dispatch-wave timer the service sets is
+fired at its virtual due time by calling dispatch_next_wave. Outbound
+messages are counted at WhatsAppService.send_message, so they are exactly
+what the service sends. After every step the job's dispatched_to and
+dispatch_queue are checked against the ranked roster, and the run fails if
+they disagree. An agent whose YES would arrive more than --notice-lag
+seconds after the job was taken has seen the job-taken notice and stays
+quiet.
+
+Nothing leaves the process, and runs are reproducible for a given seed.
+
+Usage:
+    python simulate_dispatch.py
+    python simulate_dispatch.py --agents 200 --waves 0,5,10,20 --wave-timeout 180
+    python simulate_dispatch.py --accept-rate 0.1 --median-reply 600 --json sim.json
+    python simulate_dispatch.py --check     # exit 1 unless waves send fewer messages than broadcast
+"""
+
+import argparse
+import heapq
+import json
+import logging
+import math
+import os
+import random
+import sys
+from collections import Counter
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+# The service reads its settings on import and at call time; pin the ones the simulation depends on
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["EVENT_BUS_WORKERS"] = "0"
+os.environ["ASSIGNMENT_WINDOW_SECONDS"] = "0"
+os.environ["JOB_TAKEN_DIGEST_WINDOW"] = "0"
+os.environ["DISPATCH_MODE"] = "targeted"
+os.environ["DISPATCH_MAX_AGENTS"] = "0"
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+class Agent:
+    """One agent's reaction to a particular offer."""
+
+    __slots__ = ("accepts", "delay")
+
+    def __init__(self, accepts: bool, delay: float):
+        self.accepts = accepts
+        self.delay = delay
+
+def draw_agents(rng: random.Random, count: int, accept_rate: float, median_reply: float, sigma: float,
+                rank_bias: float) -> List[Agent]:
+    """Ranked agents for one job; rank_bias makes top-ranked agents likelier to accept."""
+    agents = []
+    for rank in range(count):
+        # Linear tilt from (1 + bias) at the top of the ranking to (1 - bias) at the bottom
+        tilt = 1 + rank_bias * (1 - 2 * rank / max(1, count - 1))
+        agents.append(Agent(
+            accepts=rng.random() < min(1.0, accept_rate * tilt),
+            delay=rng.lognormvariate(math.log(median_reply), sigma),
+        ))
+    return agents
+
+class Simulation:
+    """Drives JobService on the in-memory backend against a virtual clock."""
+
+    ZONE = "Simulation Zone"
+
+    def __init__(self, agent_count: int):
+        # Imported here so the settings above apply
+        from app.services.agent_index import agent_index, rank_agents
+        from app.services.database import db_service
+        from app.services.job_service import JobService
+        from app.services.scheduler import scheduler_service
+        from app.services.whatsapp_service import WhatsAppService
+
+        self.outbound: Counter = Counter()
+        self.wave_timers: List[Tuple[str, float]] = []
+        simulation = self
+
+        def send_message(service, to_number, message, job_id=None, template=None, on_queued_result=None):
+            simulation.outbound[job_id] += 1
+            return {"success": True, "message_id": f"SIM{sum(simulation.outbound.values())}", "status": "queued"}
+
+        def schedule_dispatch_wave(job_id, delay_seconds):
+            simulation.wave_timers.append((job_id, delay_seconds))
+            return True
+
+        WhatsAppService.send_message = send_message
+        scheduler_service.schedule_dispatch_wave = schedule_dispatch_wave
+
+        for rank in range(agent_count):
+            db_service.insert_document("agents", {
+                "agent_id": f"sim_{rank}",
+                "name": f"Agent {rank}",
+                "phone": f"+2348{rank:09d}",
+                "status": "active",
+                "zone": self.ZONE,
+                "rating": float(agent_count - rank),
+            })
+        agent_index.invalidate()
+        self.ranked = [agent["phone"] for agent in rank_agents(agent_index.active_agents())]
+        self.job_service = JobService()
+        self.next_day = date(2030, 1, 1)
+
+    def create_job(self) -> Dict:
+        # A fresh day per job, so bookings from earlier jobs never make agents busy
+        inspection_date, self.next_day = self.next_day.isoformat(), self.next_day + timedelta(days=1)
+        return self.job_service.create_inspection_request({
+            "property_id": "sim_property",
+            "client_id": "sim_client",
+            "inspection_date": inspection_date,
+            "inspection_time": "10:00",
+            "property_details": {"title": "Simulated property", "area": self.ZONE, "address": "1 Simulation Way"},
+            "client_details": {"name": "Simulated client", "phone": "+2348999999999"},
+        })
+
+    def check_dispatch(self, job_id: str, offered: int, wave_size: int):
+        """Fail the run unless the stored job offers the next ranked agents and queues the rest."""
+        job = self.job_service.get_job_by_id(job_id)
+        expected_queue = [] if wave_size <= 0 else self.ranked[offered:]
+        if job["dispatched_to"] != self.ranked[:offered] or (job["status"] == "pending" and job["dispatch_queue"] != expected_queue):
+            raise SystemExit(f"Job {job_id} dispatched_to/dispatch_queue do not follow the ranking after {offered} offers")
+
+    def run_job(self, agents: List[Agent], wave_size: int, notice_lag: float) -> Dict:
+        """Play one job through the service; wave_size 0 offers it to everyone at once."""
+        size = wave_size if wave_size > 0 else len(agents)
+        self.wave_timers.clear()
+        job = self.create_job()
+        job_id = job["job_id"]
+        self.check_dispatch(job_id, min(size, len(agents)), wave_size)
+
+        events: List[Tuple[float, int, str, Optional[str]]] = []
+        sequence = 0
+
+        def offer(phones: List[str], at: float):
+            nonlocal sequence
+            for phone in phones:
+                agent = agents[self.ranked.index(phone)]
+                if agent.accepts:
+                    sequence += 1
+                    heapq.heappush(events, (at + agent.delay, sequence, "reply", phone))
+
+        def arm_timers(at: float):
+            nonlocal sequence
+            for _, delay in self.wave_timers:
+                sequence += 1
+                heapq.heappush(events, (at + delay, sequence, "wave", None))
+            self.wave_timers.clear()
+
+        offer(job["dispatched_to"], 0.0)
+        arm_timers(0.0)
+        offered, waves, inbound = len(job["dispatched_to"]), 1, 0
+        assigned_at = None
+        while events:
+            at, _, kind, phone = heapq.heappop(events)
+            if kind == "wave":
+                wave = self.job_service.dispatch_next_wave(job_id)
+                if wave:
+                    if assigned_at is not None:
+                        raise SystemExit(f"Job {job_id} escalated after it was assigned")
+                    waves += 1
+                    offered += len(wave)
+                    self.check_dispatch(job_id, offered, wave_size)
+                    offer(wave, at)
+                arm_timers(at)
+                continue
+            # Agents who have already been told the job was taken do not reply
+            if assigned_at is not None and at > assigned_at + notice_lag:
+                continue
+            inbound += 1
+            result = self.job_service.handle_agent_response(job_id, phone, "YES")
+            if result.get("success"):
+                assigned_at = at
+
+        final = self.job_service.get_job_by_id(job_id)
+        return {
+            "assigned": final["status"] == "assigned",
+            "waves": waves,
+            "offers": offered,
+            "outbound": self.outbound.pop(job_id, 0),
+            "inbound": inbound,
+            "time_to_assign": assigned_at,
+        }
+
+def run_strategy(args, simulation: Simulation, wave_size: int) -> Dict:
+    os.environ["DISPATCH_WAVE_SIZE"] = str(wave_size)
+    os.environ["DISPATCH_WAVE_TIMEOUT"] = str(args.wave_timeout)
+    # Same seed for every strategy, so each sees identical agent behaviour per job
+    rng = random.Random(args.seed)
+    results = [
+        simulation.run_job(
+            draw_agents(rng, args.agents, args.accept_rate, args.median_reply, args.sigma, args.rank_bias),
+            wave_size, args.notice_lag,
+        )
+        for _ in range(args.jobs)
+    ]
+    assigned = [r for r in results if r["assigned"]]
+    times = [r["time_to_assign"] for r in assigned]
+    return {
+        "strategy": "broadcast" if wave_size <= 0 else f"waves of {wave_size}",
+        "wave_size": wave_size,
+        "jobs": len(results),
+        "assigned_pct": 100.0 * len(assigned) / len(results) if results else 0.0,
+        "outbound_per_assigned_job": sum(r["outbound"] for r in results) / len(assigned) if assigned else None,
+        "inbound_per_job": sum(r["inbound"] for r in results) / len(results) if results else 0.0,
+        "offers_per_job": sum(r["offers"] for r in results) / len(results) if results else 0.0,
+        "mean_waves": sum(r["waves"] for r in results) / len(results) if results else 0.0,
+        "time_to_assign_s": {f"p{p}": percentile(times, p) for p in (50, 90, 99)},
+    }
+
+def _fmt(value: Optional[float], digits: int = 1) -> str:
+    return "-" if value is None else f"{value:.{digits}f}"
+
+def print_table(summaries: List[Dict]):
+    header = f"{'strategy':<14} {'assigned':>9} {'out/job':>9} {'in/job':>8} {'offers':>8} {'waves':>6} {'tta p50':>9} {'tta p90':>9} {'tta p99':>9}"
+    print(header)
+    print("-" * len(header))
+    for s in summaries:
+        tta = s["time_to_assign_s"]
+        print(f"{s['strategy']:<14} {s['assigned_pct']:>8.1f}% {_fmt(s['outbound_per_assigned_job']):>9} "
+              f"{s['inbound_per_job']:>8.2f} {s['offers_per_job']:>8.1f} {s['mean_waves']:>6.2f} "
+              f"{_fmt(tta['p50'], 0):>8}s {_fmt(tta['p90'], 0):>8}s {_fmt(tta['p99'], 0):>8}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare broadcast and wave dispatch by simulation")
+    parser.add_argument("--agents", type=int, default=50, help="Agents matched to each job")
+    parser.add_argument("--jobs", type=int, default=300)
+    parser.add_argument("--waves", default="0,3,5,10", help="Comma-separated wave sizes; 0 is a full broadcast")
+    parser.add_argument("--wave-timeout", type=float, default=300.0, help="Seconds before escalating to the next wave")
+    parser.add_argument("--accept-rate", type=float, default=0.3, help="Chance an offered agent replies YES")
+    parser.add_argument("--median-reply", type=float, default=120.0, help="Median seconds before an agent replies")
+    parser.add_argument("--sigma", type=float, default=1.0, help="Log-normal spread of reply times")
+    parser.add_argument("--rank-bias", type=float, default=0.0,
+                        help="0..1; how much likelier top-ranked agents are to accept than bottom-ranked ones")
+    parser.add_argument("--notice-lag", type=float, default=5.0,
+                        help="Seconds until a job-taken notice stops agents from replying YES")
+    parser.add_argument("--verbose", action="store_true", help="Show the service's own logging")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", default=None, help="Write the summaries to this file")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit 1 unless every wave size sends fewer messages per assigned job than broadcast")
+    args = parser.parse_args()
+
+    wave_sizes = [int(size) for size in args.waves.split(",") if size.strip()]
+    if 0 not in wave_sizes:
+        wave_sizes.insert(0, 0)
+
+    print("🌊 Dispatch Strategy Simulator")
+    print("=" * 50)
+    print(f"{args.jobs} jobs x {args.agents} agents, accept rate {args.accept_rate}, "
+          f"median reply {args.median_reply:.0f}s, wave timeout {args.wave_timeout:.0f}s\n")
+
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+    simulation = Simulation(args.agents)
+    summaries = [run_strategy(args, simulation, size) for size in wave_sizes]
+    print_table(summaries)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"parameters": vars(args), "strategies": summaries}, f, indent=2)
+
+    if args.check:
+        broadcast = next(s for s in summaries if s["wave_size"] == 0)
+        failures = [
+            s["strategy"] for s in summaries
+            if s["wave_size"] > 0 and (s["outbound_per_assigned_job"] or math.inf) >= (broadcast["outbound_per_assigned_job"] or math.inf)
+        ]
+        if failures:
+            print(f"\n❌ Not cheaper than broadcast: {', '.join(failures)}")
+            sys.exit(1)
+        print("\n✅ Every wave size sends fewer messages per assigned job than broadcast")
+
+if __name__ == "__main__":
+    main()
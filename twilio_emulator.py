@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Local Twilio Messages API Emulator
+
+Stands in for https://api.twilio.com so the system can be exercised without
+real Twilio. Point WhatsAppService at it with TWILIO_API_BASE_URL.
+
+Features:
+- Twilio-shaped responses for POST /2010-04-01/Accounts/{sid}/Messages.json,
+  and GET of the same path to list sent messages (newest first, ?To= filter)
+- Configurable per-request latency distributions
+- 429 / 5xx failure injection
+- Optional per-sender throughput cap (429, error 63018, past N messages/s per From)
+- Status callbacks (sent, delivered, read or failed) posted back to
+  /api/webhooks/twilio/status-callback
+- A recorded log of sent messages for assertions
+
+Usage:
+    python twilio_emulator.py --port 4010 --latency lognormal:120:0.4 \\
+        --rate-429 0.02 --rate-5xx 0.01 \\
+        --status-callback-url http://localhost:5000/api/webhooks/twilio/status-callback
+
+    TWILIO_API_BASE_URL=http://127.0.0.1:4010 TWILIO_ACCOUNT_SID=ACtest \\
+    TWILIO_AUTH_TOKEN=test uvicorn app.main:app --port 5000
+
+Latency specs (milliseconds): "0", "constant:50", "uniform:20:80",
+"normal:50:10", "lognormal:<median>:<sigma>", "exponential:<mean>".
+
+Emulator endpoints:
+    GET    /_emulator/messages   recorded messages (?to=whatsapp:+234...)
+    DELETE /_emulator/messages   clear the log
+    GET    /_emulator/stats      request/failure counters
+    POST   /_emulator/config     update rates/latency at runtime (JSON body)
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+MESSAGES_PATH = re.compile(r"^/2010-04-01/Accounts/(?P<account>[^/]+)/Messages\.json$")
+MESSAGE_PATH = re.compile(r"^/2010-04-01/Accounts/(?P<account>[^/]+)/Messages/(?P<sid>[^/]+)\.json$")
+
+class LatencyModel:
+    """Samples request latency (seconds) from a distribution spec in milliseconds."""
+
+    def __init__(self, spec: str = "0", rng: Optional[random.Random] = None):
+        self.spec = spec
+        self.rng = rng or random.Random()
+        parts = str(spec).split(":")
+        if len(parts) == 1:
+            self.kind, self.params = "constant", [float(parts[0])]
+        else:
+            self.kind, self.params = parts[0], [float(p) for p in parts[1:]]
+        expected = {"constant": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+        if self.kind not in expected or len(self.params) != expected[self.kind]:
+            raise ValueError(f"Invalid latency spec: {spec}")
+
+    def sample(self) -> float:
+        if self.kind == "constant":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = self.rng.uniform(*self.params)
+        elif self.kind == "normal":
+            ms = self.rng.gauss(*self.params)
+        elif self.kind == "lognormal":
+            median, sigma = self.params
+            ms = median * self.rng.lognormvariate(0, sigma)
+        else:
+            ms = self.rng.expovariate(1.0 / self.params[0]) if self.params[0] > 0 else 0
+        return max(ms, 0) / 1000.0
+
+class TwilioEmulator:
+    """In-process HTTP server emulating the Twilio Messages API."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: str = "0",
+        rate_429: float = 0.0,
+        rate_5xx: float = 0.0,
+        failed_rate: float = 0.0,
+        sender_mps: float = 0.0,
+        status_callback_url: Optional[str] = None,
+        callback_statuses: str = "sent,delivered,read",
+        callback_delay: str = "constant:100",
+        log_path: Optional[str] = None,
+        seed: Optional[int] = None,
+    ):
+        self.rng = random.Random(seed)
+        self.latency = LatencyModel(latency, self.rng)
+        self.callback_delay = LatencyModel(callback_delay, self.rng)
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.failed_rate = failed_rate
+        self.sender_mps = sender_mps
+        self.status_callback_url = status_callback_url
+        self.callback_statuses = [s.strip() for s in callback_statuses.split(",") if s.strip()]
+        self.log_path = log_path
+
+        self._lock = threading.Lock()
+        self._messages: List[Dict] = []
+        self._by_sid: Dict[str, Dict] = {}
+        self.stats = {"requests": 0, "accepted": 0, "rejected_429": 0, "rejected_5xx": 0,
+                      "rejected_sender_rate": 0, "callbacks_sent": 0, "callbacks_failed": 0}
+        # Accept times in the last second, per From number
+        self._sender_sends: Dict[str, deque] = defaultdict(deque)
+        self._callbacks = ThreadPoolExecutor(max_workers=8, thread_name_prefix="twilio-emulator-callback")
+        self._callback_session = requests.Session()
+
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """Serve in a background thread and return the base URL."""
+        self._thread = threading.Thread(target=self.server.serve_forever, name="twilio-emulator", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._callbacks.shutdown(wait=False)
+
+    @property
+    def messages(self) -> List[Dict]:
+        """Snapshot of recorded messages in send order."""
+        with self._lock:
+            return [dict(m) for m in self._messages]
+
+    def reset(self):
+        with self._lock:
+            self._messages.clear()
+            self._by_sid.clear()
+            self._sender_sends.clear()
+            for key in self.stats:
+                self.stats[key] = 0
+
+    def wait_for_messages(self, count: int, timeout: float = 5.0) -> bool:
+        """Block until at least count messages have been accepted."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if len(self._messages) >= count:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def configure(self, **options):
+        """Update failure rates and latency while running."""
+        with self._lock:
+            for key in ("rate_429", "rate_5xx", "failed_rate", "sender_mps"):
+                if key in options:
+                    setattr(self, key, float(options[key]))
+            if "latency" in options:
+                self.latency = LatencyModel(options["latency"], self.rng)
+            if "callback_delay" in options:
+                self.callback_delay = LatencyModel(options["callback_delay"], self.rng)
+            if "status_callback_url" in options:
+                self.status_callback_url = options["status_callback_url"]
+
+    def create_message(self, account_sid: str, form: Dict[str, str]):
+        """Handle a Messages.json POST, returning (status code, body)."""
+        time.sleep(self.latency.sample())
+
+        with self._lock:
+            self.stats["requests"] += 1
+            roll = self.rng.random()
+            if roll < self.rate_429:
+                self.stats["rejected_429"] += 1
+                return 429, _error(20429, "Too Many Requests", 429)
+            if roll < self.rate_429 + self.rate_5xx:
+                self.stats["rejected_5xx"] += 1
+                status = self.rng.choice([500, 503])
+                return status, _error(20500 if status == 500 else 20503, "Service Unavailable", status)
+
+        if not form.get("To") or not (form.get("Body") or form.get("ContentSid")):
+            return 400, _error(21602, "Message body is required.", 400)
+        if not form.get("From") and not form.get("MessagingServiceSid"):
+            return 400, _error(21603, "A 'From' or 'MessagingServiceSid' parameter is required.", 400)
+        if self.sender_mps > 0 and form.get("From"):
+            with self._lock:
+                sends = self._sender_sends[form["From"]]
+                now = time.monotonic()
+                while sends and sends[0] <= now - 1.0:
+                    sends.popleft()
+                if len(sends) >= self.sender_mps:
+                    self.stats["rejected_sender_rate"] += 1
+                    return 429, _error(63018, "Rate limit exceeded for Channel", 429)
+                sends.append(now)
+
+        sid = "SM" + uuid.uuid4().hex
+        now = formatdate(usegmt=True)
+        message = {
+            "sid": sid,
+            "account_sid": account_sid,
+            "messaging_service_sid": form.get("MessagingServiceSid"),
+            "to": form.get("To"),
+            "from": form.get("From"),
+            "body": form.get("Body"),
+            "status": "queued",
+            "direction": "outbound-api",
+            "api_version": "2010-04-01",
+            "num_segments": "1",
+            "num_media": "0",
+            "price": None,
+            "price_unit": "USD",
+            "error_code": None,
+            "error_message": None,
+            "date_created": now,
+            "date_updated": now,
+            "date_sent": None,
+            "uri": f"/2010-04-01/Accounts/{account_sid}/Messages/{sid}.json",
+            "subresource_uris": {"media": f"/2010-04-01/Accounts/{account_sid}/Messages/{sid}/Media.json"},
+        }
+        record = dict(message, status_callback=form.get("StatusCallback") or self.status_callback_url,
+                      received_at=time.time())
+        with self._lock:
+            self.stats["accepted"] += 1
+            self._messages.append(record)
+            self._by_sid[sid] = record
+        if self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+        if record["status_callback"]:
+            self._callbacks.submit(self._emit_status_callbacks, record)
+        return 201, message
+
+    def get_message(self, sid: str) -> Optional[Dict]:
+        with self._lock:
+            record = self._by_sid.get(sid)
+            return dict(record) if record else None
+
+    def _emit_status_callbacks(self, record: Dict):
+        """Post the status progression for a message to its callback URL."""
+        statuses = list(self.callback_statuses)
+        if statuses and self.rng.random() < self.failed_rate:
+            statuses = statuses[:1] + ["failed"]
+        for status in statuses:
+            time.sleep(self.callback_delay.sample())
+            payload = {
+                "MessageSid": record["sid"],
+                "SmsSid": record["sid"],
+                "AccountSid": record["account_sid"],
+                "MessageStatus": status,
+                "SmsStatus": status,
+                "To": record["to"],
+                "From": record["from"] or "",
+                "ApiVersion": "2010-04-01",
+            }
+            if status == "failed":
+                payload["ErrorCode"] = "63016"
+            with self._lock:
+                record["status"] = status
+                record.setdefault("status_history", []).append({"status": status, "at": time.time()})
+            try:
+                self._callback_session.post(record["status_callback"], data=payload, timeout=10)
+                with self._lock:
+                    self.stats["callbacks_sent"] += 1
+            except requests.RequestException:
+                with self._lock:
+                    self.stats["callbacks_failed"] += 1
+
+    def _make_handler(self):
+        emulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; without this Nagle adds ~40ms per response
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self) -> str:
+                length = int(self.headers.get("Content-Length") or 0)
+                return self.rfile.read(length).decode("utf-8") if length else ""
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                match = MESSAGES_PATH.match(path)
+                if match:
+                    form = {k: v[0] for k, v in parse_qs(self._body(), keep_blank_values=True).items()}
+                    status, body = emulator.create_message(match.group("account"), form)
+                    self._send(status, body)
+                elif path == "/_emulator/config":
+                    try:
+                        emulator.configure(**json.loads(self._body() or "{}"))
+                        self._send(200, {"status": "ok"})
+                    except (ValueError, TypeError) as e:
+                        self._send(400, {"error": str(e)})
+                else:
+                    self._send(404, _error(20404, "Not Found", 404))
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                match = MESSAGE_PATH.match(parsed.path)
+                listing = MESSAGES_PATH.match(parsed.path)
+                if listing:
+                    query = parse_qs(parsed.query)
+                    to = query.get("To", [None])[0]
+                    page_size = int(query.get("PageSize", ["50"])[0])
+                    messages = [m for m in reversed(emulator.messages) if to is None or m["to"] == to][:page_size]
+                    self._send(200, {"messages": messages, "page": 0, "page_size": page_size,
+                                     "next_page_uri": None, "uri": parsed.path})
+                elif match:
+                    record = emulator.get_message(match.group("sid"))
+                    if record:
+                        self._send(200, record)
+                    else:
+                        self._send(404, _error(20404, "Not Found", 404))
+                elif parsed.path == "/_emulator/messages":
+                    to = parse_qs(parsed.query).get("to", [None])[0]
+                    messages = [m for m in emulator.messages if to is None or m["to"] == to]
+                    self._send(200, {"messages": messages, "count": len(messages)})
+                elif parsed.path == "/_emulator/stats":
+                    with emulator._lock:
+                        self._send(200, dict(emulator.stats))
+                else:
+                    self._send(404, _error(20404, "Not Found", 404))
+
+            def do_DELETE(self):
+                if urlparse(self.path).path == "/_emulator/messages":
+                    emulator.reset()
+                    self._send(200, {"status": "cleared"})
+                else:
+                    self._send(404, _error(20404, "Not Found", 404))
+
+        return Handler
+
+def _error(code: int, message: str, status: int) -> Dict:
+    return {
+        "code": code,
+        "message": message,
+        "more_info": f"https://www.twilio.com/docs/errors/{code}",
+        "status": status,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Twilio Messages API emulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4010)
+    parser.add_argument("--latency", default="0", help="Per-request latency spec in ms (e.g. lognormal:120:0.4)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests rejected with 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Fraction of requests rejected with 500/503")
+    parser.add_argument("--failed-rate", type=float, default=0.0, help="Fraction of accepted messages that end as failed")
+    parser.add_argument("--sender-mps", type=float, default=0.0, help="Messages per second each From number may send (0 = unlimited)")
+    parser.add_argument("--status-callback-url", default=None,
+                        help="Default callback URL, e.g. http://localhost:5000/api/webhooks/twilio/status-callback")
+    parser.add_argument("--callback-statuses", default="sent,delivered,read")
+    parser.add_argument("--callback-delay", default="constant:100", help="Delay between status callbacks in ms")
+    parser.add_argument("--log", default=None, help="Append every accepted message to this JSON Lines file")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    emulator = TwilioEmulator(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        failed_rate=args.failed_rate,
+        sender_mps=args.sender_mps,
+        status_callback_url=args.status_callback_url,
+        callback_statuses=args.callback_statuses,
+        callback_delay=args.callback_delay,
+        log_path=args.log,
+        seed=args.seed,
+    )
+    print("📡 Twilio emulator running")
+    print(f"Base URL: {emulator.base_url}")
+    print(f"Set TWILIO_API_BASE_URL={emulator.base_url} for the app")
+    try:
+        emulator.server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping emulator")
+        emulator.stop()
+
+if __name__ == "__main__":
+    main()